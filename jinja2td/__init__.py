@@ -18,4 +18,18 @@ if jinja2.__version__ not in __ALLOWED_JINJA_VERSIONS:
 
 from . import overrides as _
 from .introspection import Introspection
-from .dependencies import DependencyGraph, Template, Dependency, Target
+from .dependencies import (
+    DependencyGraph,
+    Template,
+    Dependency,
+    Target,
+    CompileStats,
+    Block,
+)
+from .mapped import MappedGraph
+from .events import Event, Subscription
+from .diff import GraphDiff
+from .bundle import BundleLoader
+from .snapshot import GraphSnapshot
+from .metrics import TemplateMetrics
+from .usage import UsageWriter, merge_usage
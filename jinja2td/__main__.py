@@ -0,0 +1,298 @@
+"""Command-line interface, to inspect the templates of a directory.
+
+Run ``python -m jinja2td --help`` for usage.
+"""
+
+import argparse
+import json
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Sequence, TextIO, Tuple
+
+import jinja2
+
+from .dependencies import Dependency, DependencyGraph, Template
+from .introspection import Introspection
+from .manifest import dump_templates, load_templates
+from .usage import merge_usage
+
+
+def _environment(paths: Sequence[str], encoding: str) -> jinja2.Environment:
+    return jinja2.Environment(
+        loader=jinja2.FileSystemLoader(paths, encoding),
+        extensions=[Introspection],
+    )
+
+
+def _scan_chunk(
+    args: Tuple[Sequence[str], str, List[str]],
+) -> Tuple[List[dict], List[str]]:
+    # runs in a worker process: the graph is sent back serialised
+    paths, encoding, names = args
+    env = _environment(paths, encoding)
+    compiled = env.dependencies.scan(env, names)
+    return list(dump_templates(env.dependencies, names)), compiled
+
+
+def build_graph(
+    paths: Sequence[str],
+    encoding: str = "utf-8",
+    extensions: Optional[Sequence[str]] = None,
+    workers: int = 1,
+) -> Tuple[jinja2.Environment, List[str]]:
+    """Scan the templates found in some directories.
+
+    :param paths: The search path of the ``FileSystemLoader``.
+    :param encoding: The encoding of the templates.
+    :param extensions: The file extensions of the templates to scan (without
+                       the dot), or ``None`` to scan all the files.
+    :param workers: The number of processes scanning the templates.
+
+    :returns: The environment holding the graph, and the names of the templates
+              that had to be compiled (see `DependencyGraph.scan <#jinja2td.DependencyGraph.scan>`_).
+    """
+    env = _environment(paths, encoding)
+    names = env.list_templates(extensions)
+    if workers <= 1:
+        return env, env.dependencies.scan(env, names)
+
+    compiled: List[str] = []
+    size = len(names) // (workers * 4) + 1  # small chunks balance the load
+    chunks = [
+        (paths, encoding, names[i : i + size]) for i in range(0, len(names), size)
+    ]
+    with ProcessPoolExecutor(workers) as executor:
+        for templates, chunk_compiled in executor.map(_scan_chunk, chunks):
+            load_templates(env.dependencies, templates)
+            compiled += chunk_compiled
+    return env, compiled
+
+
+def _write_stats(graph: DependencyGraph, compiled: List[str], out: TextIO):
+    templates = 0
+    types = {}
+    dynamic = 0
+    for t in graph.templates:
+        templates += 1
+        for d in t.dependencies:
+            types[d.type] = types.get(d.type, 0) + 1
+            if any(target.is_dynamic for target in d.targets):
+                dynamic += 1
+
+    out.write(f"templates: {templates}\n")
+    out.write(f"dependencies: {sum(types.values())}\n")
+    for dependency_type in sorted(types):
+        out.write(f"  {dependency_type}: {types[dependency_type]}\n")
+    out.write(f"dynamic dependencies: {dynamic}\n")
+    out.write(f"compiled (not scanned): {len(compiled)}\n")
+
+
+def _write_metrics(graph: DependencyGraph, by: str, n: Optional[int], out: TextIO):
+    out.write("depth\textends\ttransitive\tfan-in\tfan-out\tname\n")
+    for m in graph.rank_by_metrics(by, n):
+        out.write(
+            f"{m.depth}\t{m.extends_depth}\t{m.transitive_count}\t"
+            f"{m.fan_in}\t{m.fan_out}\t{m.name}\n"
+        )
+
+
+def _dependency_json(d: Dependency) -> dict:
+    return {
+        "type": d.type,
+        "targets": [
+            {
+                "name": target.name,
+                "dynamic": target.is_dynamic,
+                "pattern": target.pattern,
+            }
+            for target in d.targets
+        ],
+        "with_context": d.with_context,
+        "ignore_missing": d.ignore_missing,
+        "imported_as": d.imported_as,
+        "imported_names": d.imported_names,
+        "loop_depth": d.loop_depth,
+        "in_macro": d.in_macro,
+        "in_call_block": d.in_call_block,
+    }
+
+
+def _write_json(templates: List[Template], out: TextIO):
+    # one template at a time, not to build the whole document in memory
+    out.write('{"templates": [')
+    for i, t in enumerate(templates):
+        out.write(",\n" if i > 0 else "\n")
+        json.dump(
+            {
+                "name": t.name,
+                "file": t.file,
+                "dependencies": [_dependency_json(d) for d in t.dependencies],
+            },
+            out,
+        )
+    out.write("\n]}\n")
+
+
+def _dot_id(name: str) -> str:
+    return json.dumps(name, ensure_ascii=False)
+
+
+def _write_dot(templates: List[Template], out: TextIO):
+    out.write("digraph dependencies {\n")
+    dynamic = 0
+    for t in templates:
+        out.write(f"  {_dot_id(t.name)};\n")
+        for d in t.dependencies:
+            label = _dot_id(d.type)  # the kinds of extensions can be any string
+            for target in d.targets:
+                if not target.is_dynamic:
+                    out.write(
+                        f"  {_dot_id(t.name)} -> {_dot_id(target.name)} [label={label}];\n"
+                    )
+                else:
+                    # a node of its own, the templates matching the pattern of
+                    # two dependencies may differ
+                    node = _dot_id(f"dynamic:{dynamic}")
+                    dynamic += 1
+                    pattern = "*" if target.pattern is None else target.pattern
+                    out.write(f"  {node} [label={_dot_id(pattern)}, style=dashed];\n")
+                    out.write(
+                        f"  {_dot_id(t.name)} -> {node} [label={label}, style=dashed];\n"
+                    )
+    out.write("}\n")
+
+
+def _parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m jinja2td",
+        description="Inspect the dependencies of the templates of a directory.",
+    )
+    parser.add_argument(
+        "-s",
+        "--search-path",
+        action="append",
+        help="a directory containing templates (can be repeated, defaults to the current directory)",
+    )
+    parser.add_argument(
+        "-e",
+        "--extension",
+        action="append",
+        help="only consider the templates with this extension, without the dot (can be repeated)",
+    )
+    parser.add_argument(
+        "-w", "--workers", type=int, default=1, help="the number of processes scanning"
+    )
+    parser.add_argument(
+        "--encoding", default="utf-8", help="the encoding of the templates"
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("stats", help="print statistics about the templates")
+    dependents = commands.add_parser(
+        "dependents", help="list the templates depending on a template"
+    )
+    dependents.add_argument("name")
+    dependencies = commands.add_parser(
+        "dependencies", help="list the templates a template depends on"
+    )
+    dependencies.add_argument("name")
+    metrics = commands.add_parser(
+        "metrics", help="rank the templates by the shape of their dependencies"
+    )
+    metrics.add_argument(
+        "-b",
+        "--by",
+        choices=("depth", "extends_depth", "transitive_count", "fan_in", "fan_out"),
+        default="depth",
+    )
+    metrics.add_argument(
+        "-n", type=int, help="the number of templates to list (defaults to all)"
+    )
+    affected = commands.add_parser(
+        "affected", help="list the templates affected by changes to some files"
+    )
+    affected.add_argument("files", nargs="+")
+    merge = commands.add_parser(
+        "merge-usage", help="combine the usage files written by several processes"
+    )
+    merge.add_argument("files", nargs="+")
+    merge.add_argument("-o", "--output", required=True, help="the file to write")
+    export = commands.add_parser("export", help="write the whole graph")
+    export.add_argument(
+        "-f", "--format", choices=("json", "dot", "mapped"), default="json"
+    )
+    export.add_argument(
+        "-o",
+        "--output",
+        help="the file to write (defaults to the standard output, except for the mapped format)",
+    )
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Run the command-line interface.
+
+    :param argv: The arguments, defaults to ``sys.argv[1:]``.
+
+    :returns: The exit status.
+    """
+    parser = _parser()
+    args = parser.parse_args(argv)
+    if args.command == "export" and args.format == "mapped" and args.output is None:
+        parser.error("the mapped format needs an output file")
+    if args.command == "merge-usage":
+        # no templates needed
+        merged = merge_usage(args.files, args.output)
+        sys.stderr.write(f"merged {merged} of {len(args.files)} files\n")
+        return 0
+
+    try:
+        env, compiled = build_graph(
+            args.search_path or ["."], args.encoding, args.extension, args.workers
+        )
+    except jinja2.TemplateSyntaxError as e:
+        print(f"{e.filename or e.name}:{e.lineno}: error: {e.message}", file=sys.stderr)
+        return 1
+    except jinja2.TemplateError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    graph = env.dependencies
+
+    if args.command == "stats":
+        _write_stats(graph, compiled, sys.stdout)
+
+    elif args.command in ("dependents", "dependencies"):
+        if graph.get_template(args.name) is None:
+            print(f"error: no such template: {args.name}", file=sys.stderr)
+            return 1
+        if args.command == "dependents":
+            names = graph.find_dependents(args.name)
+        else:
+            names = graph.get_closure(args.name)
+        for name in names:
+            sys.stdout.write(name + "\n")
+
+    elif args.command == "metrics":
+        _write_metrics(graph, args.by, args.n, sys.stdout)
+
+    elif args.command == "affected":
+        for name in graph.find_affected_by_files(args.files):
+            sys.stdout.write(name + "\n")
+
+    elif args.format == "mapped":
+        graph.export(args.output)
+
+    else:
+        templates = sorted(graph.templates, key=lambda t: t.name)
+        write = _write_json if args.format == "json" else _write_dot
+        if args.output is None:
+            write(templates, sys.stdout)
+        else:
+            with open(args.output, "w", encoding="utf-8") as f:
+                write(templates, f)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
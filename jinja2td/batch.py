@@ -0,0 +1,145 @@
+"""Queries over many templates at once, using a compact copy of the static
+dependencies.
+"""
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .dependencies import Template
+
+# the bits of the masks of types, the types past the last bit share it
+_MASK_BITS = 64
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+
+def _csr(count: int, edges: Dict[Tuple[int, int], int]) -> Tuple[array, array, array]:
+    # rows of (target, type) sorted by source, from (source, target) -> type mask
+    rows: List[List[Tuple[int, int]]] = [[] for _ in range(count)]
+    for (source, target), mask in edges.items():
+        rows[source].append((target, mask))
+    ptr = array("I", [0])
+    idx = array("I")
+    masks = array("Q")
+    for row in rows:
+        for target, mask in sorted(row):
+            idx.append(target)
+            masks.append(mask)
+        ptr.append(len(idx))
+    return ptr, idx, masks
+
+
+class _BatchIndex:
+    # the static dependencies as CSR arrays, in both directions, with the
+    # types of each edge as a bit mask
+    def __init__(self, templates: Iterable[Template]):
+        self.names: List[str] = []
+        self.ids: Dict[str, int] = {}
+        self.types: Dict[str, int] = {}
+        forward: Dict[Tuple[int, int], int] = {}
+        reverse: Dict[Tuple[int, int], int] = {}
+
+        for t in templates:
+            if t.name is None:
+                continue  # compiled from a string
+            source = self.__id(t.name)
+            for d in t.dependencies:
+                bit = self.types.get(d.type)
+                if bit is None:
+                    bit = 1 << min(len(self.types), _MASK_BITS - 1)
+                    self.types[d.type] = bit
+                for target in d.targets:
+                    if not target.is_dynamic:
+                        edge = (source, self.__id(target.name))
+                        forward[edge] = forward.get(edge, 0) | bit
+                        reverse[edge[::-1]] = reverse.get(edge[::-1], 0) | bit
+
+        self.forward = _csr(len(self.names), forward)
+        self.reverse = _csr(len(self.names), reverse)
+        self.__arrays: Dict[int, tuple] = {}
+
+    def __id(self, name: str) -> int:
+        index = self.ids.get(name)
+        if index is None:
+            index = self.ids[name] = len(self.names)
+            self.names.append(name)
+        return index
+
+    def mask(self, types: Optional[Iterable[str]]) -> int:
+        if types is None:
+            return -1
+        mask = 0
+        for t in types:
+            mask |= self.types.get(t, 0)
+        return mask
+
+    def reach(
+        self,
+        names: Iterable[str],
+        reverse: bool,
+        mask: int,
+        direct: bool,
+    ) -> List[str]:
+        sources = [self.ids[n] for n in names if n in self.ids]
+        if not sources or mask == 0:
+            return []
+        if numpy is not None:
+            visited = self.__reach_numpy(sources, reverse, mask, direct)
+        else:
+            visited = self.__reach(sources, reverse, mask, direct)
+        return sorted(self.names[i] for i in visited)
+
+    def __reach(
+        self, sources: List[int], reverse: bool, mask: int, direct: bool
+    ) -> List[int]:
+        ptr, idx, masks = self.reverse if reverse else self.forward
+        # one byte per node: the bitset of the nodes reached so far
+        visited = bytearray(len(self.names))
+        found = []
+        frontier = sources
+        while frontier:
+            following = []
+            for node in frontier:
+                for edge in range(ptr[node], ptr[node + 1]):
+                    target = idx[edge]
+                    if not visited[target] and masks[edge] & mask:
+                        visited[target] = 1
+                        following.append(target)
+            found += following
+            frontier = [] if direct else following
+        return found
+
+    def __arrays_numpy(self, reverse: bool) -> tuple:
+        if reverse not in self.__arrays:
+            ptr, idx, masks = self.reverse if reverse else self.forward
+            self.__arrays[reverse] = (
+                numpy.frombuffer(ptr, dtype=numpy.uint32).astype(numpy.int64),
+                numpy.frombuffer(idx, dtype=numpy.uint32).astype(numpy.int64),
+                numpy.frombuffer(masks, dtype=numpy.uint64),
+            )
+        return self.__arrays[reverse]
+
+    def __reach_numpy(
+        self, sources: List[int], reverse: bool, mask: int, direct: bool
+    ) -> List[int]:
+        ptr, idx, masks = self.__arrays_numpy(reverse)
+        visited = numpy.zeros(len(self.names), dtype=bool)
+        frontier = numpy.unique(numpy.array(sources, dtype=numpy.int64))
+        while frontier.size:
+            # the edges of the whole frontier, gathered in one go
+            starts = ptr[frontier]
+            lengths = ptr[frontier + 1] - starts
+            total = int(lengths.sum())
+            if total == 0:
+                break
+            offsets = numpy.repeat(starts - numpy.cumsum(lengths) + lengths, lengths)
+            edges = offsets + numpy.arange(total)
+            if mask != -1:
+                edges = edges[(masks[edges] & numpy.uint64(mask)) != 0]
+            targets = numpy.unique(idx[edges])
+            targets = targets[~visited[targets]]
+            visited[targets] = True
+            frontier = targets[:0] if direct else targets
+        return numpy.flatnonzero(visited).tolist()
@@ -0,0 +1,87 @@
+"""Archives of the templates needed to render some templates.
+"""
+import zipfile
+from typing import Dict, Iterable, List, TYPE_CHECKING
+
+import jinja2
+
+if TYPE_CHECKING:
+    from .dependencies import DependencyGraph
+
+
+def _collect(
+    graph: "DependencyGraph", environment: jinja2.Environment, entries: Iterable[str]
+) -> List[str]:
+    entries = list(entries)
+    needed: Dict[str, None] = {}
+    queue = list(entries)
+    while queue:
+        name = queue.pop()
+        if name in needed:
+            continue
+        template = graph.get_template(name)
+        if template is None:
+            try:
+                graph.scan(environment, [name])
+            except jinja2.TemplateNotFound:
+                if name in entries:
+                    raise
+                continue  # it will be missing at runtime too
+            template = graph.get_template(name)
+        needed[name] = None
+
+        for d in template.dependencies:
+            for target in d.targets:
+                if not target.is_dynamic:
+                    queue.append(target.name)
+            if any(target.is_dynamic for target in d.targets):
+                # the targets seen so far
+                queue.extend(d.resolved)
+                queue.extend(n for n, _ in d.predict())
+    return sorted(needed)
+
+
+def write_bundle(
+    graph: "DependencyGraph",
+    environment: jinja2.Environment,
+    entries: Iterable[str],
+    path: str,
+    compiled: bool,
+) -> List[str]:
+    """Write the templates needed by some entry templates to a zip file, see
+    `DependencyGraph.bundle <#jinja2td.DependencyGraph.bundle>`_.
+    """
+    names = _collect(graph, environment, entries)
+    if compiled:
+        environment.compile_templates(
+            path, filter_func=set(names).__contains__, ignore_errors=False
+        )
+    else:
+        with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as f:
+            for name in names:
+                source, _, _ = environment.loader.get_source(environment, name)
+                f.writestr(name, source)
+    return names
+
+
+class BundleLoader(jinja2.DictLoader):
+    """Loads the templates from a bundle written by
+    `DependencyGraph.bundle <#jinja2td.DependencyGraph.bundle>`_ with
+    ``compiled=False``.
+
+    Bundles of compiled templates are loaded with ``jinja2.ModuleLoader``
+    instead.
+    """
+
+    def __init__(self, path: str):
+        """Reads a bundle.
+
+        :param path: The zip file to read.
+        """
+        with zipfile.ZipFile(path) as f:
+            mapping = {
+                info.filename: f.read(info).decode("utf-8")
+                for info in f.infolist()
+                if not info.is_dir()
+            }
+        super().__init__(mapping)
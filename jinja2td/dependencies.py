@@ -1,32 +1,165 @@
 """Classes to represent template dependencies.
 """
+import contextlib
+import contextvars
+import copy
+import hashlib
+import itertools
+import os
+import re
+import threading
+import time
+import weakref
 import jinja2
-from typing import Optional, List, Dict
+from collections import deque
+from typing import (
+    Optional,
+    List,
+    Dict,
+    Tuple,
+    Pattern,
+    Set,
+    MutableSet,
+    MutableMapping,
+    Callable,
+    Iterable,
+    Deque,
+    Hashable,
+    Sequence,
+    Union,
+    Iterator,
+    Any,
+    TYPE_CHECKING,
+)
+
+from . import events
+from .events import Event, Subscription
+
+if TYPE_CHECKING:
+    from jinja2 import nodes
+    from jinja2.lexer import Token
+    from jinja2.parser import Parser
+    from .metrics import TemplateMetrics, _MetricsIndex
+    from .usage import UsageWriter
+    from .batch import _BatchIndex
+    from .snapshot import GraphSnapshot
+
+# the number of records after which the graph is built even if it isn't queried
+_MAX_PENDING = 4096
+
+# the early-hints callback of the render in progress, see DependencyGraph.early_hints
+_hints: "contextvars.ContextVar[Optional[Callable[[str, str, str], Any]]]" = (
+    contextvars.ContextVar("jinja2td_hints", default=None)
+)
+
+# the dependency types generated by the compiler
+_BUILTIN_KINDS = ("extends", "include", "import")
+
+# the properties of TemplateMetrics templates can be ranked by
+_RANKED_METRICS = ("depth", "extends_depth", "transitive_count", "fan_in", "fan_out")
+
+
+def _checksum(source: str) -> int:
+    return int.from_bytes(
+        hashlib.blake2b(source.encode("utf-8"), digest_size=8).digest(), "little"
+    )
+
+
+def _normalize_path(path: str) -> str:
+    return os.path.normcase(os.path.abspath(path))
+
+
+def _loader_names(loader: jinja2.BaseLoader, path: str) -> Iterator[str]:
+    # the names a file could be loaded as, for the loaders reading directories
+    if isinstance(loader, jinja2.ChoiceLoader):
+        for choice in loader.loaders:
+            yield from _loader_names(choice, path)
+    elif isinstance(loader, jinja2.PrefixLoader):
+        for prefix, prefixed in loader.mapping.items():
+            for name in _loader_names(prefixed, path):
+                yield prefix + loader.delimiter + name
+    elif isinstance(loader, jinja2.FileSystemLoader):
+        for searchpath in loader.searchpath:
+            try:
+                relative = os.path.relpath(path, _normalize_path(searchpath))
+            except ValueError:
+                continue  # on another drive
+            if relative != os.pardir and not relative.startswith(os.pardir + os.sep):
+                yield relative.replace(os.sep, "/")
+
+
+def _affected(
+    names: Iterable[str], templates: Iterable["Template"], added: Iterable[str] = ()
+) -> List[str]:
+    # the templates and all their dependents, also through dynamic targets, and
+    # the dependents of the added templates (which aren't in the graph yet)
+    dependents: Dict[str, Set[str]] = {}
+    dynamic: List[Tuple[str, Target]] = []
+    for t in templates:
+        for d in t.dependencies:
+            for target in d.targets:
+                if target.is_dynamic:
+                    dynamic.append((t.name, target))
+                else:
+                    dependents.setdefault(target.name, set()).add(t.name)
+
+    affected: Dict[str, None] = dict.fromkeys(names)
+    queue = list(affected) + [name for name in added if name not in affected]
+    while queue:
+        name = queue.pop()
+        found = set(dependents.get(name, ()))
+        found.update(t for t, target in dynamic if target.matches(name))
+        # the templates compiled from strings are all named None
+        found.discard(None)
+        for dependent in found:
+            if dependent not in affected:
+                affected[dependent] = None
+                queue.append(dependent)
+    return sorted(affected)
 
 
 class Target:
     """The target of a dependency.
 
     A target is dynamic if it is not hard-coded in the template, in which case
-    the name of the target is unknown until it is resolved.
+    the name of the target is unknown until it is resolved. Some dynamic
+    targets still have a known shape, like ``"widgets/" ~ kind ~ ".j2"``, in
+    which case the constant parts are kept as a `pattern <#jinja2td.Target.pattern>`_.
     """
 
-    def __init__(self, dynamic: bool, name: Optional[str]):
+    def __init__(
+        self,
+        dynamic: bool,
+        name: Optional[str],
+        fragments: Optional[Tuple[str, ...]] = None,
+    ):
         """Initialises a new `Target` class.
 
         This class should not be instantiated manually.
         """
         self.__dynamic = dynamic
         self.__name = name
+        self.__fragments = fragments
+        self.__regex: Optional[Pattern[str]] = None
 
     def __repr__(self):
+        if self.__fragments is not None:
+            return f"Target(dynamic={self.__dynamic}, name={self.__name}, pattern={self.pattern!r})"
         return f"Target(dynamic={self.__dynamic}, name={self.__name})"
 
     def __eq__(self, other):
         if not isinstance(other, Target):
             return NotImplemented
 
-        return self.__dynamic == other.__dynamic and self.__name == other.__name
+        return (
+            self.__dynamic == other.__dynamic
+            and self.__name == other.__name
+            and self.__fragments == other.__fragments
+        )
+
+    @property
+    def _fragments(self) -> Optional[Tuple[str, ...]]:
+        return self.__fragments
 
     @property
     def is_dynamic(self) -> bool:
@@ -40,24 +173,114 @@ class Target:
         """The name of the target template, or `None` if the target is dynamic."""
         return self.__name
 
+    @property
+    def pattern(self) -> Optional[str]:
+        """The shape of a dynamic target, with ``*`` standing for the parts that
+        are only known at runtime (e.g. ``"widgets/*.j2"``), or ``None`` if
+        nothing is known about the target.
+        """
+        if self.__fragments is None:
+            return None
+        return "*".join(self.__fragments)
+
+    @property
+    def prefix(self) -> Optional[str]:
+        """The constant start of a dynamic target, or ``None`` if the target
+        has no pattern.
+        """
+        return None if self.__fragments is None else self.__fragments[0]
+
+    @property
+    def suffix(self) -> Optional[str]:
+        """The constant end of a dynamic target, or ``None`` if the target
+        has no pattern.
+        """
+        return None if self.__fragments is None else self.__fragments[-1]
+
+    def matches(self, name: str) -> bool:
+        """Check if a template could be the target of this dependency.
+
+        Static targets only match their own name, and dynamic targets without
+        a pattern match anything.
+
+        :param name: The name of a template.
+
+        :returns: ``True`` if the target may resolve to that template.
+        """
+        if not self.__dynamic:
+            return name == self.__name
+        if self.__fragments is None:
+            return True
+        if self.__regex is None:
+            self.__regex = re.compile(
+                ".*".join(re.escape(f) for f in self.__fragments), re.DOTALL
+            )
+        return self.__regex.fullmatch(name) is not None
+
+    def expand(self, environment: jinja2.Environment) -> List[str]:
+        """List the templates this target may resolve to.
+
+        :param environment: The environment to search in. Its loader must
+                            support `list_templates <https://jinja.palletsprojects.com/en/3.1.x/api/#jinja2.BaseLoader.list_templates>`_.
+
+        :returns: The names of all the templates matching this target. Dynamic
+                  targets without a pattern can't be expanded and return an
+                  empty list.
+        """
+        if not self.__dynamic:
+            return [self.__name]
+        if self.__fragments is None:
+            return []
+        return [n for n in environment.list_templates() if self.matches(n)]
+
 
 class _ResolvedTarget:
-    def __init__(self, name: str):
+    # never modified, so that snapshots can share them
+    def __init__(self, name: str, environment: int, sequence: int):
         self.__name = name
-        self.__last_watch = True
+        self.__environment = environment
+        self.__sequence = sequence
 
     @property
-    def last_watch(self) -> bool:
-        return self.__last_watch
+    def environment(self) -> int:
+        return self.__environment
 
-    def watch_reset(self):
-        self.__last_watch = False
+    @property
+    def sequence(self) -> int:
+        # the resolve count of the dependency when it was resolved
+        return self.__sequence
 
     @property
     def name(self) -> str:
         return self.__name
 
 
+class _TopK:
+    # bounded frequency counter using the space-saving algorithm: when full,
+    # the least frequent entry is replaced and its count is inherited as error
+    def __init__(self, capacity: int):
+        self.__capacity = capacity
+        self.__counts: Dict[str, int] = {}
+
+    def add(self, item: str, count: int = 1):
+        if item in self.__counts:
+            self.__counts[item] += count
+        elif len(self.__counts) < self.__capacity:
+            self.__counts[item] = count
+        else:
+            evicted = min(self.__counts, key=self.__counts.__getitem__)
+            self.__counts[item] = self.__counts.pop(evicted) + count
+
+    def most_common(self, k: Optional[int] = None) -> List[Tuple[str, int]]:
+        ranked = sorted(self.__counts.items(), key=lambda i: i[1], reverse=True)
+        return ranked if k is None else ranked[:k]
+
+    def copy(self) -> "_TopK":
+        other = _TopK(self.__capacity)
+        other.__counts = self.__counts.copy()
+        return other
+
+
 class Dependency:
     """A dependency to one or more templates."""
 
@@ -69,6 +292,10 @@ class Dependency:
         ignore_missing: Optional[bool] = None,
         imported_as: Optional[str] = None,
         imported_names: Optional[List[str]] = None,
+        inlined: Optional[bool] = None,
+        loop_depth: int = 0,
+        in_macro: bool = False,
+        in_call_block: bool = False,
     ):
         """Initialises a new `Dependency` class.
 
@@ -80,19 +307,92 @@ class Dependency:
         self.__ignore_missing = ignore_missing
         self.__imported_as = imported_as
         self.__imported_names = imported_names
+        self.__inlined = inlined
+        self.__loop_depth = loop_depth
+        self.__in_macro = in_macro
+        self.__in_call_block = in_call_block
+        self.__resolve_count = 0
+        # only appended to, the frozen copies only see its first items
         self.__resolved: List[_ResolvedTarget] = []
+        self.__frozen_length: Optional[int] = None
+        # the last resolution of each target instead, in bounded mode
+        self.__latest: Optional[Dict[Tuple[str, int], _ResolvedTarget]] = None
+        # the resolve count at the last watch, for all the environments (None)
+        # or one, replaced rather than modified
+        self.__watched: Dict[Optional[int], int] = {}
+        self.__frequencies: Optional[_TopK] = None
+
+    def __entries(self) -> Iterable[_ResolvedTarget]:
+        if self.__latest is not None:
+            return self.__latest.values()
+        return itertools.islice(self.__resolved, self.__frozen_length)
+
+    def _resolve(self, name: str, environment: int, capacity: int, bounded: bool):
+        self.__resolve_count += 1
+        resolved = _ResolvedTarget(name, environment, self.__resolve_count)
+        if bounded:
+            # only keep the last resolution of each target
+            if self.__latest is None:
+                self.__latest = {(r.name, r.environment): r for r in self.__resolved}
+                self.__resolved = []
+            self.__latest[(name, environment)] = resolved
+        else:
+            if self.__latest is not None:
+                self.__resolved = list(self.__latest.values())
+                self.__latest = None
+            self.__resolved.append(resolved)
+        if capacity > 0 and any(t.is_dynamic for t in self.__targets):
+            if self.__frequencies is None:
+                self.__frequencies = _TopK(capacity)
+            self.__frequencies.add(name)
+
+    def _compact(self):
+        self.__resolved = []
+        self.__latest = None
+        self.__watched = {}
+        self.__frequencies = None
+        self.__resolve_count = 0
+
+    def _load_usage(self, counts: List[Tuple[str, int]], capacity: int):
+        # resolutions counted by other processes, only used by the predictions
+        if capacity > 0 and any(t.is_dynamic for t in self.__targets):
+            if self.__frequencies is None:
+                self.__frequencies = _TopK(capacity)
+            for name, count in sorted(counts, key=lambda c: c[1], reverse=True):
+                self.__frequencies.add(name, count)
+
+    def _freeze(self) -> "Dependency":
+        # shares everything but the containers modified in place, which are
+        # bounded (the unbounded list of resolutions is only appended to)
+        frozen = copy.copy(self)
+        if self.__latest is not None:
+            frozen.__latest = self.__latest.copy()
+        else:
+            frozen.__frozen_length = len(self.__resolved)
+        if self.__frequencies is not None:
+            frozen.__frequencies = self.__frequencies.copy()
+        return frozen
+
+    def _watch_reset(self, environment: Optional[int]):
+        if environment is None:
+            self.__watched = {None: self.__resolve_count}
+        else:
+            self.__watched = {**self.__watched, environment: self.__resolve_count}
 
-    def _resolve(self, name: str):
-        self.__resolved.append(_ResolvedTarget(name))
-
-    def _watch_reset(self):
-        for r in self.__resolved:
-            r.watch_reset()
+    def _resolved_last_watch(self, environment: Optional[int]) -> List[str]:
+        watched = self.__watched.get(None, 0)
+        return [
+            r.name
+            for r in self.__entries()
+            if (environment is None or r.environment == environment)
+            and r.sequence > max(watched, self.__watched.get(r.environment, 0))
+        ]
 
     @property
     def type(self) -> str:
         """The type of dependency. May be one of ``"extends"``, ``"include"`` or
-        ``"import"``.
+        ``"import"``, or a kind declared by another extension (see
+        `DependencyGraph.register_kind <#jinja2td.DependencyGraph.register_kind>`_).
         """
         return self.__type
 
@@ -151,6 +451,47 @@ class Dependency:
         """
         return self.__imported_names
 
+    @property
+    def inlined(self) -> Optional[bool]:
+        """Whether the included template was inlined at compile time. Inlined
+        templates are not loaded when rendering, so they don't appear in
+        `resolved <#jinja2td.Dependency.resolved>`_.
+
+        .. note::
+           Only available with ``"include"`` dependencies, see
+           `Introspection <#jinja2td.Introspection>`_.
+        """
+        return self.__inlined
+
+    @property
+    def loop_depth(self) -> int:
+        """The number of ``{% for %}`` loops the dependency is nested in."""
+        return self.__loop_depth
+
+    @property
+    def in_macro(self) -> bool:
+        """Whether the dependency is inside a ``{% macro %}``, in which case it
+        is executed each time the macro is called.
+        """
+        return self.__in_macro
+
+    @property
+    def in_call_block(self) -> bool:
+        """Whether the dependency is inside a ``{% call %}`` block, in which
+        case it is executed each time the macro calls ``caller()``.
+        """
+        return self.__in_call_block
+
+    @property
+    def resolve_count(self) -> int:
+        """The number of times the dependency was resolved while rendering.
+
+        .. warning::
+           Like `resolved <#jinja2td.Dependency.resolved>`_, resolutions in
+           async environments aren't counted by default.
+        """
+        return self.__resolve_count
+
     @property
     def resolved(self) -> List[str]:
         """The names of the templates actually imported by this dependency.
@@ -160,12 +501,177 @@ class Dependency:
            default. See `DependencyGraph.used_last_watch <#jinja2td.DependencyGraph.used_last_watch>`_
            for more information.
         """
-        return [r.name for r in self.__resolved]
+        return [r.name for r in self.__entries()]
 
     @property
     def resolved_last_watch(self) -> List[str]:
         """The names of the templates imported during the last watch.="""
-        return [r.name for r in self.__resolved if r.last_watch]
+        return self._resolved_last_watch(None)
+
+    def predict(self, k: Optional[int] = None) -> List[Tuple[str, int]]:
+        """Get the templates most often resolved by a dynamic dependency.
+
+        Only the `prediction_capacity <#jinja2td.DependencyGraph.prediction_capacity>`_
+        most frequent targets are tracked, so the counts are estimates (they
+        may be overestimated for targets that entered the ranking late).
+
+        :param k: The maximum number of templates to return, or ``None`` to
+                  return all the tracked templates.
+
+        :returns: The names of the templates with their estimated resolution
+                  counts, most frequent first. Static dependencies always
+                  return an empty list.
+        """
+        if self.__frequencies is None:
+            return []
+        return self.__frequencies.most_common(k)
+
+
+def _describe(dependency: Dependency) -> tuple:
+    # what the dependency is, without its runtime data: dependencies are
+    # compared by identity, as a template may have the same one several times
+    return (
+        dependency.type,
+        tuple((t.is_dynamic, t.name, t._fragments) for t in dependency.targets),
+        dependency.with_context,
+        dependency.ignore_missing,
+        dependency.imported_as,
+        (
+            None
+            if dependency.imported_names is None
+            else tuple(dependency.imported_names)
+        ),
+        dependency.inlined,
+        dependency.loop_depth,
+        dependency.in_macro,
+        dependency.in_call_block,
+    )
+
+
+class Block:
+    """A ``{% block %}`` defined by a template."""
+
+    def __init__(
+        self,
+        name: str,
+        calls_super: bool,
+        scoped: bool,
+        required: bool,
+        parent: Optional[str],
+    ):
+        """Initialises a new `Block` class.
+
+        This class should not be instantiated manually.
+        """
+        self.__name = name
+        self.__calls_super = calls_super
+        self.__scoped = scoped
+        self.__required = required
+        self.__parent = parent
+
+    def __repr__(self):
+        return f"Block(name={self.__name}, calls_super={self.__calls_super})"
+
+    def __eq__(self, other):
+        if not isinstance(other, Block):
+            return NotImplemented
+
+        return (
+            self.__name == other.__name
+            and self.__calls_super == other.__calls_super
+            and self.__scoped == other.__scoped
+            and self.__required == other.__required
+            and self.__parent == other.__parent
+        )
+
+    @property
+    def name(self) -> str:
+        """The name of the block."""
+        return self.__name
+
+    @property
+    def calls_super(self) -> bool:
+        """Whether the block renders the block of the parent template with
+        ``super()``.
+        """
+        return self.__calls_super
+
+    @property
+    def scoped(self) -> bool:
+        """Whether the block is ``scoped``."""
+        return self.__scoped
+
+    @property
+    def required(self) -> bool:
+        """Whether the block is ``required``."""
+        return self.__required
+
+    @property
+    def parent(self) -> Optional[str]:
+        """The name of the block this one is nested in, or ``None`` if it is
+        not nested.
+        """
+        return self.__parent
+
+
+class CompileStats:
+    """Measurements taken while compiling a template.
+
+    Durations are in seconds.
+    """
+
+    def __init__(
+        self,
+        preprocess: float,
+        parse: float,
+        codegen: float,
+        compile: Optional[float],
+        code_size: int,
+    ):
+        """Initialises a new `CompileStats` class.
+
+        This class should not be instantiated manually.
+        """
+        self.__preprocess = preprocess
+        self.__parse = parse
+        self.__codegen = codegen
+        self.__compile = compile
+        self.__code_size = code_size
+
+    def __repr__(self):
+        return f"CompileStats(total={self.total:.6f}, code_size={self.__code_size})"
+
+    @property
+    def preprocess(self) -> float:
+        """Time spent in the ``preprocess`` methods of the extensions."""
+        return self.__preprocess
+
+    @property
+    def parse(self) -> float:
+        """Time spent lexing and parsing the template, preprocessing excluded."""
+        return self.__parse
+
+    @property
+    def codegen(self) -> float:
+        """Time spent generating the Python source code."""
+        return self.__codegen
+
+    @property
+    def compile(self) -> Optional[float]:
+        """Time spent compiling the Python source code to bytecode, or ``None``
+        if only the source code was generated.
+        """
+        return self.__compile
+
+    @property
+    def total(self) -> float:
+        """Total time spent compiling the template."""
+        return self.__preprocess + self.__parse + self.__codegen + (self.__compile or 0)
+
+    @property
+    def code_size(self) -> int:
+        """Length of the generated Python source code."""
+        return self.__code_size
 
 
 class Template:
@@ -182,25 +688,117 @@ class Template:
         self.__name = name
         self.__file = file
         self.__deps: List[Dependency] = []
+        self.__dep_keys: Dict[Hashable, int] = {}
+        self.__occurrences: Dict[Hashable, int] = {}
         self.__modified = False
         self.__graph = graph
+        self.__compile_stats: Optional[CompileStats] = None
+        self.__blocks: Dict[str, Block] = {}
+        self.__render_count = 0
+        self.__checksum: Optional[int] = None
+        self.__version = 0
+        self.__activity = 0
 
-    def _set_modified(self):
-        self.__modified = False
+    @property
+    def _version(self) -> int:
+        # incremented each time the structure of the template changes
+        return self.__version
+
+    @property
+    def _activity(self) -> int:
+        # incremented each time its runtime data changes (renders, resolutions)
+        return self.__activity
+
+    def _freeze(self) -> "Template":
+        # see DependencyGraph.snapshot, the blocks are replaced rather than
+        # modified and the dependencies share their data
+        frozen = copy.copy(self)
+        frozen.__graph = None
+        frozen.__deps = [d._freeze() for d in self.__deps]
+        frozen.__dep_keys = {}
+        frozen.__occurrences = {}
+        return frozen
+
+    def _bind(self, graph) -> "Template":
+        # a view of a frozen template, sharing its data
+        bound = copy.copy(self)
+        bound.__graph = graph
+        return bound
+
+    def _set_modified(self, recompiled: bool):
+        self.__modified = True
+        self.__occurrences = {}
+        if recompiled:
+            # the blocks of the new source are added again
+            self.__blocks = {}
+        self.__version += 1
+
+    def _set_file(self, file: str):
+        self.__file = file
+        self.__version += 1
 
-    def _add_dependency(self, dependency: Dependency) -> int:
-        for i, d in enumerate(self.__deps):
-            if d == dependency:
-                return i  # don't register the same dependency twice
+    def _add_dependency(
+        self, dependency: Dependency, key: Optional[Hashable] = None
+    ) -> int:
+        if key is not None:
+            # the same dependency may appear several times in the template, a
+            # site is the nth occurrence of it since the template was compiled
+            n = self.__occurrences.get(key, 0)
+            self.__occurrences[key] = n + 1
+            site = (key, n)
+            if site in self.__dep_keys:
+                return self.__dep_keys[site]  # compiled again, don't register it twice
+            self.__dep_keys[site] = len(self.__deps)
         self.__deps.append(dependency)
+        self.__version += 1
         return len(self.__deps) - 1
 
-    def _resolve_dependency(self, dependency_id: int, name: str):
-        self.__deps[dependency_id]._resolve(name)
+    def _get_dependency(self, dependency_id: int) -> Dependency:
+        return self.__deps[dependency_id]
 
-    def _watch_reset(self):
+    def _resolve_dependency(
+        self,
+        dependency_id: int,
+        name: str,
+        environment: int,
+        capacity: int,
+        bounded: bool,
+    ):
+        self.__deps[dependency_id]._resolve(name, environment, capacity, bounded)
+        self.__activity += 1
+
+    def _load_usage(
+        self, dependency_id: int, counts: List[Tuple[str, int]], capacity: int
+    ):
+        self.__deps[dependency_id]._load_usage(counts, capacity)
+        self.__activity += 1
+
+    def _compact(self):
+        self.__render_count = 0
         for d in self.__deps:
-            d._watch_reset()
+            d._compact()
+        self.__activity += 1
+
+    def _count_render(self):
+        self.__render_count += 1
+        self.__activity += 1
+
+    def _add_block(self, block: Block):
+        self.__blocks = {**self.__blocks, block.name: block}
+        self.__version += 1
+
+    def _set_compile_stats(self, stats: CompileStats):
+        self.__compile_stats = stats
+        self.__version += 1
+
+    def _set_checksum(self, checksum: int):
+        self.__checksum = checksum
+        self.__version += 1
+
+    def _watch_reset(self, environment: Optional[int]):
+        for d in self.__deps:
+            d._watch_reset(environment)
+        self.__activity += 1
 
     @property
     def name(self) -> str:
@@ -224,6 +822,41 @@ class Template:
         """`True` if the template was loaded multiple times."""
         return self.__modified
 
+    @property
+    def blocks(self) -> List[Block]:
+        """The blocks defined by this template."""
+        return list(self.__blocks.values())
+
+    def get_block(self, name: str) -> Optional[Block]:
+        """Get a block defined by this template.
+
+        :param name: The name of the block.
+
+        :returns: The block, or ``None`` if this template doesn't define it.
+        """
+        return self.__blocks.get(name)
+
+    @property
+    def render_count(self) -> int:
+        """The number of times the template was rendered, including when it is
+        included in or extended by another template.
+        """
+        return self.__render_count
+
+    @property
+    def compile_stats(self) -> Optional[CompileStats]:
+        """Measurements of the last compilation of this template, or ``None`` if
+        it wasn't compiled by the environment (e.g. loaded from bytecode cache).
+        """
+        return self.__compile_stats
+
+    @property
+    def checksum(self) -> Optional[int]:
+        """A 64-bit hash of the source of the template, or ``None`` if the
+        source was never seen (e.g. loaded from bytecode cache).
+        """
+        return self.__checksum
+
     def get_includes(self) -> List[Dependency]:
         """Get all ``"include"`` dependencies.
 
@@ -300,35 +933,459 @@ class DependencyGraph:
     """A collection of templates and their dependencies.
 
     This is the type of the ``dependencies`` attribute of the environment.
+    A graph can be shared by several environments using the same templates, see
+    `Introspection.sharing <#jinja2td.Introspection.sharing>`_.
+
+    The graph is built lazily: compiling and rendering templates only records
+    what happened, and the templates and dependencies are updated the next time
+    the graph is queried. The objects it returns reflect the state of the graph
+    at the time of the last query.
     """
 
     def __init__(self):
         """Initialises a new `DependencyGraph` class.
 
-        This class should not be instantiated manually.
+        You only need to create one yourself to share it between environments.
         """
         self.__templates: Dict[str, Template] = {}
         self.__watch_async = False
+        self.__prediction_capacity = 16
+        self.__bounded = False
+        self.__environments: MutableSet[jinja2.Environment] = weakref.WeakSet()
+        self.__subscriptions: List[Subscription] = []
+        # whether a subscription needs the events as soon as they happen
+        self.__eager = False
+        # the up-to-date checks of the templates inlined in each template
+        self.__inlined: MutableMapping[
+            jinja2.Environment, Dict[str, List[Callable[[], bool]]]
+        ] = weakref.WeakKeyDictionary()
+        # the templates kept by memoized call sites, keyed by the id of the
+        # environment (kept alive by the template), the name of the dependent
+        # and the name of the target
+        self.__sites_by_target: Dict[str, Set[Tuple[int, str, str]]] = {}
+        self.__sites_by_dependent: Dict[str, Set[Tuple[int, str, str]]] = {}
+        self.__site_names: Dict[Tuple[int, str, str], Tuple[str, str]] = {}
+        self._sites: Dict[Tuple[int, str, str], jinja2.Template] = {}
+        self.__names: Set[str] = set()
+        self.__pending: Deque[tuple] = deque()
+        self.__lock = threading.RLock()
+        # per thread: the number of dependencies registered on each line of
+        # the templates being compiled, see _register_dependency
+        self.__compiling = threading.local()
+        # the dependency of each id, by dependent
+        self.__dependencies: Dict[str, Dict[int, Tuple[Template, int]]] = {}
+        self.__manifests: Set[str] = set()
+        self.__files: Dict[str, Set[str]] = {}
+        self.__version = 0
+        self.__snapshot = None
+        self.__frozen: Dict[str, Tuple[Tuple[int, int], Template]] = {}
+        self.__metrics: Optional["_MetricsIndex"] = None
+        self.__kinds: Dict[str, bool] = {}
+        # the tags the scanner reads, with their kind and the function getting
+        # the target from the tokens of the tag
+        self.__scanned_tags: Dict[
+            str, Tuple[str, Callable[[List["Token"]], Optional[str]]]
+        ] = {}
+        self.__hinting = 0
+        self.__dependency_types: Dict[str, Dict[int, str]] = {}
+        self.__usage: Optional["UsageWriter"] = None
+        self.__structure = 0
+        self.__batch: Optional[Tuple[int, "_BatchIndex"]] = None
+        # the loader of each environment, and the names it was missing with
+        # the time until which they are considered missing
+        self.__missing: MutableMapping[
+            jinja2.Environment, Tuple[Any, Dict[str, float]]
+        ] = weakref.WeakKeyDictionary()
+        # its own lock, not to make every load wait for the graph
+        self.__missing_lock = threading.Lock()
+
+    def _attach(self, environment: jinja2.Environment):
+        self.__environments.add(environment)
+
+    def _unsubscribe(self, subscription: Subscription):
+        # replaced rather than modified, so that it can be iterated safely
+        self.__subscriptions = [
+            s for s in self.__subscriptions if s is not subscription
+        ]
+        self.__eager = any(not s._batched for s in self.__subscriptions)
+
+    def _materialize(self):
+        # the batched subscriptions build the events from their own thread
+        self.__materialize()
+
+    def __emit(self, event_type: str, *args):
+        event = None
+        for s in self.__subscriptions:
+            if s._wants(event_type):
+                if event is None:
+                    event = Event(event_type, *args)
+                s._push(event)
+
+    def _resolve_site(
+        self,
+        site: Tuple[int, str, str],
+        environment: jinja2.Environment,
+        target: str,
+        dependent: str,
+    ) -> jinja2.Template:
+        template = environment.get_template(target, dependent)
+        self._sites[site] = template
+        self.__site_names[site] = (template.name, dependent)
+        self.__sites_by_target.setdefault(template.name, set()).add(site)
+        self.__sites_by_dependent.setdefault(dependent, set()).add(site)
+        return template
+
+    def __drop_sites(self, sites: Optional[Set[Tuple[int, str, str]]]):
+        for site in list(sites or ()):
+            self._sites.pop(site, None)
+            target, dependent = self.__site_names.pop(site, (None, None))
+            self.__sites_by_target.get(target, set()).discard(site)
+            self.__sites_by_dependent.get(dependent, set()).discard(site)
+
+    def _is_missing(self, environment: jinja2.Environment, name: str) -> bool:
+        with self.__missing_lock:
+            entry = self.__missing.get(environment)
+            if entry is None:
+                return False
+            loader, missing = entry
+            if loader is not environment.loader:
+                # the environment was given another loader
+                del self.__missing[environment]
+                return False
+            until = missing.get(name)
+            if until is None:
+                return False
+            if until < time.monotonic():
+                del missing[name]
+                return False
+            return True
+
+    def _add_missing(
+        self, environment: jinja2.Environment, name: str, ttl: Optional[float]
+    ):
+        with self.__missing_lock:
+            entry = self.__missing.get(environment)
+            if entry is None or entry[0] is not environment.loader:
+                entry = self.__missing[environment] = (environment.loader, {})
+            entry[1][name] = float("inf") if ttl is None else time.monotonic() + ttl
+
+    def __drop_missing(self, name: str):
+        with self.__missing_lock:
+            for _, missing in list(self.__missing.values()):
+                missing.pop(name, None)
 
     def _add_template(self, name: str, file: Optional[str]):
+        if self.__missing:
+            self.__drop_missing(name)
+        if self._sites:
+            # the template is being (re)compiled: call sites loading it must
+            # fetch the new version, and its own call sites are obsolete
+            self.__drop_sites(self.__sites_by_target.pop(name, None))
+            self.__drop_sites(self.__sites_by_dependent.pop(name, None))
+
+        self.__names.add(name)
+        self.__lines()[name] = {}
+        # the ids of the previous compilation are obsolete, unless the
+        # template is only parsed to be inlined
+        recompiled = not getattr(self.__compiling, "inlining", 0)
+        if recompiled:
+            self.__dependency_types.pop(name, None)
+        self.__record(("template", name, file, recompiled))
+
+    def __lines(self) -> Dict[str, Dict[int, int]]:
+        lines = getattr(self.__compiling, "lines", None)
+        if lines is None:
+            lines = self.__compiling.lines = {}
+        return lines
+
+    @contextlib.contextmanager
+    def _inlining(self) -> Iterator[None]:
+        # the templates added meanwhile are parsed, not compiled
+        self.__compiling.inlining = getattr(self.__compiling, "inlining", 0) + 1
+        try:
+            yield
+        finally:
+            self.__compiling.inlining -= 1
+
+    def _evict(self, name: str):
+        # bounded mode: the template left the cache of an environment
+        for env in list(self.__environments):
+            if (
+                env.cache is not None
+                and env.loader is not None
+                and (weakref.ref(env.loader), name) in env.cache
+            ):
+                return  # still cached by another environment
+
+        self.__materialize()
+        with self.__lock:
+            self.__names.discard(name)
+            for inlined in list(self.__inlined.values()):
+                inlined.pop(name, None)
+            self.__drop_sites(self.__sites_by_dependent.pop(name, None))
+            self.__dependencies.pop(name, None)
+            self.__dependency_types.pop(name, None)
+            template = self.__templates.pop(name, None)
+            if template is None:
+                return
+            self.__unindex_file(name, template.file)
+            if self.__metrics is not None:
+                self.__metrics.invalidate(name)
+            self.__structure += 1
+            self.__version += 1
+
+    def __record(self, record: tuple):
+        self.__pending.append(record)
+        # the events of the batched subscriptions are built when they are
+        # delivered, off the rendering threads
+        count = len(self.__pending)
+        if self.__eager or count >= 4 * _MAX_PENDING:
+            self.__materialize()
+        elif count >= _MAX_PENDING:
+            if not self.__subscriptions:
+                self.__materialize()
+            elif count == _MAX_PENDING:
+                for s in self.__subscriptions:
+                    s._wake()  # deliver the batch early
+
+    def __materialize(self):
+        # build the objects from the records left by the compiler and the
+        # rendered templates, in the order they were recorded
+        with self.__lock:
+            if self.__pending:
+                self.__version += 1
+            while self.__pending:
+                record = self.__pending.popleft()
+                kind = record[0]
+                if kind == "template":
+                    self.__materialize_template(*record[1:])
+                elif kind == "dependency":
+                    self.__materialize_dependency(*record[1:])
+                elif kind == "resolution":
+                    self.__materialize_resolution(*record[1:])
+                elif kind == "render":
+                    template = self.__templates.get(record[1])
+                    if template is not None:
+                        template._count_render()
+                elif kind == "block":
+                    if record[1] in self.__templates:
+                        self.__templates[record[1]]._add_block(record[2])
+                elif kind == "checksum":
+                    if record[1] in self.__templates:
+                        self.__templates[record[1]]._set_checksum(record[2])
+                elif kind == "compilation":
+                    if record[1] in self.__templates:
+                        self.__templates[record[1]]._set_compile_stats(
+                            CompileStats(**record[2])
+                        )
+
+    def __materialize_template(
+        self, name: str, file: Optional[str], recompiled: bool
+    ):
+        if recompiled:
+            self.__dependencies.pop(name, None)
+        if self.__metrics is not None:
+            self.__metrics.invalidate(name)
+        self.__structure += 1
         if name in self.__templates:
-            self.__templates[name]._set_modified()
+            template = self.__templates[name]
+            template._set_modified(recompiled)
+            if file is not None and file != template.file:
+                # loaded from another file, e.g. by another loader
+                self.__unindex_file(name, template.file)
+                template._set_file(file)
+                self.__files.setdefault(_normalize_path(file), set()).add(name)
+            if self.__bounded:
+                # the compiled template the runtime data was about is replaced
+                self.__templates[name]._compact()
+            if self.__subscriptions:
+                self.__emit(events.TEMPLATE_RECOMPILED, name)
         else:
             self.__templates[name] = Template(name, file, self)
+            if file is not None:
+                self.__files.setdefault(_normalize_path(file), set()).add(name)
+            if self.__subscriptions:
+                self.__emit(events.TEMPLATE_REGISTERED, name)
+
+    def __unindex_file(self, name: str, file: Optional[str]):
+        if file is not None:
+            path = _normalize_path(file)
+            names = self.__files.get(path, set())
+            names.discard(name)
+            if not names:
+                self.__files.pop(path, None)
+
+    def __materialize_dependency(
+        self,
+        dependent: str,
+        dependency_id: int,
+        dependency_type: str,
+        targets: List[tuple],
+        kwargs: dict,
+    ):
+        template = self.__templates[dependent]
+        dependency = Dependency(
+            dependency_type, [Target(*target) for target in targets], **kwargs
+        )
+        count = len(template.dependencies)
+        index = template._add_dependency(dependency, _describe(dependency))
+        by_id = self.__dependencies.setdefault(dependent, {})
+        by_id[dependency_id] = (template, index)
+        if index == count:
+            self.__structure += 1
+            if self.__metrics is not None:
+                self.__metrics.invalidate(dependent)
+        if self.__subscriptions and index == count:
+            self.__emit(events.DEPENDENCY_REGISTERED, dependent, dependency)
+
+    def __materialize_resolution(
+        self, dependent: str, dependency_id: int, name: str, environment: int
+    ):
+        location = self.__dependencies.get(dependent, {}).get(dependency_id)
+        if location is None:
+            return
+        template, index = location
+        template._resolve_dependency(
+            index,
+            name,
+            environment,
+            self.__prediction_capacity,
+            self.__bounded,
+        )
+        if self.__subscriptions:
+            self.__emit(
+                events.DEPENDENCY_RESOLVED,
+                template.name,
+                template._get_dependency(index),
+                name,
+            )
 
     def _register_dependency(
         self,
         dependent: str,
         dependency_type: str,
-        targets: List[Target],
+        targets: List[tuple],
+        lineno: int = 0,
         **kwargs,
     ) -> int:
-        dependency = Dependency(dependency_type, targets, **kwargs)
-
-        if dependent not in self.__templates:
+        # each target is the tuple of arguments of its Target
+        if dependent not in self.__names:
             raise ValueError(f"No such template: {dependent}")
 
-        return self.__templates[dependent]._add_dependency(dependency)
+        # the id is the position of the dependency in the source, so that the
+        # same compiled code (bytecode cache, ModuleLoader) means the same
+        # dependency in every process
+        lines = self.__lines().setdefault(dependent, {})
+        n = lines.get(lineno, 0)
+        lines[lineno] = n + 1
+        dependency_id = (lineno << 20) | n
+        self._load_dependency(
+            dependent, dependency_id, dependency_type, targets, kwargs
+        )
+        return dependency_id
+
+    def _load_dependency(
+        self,
+        dependent: str,
+        dependency_id: int,
+        dependency_type: str,
+        targets: List[tuple],
+        kwargs: dict,
+    ):
+        types = self.__dependency_types.setdefault(dependent, {})
+        types[dependency_id] = dependency_type
+        self.__record(
+            ("dependency", dependent, dependency_id, dependency_type, targets, kwargs)
+        )
+
+    def _describe_dependency(
+        self, dependent: str, dependency_id: int
+    ) -> Optional[Tuple[str, tuple]]:
+        # the type and targets, which identify a dependency across processes
+        self.__materialize()
+        location = self.__dependencies.get(dependent, {}).get(dependency_id)
+        if location is None:
+            return None
+        d = location[0].dependencies[location[1]]
+        return d.type, tuple((t.is_dynamic, t.name, t._fragments) for t in d.targets)
+
+    def _stop_usage(self, writer: "UsageWriter"):
+        if self.__usage is writer:
+            self.__usage = None
+
+    def _load_usage(
+        self,
+        dependent: str,
+        dependency_type: str,
+        targets: tuple,
+        counts: List[Tuple[str, int]],
+    ) -> bool:
+        self.__materialize()
+        with self.__lock:
+            template = self.__templates.get(dependent)
+            if template is None:
+                return False
+            for index, d in enumerate(template.dependencies):
+                if d.type == dependency_type and targets == tuple(
+                    (t.is_dynamic, t.name, t._fragments) for t in d.targets
+                ):
+                    template._load_usage(index, counts, self.__prediction_capacity)
+                    self.__version += 1
+                    return True
+            return False
+
+    def _registered(self) -> List[Tuple[Template, int, List[int]]]:
+        # the dependencies with the ids used by the code of the templates, as
+        # registered by their last compilation
+        self.__materialize()
+        ids: Dict[Tuple[Template, int], List[int]] = {}
+        with self.__lock:
+            for by_id in self.__dependencies.values():
+                for dependency_id, location in by_id.items():
+                    ids.setdefault(location, []).append(dependency_id)
+        return [(t, index, sorted(i)) for (t, index), i in ids.items()]
+
+    def _load_manifest(self, path: str):
+        with self.__lock:
+            if path in self.__manifests:
+                return
+            self.__manifests.add(path)
+
+        from .manifest import read_manifest
+
+        read_manifest(self, path)
+
+    def _set_inlined(
+        self,
+        environment: jinja2.Environment,
+        name: str,
+        uptodate: List[Callable[[], bool]],
+    ):
+        # environments sharing the graph may load different sources
+        if uptodate:
+            self.__inlined.setdefault(environment, {})[name] = uptodate
+        elif environment in self.__inlined:
+            self.__inlined[environment].pop(name, None)
+
+    def _inlined_up_to_date(self, environment: jinja2.Environment, name: str) -> bool:
+        inlined = self.__inlined.get(environment)
+        return inlined is None or all(u() for u in inlined.get(name, ()))
+
+    def _count_render(self, name: str):
+        if name in self.__names:
+            self.__record(("render", name))
+
+    def _register_block(self, dependent: str, block: Block):
+        if dependent in self.__names:
+            self.__record(("block", dependent, block))
+
+    def _record_compilation(self, name: str, **kwargs):
+        if name in self.__names:
+            self.__record(("compilation", name, kwargs))
+
+    def _set_checksum(self, name: str, checksum: int):
+        if name in self.__names:
+            self.__record(("checksum", name, checksum))
 
     def _resolve_dependency(
         self,
@@ -336,10 +1393,25 @@ class DependencyGraph:
         dependency_id: int,
         template: jinja2.Template,
     ) -> jinja2.Template:
-        if dependent in self.__templates and template.name is not None:
-            self.__templates[dependent]._resolve_dependency(
-                dependency_id, template.name
+        if dependent in self.__names and template.name is not None:
+            self.__record(
+                (
+                    "resolution",
+                    dependent,
+                    dependency_id,
+                    template.name,
+                    id(template.environment),
+                )
             )
+            if self.__usage is not None:
+                self.__usage._count(dependent, dependency_id, template.name)
+            if self.__hinting:
+                callback = _hints.get()
+                if callback is not None:
+                    dependency_type = self.__dependency_types.get(dependent, {}).get(
+                        dependency_id
+                    )
+                    callback(dependent, dependency_type, template.name)
         # otherwise, ignore silently not to break existing code
 
         return template
@@ -347,6 +1419,7 @@ class DependencyGraph:
     @property
     def templates(self) -> List[Template]:
         """All the templates known to the environment."""
+        self.__materialize()
         return list(self.__templates.values())
 
     @property
@@ -358,6 +1431,41 @@ class DependencyGraph:
     def watch_async(self, value: bool):
         self.__watch_async = value
 
+    @property
+    def bounded(self) -> bool:
+        """Limit the memory used by the runtime data of the graph.
+
+        When enabled, each dependency only remembers the last resolution of
+        each target (so `Dependency.resolved <#jinja2td.Dependency.resolved>`_
+        has no duplicates), the resolutions and statistics of a template are
+        dropped when it is compiled again, and a template is removed from the
+        graph once the compiled template is pushed out of the cache of the
+        environments (``Environment.cache``, see the ``cache_size`` argument of
+        the environment). It is added back the next time it is compiled.
+
+        Defaults to ``False``.
+        """
+        return self.__bounded
+
+    @bounded.setter
+    def bounded(self, value: bool):
+        self.__materialize()
+        self.__bounded = value
+
+    @property
+    def prediction_capacity(self) -> int:
+        """The maximum number of targets tracked by each dynamic dependency
+        for `Dependency.predict <#jinja2td.Dependency.predict>`_.
+
+        Defaults to 16. Set it to 0 to disable the tracking.
+        """
+        return self.__prediction_capacity
+
+    @prediction_capacity.setter
+    def prediction_capacity(self, value: int):
+        self.__materialize()
+        self.__prediction_capacity = value
+
     def get_template(self, name: str) -> Optional[Template]:
         """Get a template.
 
@@ -367,19 +1475,779 @@ class DependencyGraph:
         :returns: The corresponding template, or None if the template is
                   unknown.
         """
+        self.__materialize()
         return self.__templates.get(name)
 
-    def watch(self):
+    def subscribe(
+        self,
+        callback: Callable,
+        types: Optional[Iterable[str]] = None,
+        batched: bool = False,
+        buffer_size: int = 4096,
+        interval: float = 1.0,
+    ) -> Subscription:
+        """Get notified of changes to the graph.
+
+        By default, the callback is called with each `Event <#jinja2td.Event>`_
+        as soon as it happens, in the thread compiling or rendering the
+        template. With ``batched=True``, events are kept in a ring buffer and
+        the callback is called with a list of events from a background thread,
+        so that it doesn't slow down rendering: the events are then built by
+        that thread, when the batch is delivered.
+
+        :param callback: The function to call.
+        :param types: The types of events to receive, or ``None`` to receive all
+                      of them.
+        :param batched: Whether to deliver events in batches.
+        :param buffer_size: The maximum number of events waiting to be
+                            delivered. When the buffer is full, the oldest
+                            events are dropped.
+        :param interval: The time between two batches, in seconds.
+
+        :returns: The subscription, that can be used to unsubscribe.
+        """
+        self.__materialize()
+        subscription = Subscription(
+            self, callback, types, batched, buffer_size, interval
+        )
+        self.__subscriptions = self.__subscriptions + [subscription]
+        self.__eager = self.__eager or not batched
+        return subscription
+
+    def slowest_to_compile(self, n: Optional[int] = None) -> List[Template]:
+        """Rank the templates by compilation time.
+
+        :param n: The maximum number of templates to return, or ``None`` to
+                  return all the templates that were compiled.
+
+        :returns: The templates that took the longest to compile, slowest
+                  first. See `Template.compile_stats <#jinja2td.Template.compile_stats>`_.
+        """
+        self.__materialize()
+        compiled = [t for t in self.__templates.values() if t.compile_stats]
+        compiled.sort(key=lambda t: t.compile_stats.total, reverse=True)
+        return compiled if n is None else compiled[:n]
+
+    def __update_metrics(self) -> "_MetricsIndex":
+        self.__materialize()
+        with self.__lock:
+            if self.__metrics is None:
+                from .metrics import _MetricsIndex
+
+                self.__metrics = _MetricsIndex()
+                for name in self.__templates:
+                    self.__metrics.invalidate(name)
+            self.__metrics.update(self.__templates)
+            return self.__metrics
+
+    def get_metrics(self, name: str) -> Optional["TemplateMetrics"]:
+        """Measure the dependencies of a template: the longest chain of
+        dependencies, the number of templates it needs, etc.
+
+        The metrics of all the templates are computed the first time, in a time
+        proportional to the size of the graph. They are then only updated for
+        the templates whose dependencies changed and their dependents.
+
+        :param name: The name of a template.
+
+        :returns: A `TemplateMetrics <#jinja2td.TemplateMetrics>`_, or ``None``
+                  if the template wasn't loaded.
+        """
+        metrics = self.__update_metrics()
+        with self.__lock:
+            if name not in self.__templates:
+                return None
+            return metrics.get(name)
+
+    def rank_by_metrics(
+        self, by: str = "depth", n: Optional[int] = None
+    ) -> List["TemplateMetrics"]:
+        """Rank the templates by one of their metrics, to find the ones worth
+        flattening (see `get_metrics <#jinja2td.DependencyGraph.get_metrics>`_).
+
+        :param by: The name of a property of `TemplateMetrics <#jinja2td.TemplateMetrics>`_:
+                   ``"depth"``, ``"extends_depth"``, ``"transitive_count"``,
+                   ``"fan_in"`` or ``"fan_out"``.
+        :param n: The maximum number of templates to return, or ``None`` to
+                  return all the templates.
+
+        :returns: The metrics of the templates, the highest first.
+        """
+        if by not in _RANKED_METRICS:
+            raise ValueError(f"Unknown metric: {by}")
+        metrics = self.__update_metrics()
+        with self.__lock:
+            # the templates compiled from strings are all named None
+            names = sorted(name for name in self.__templates if name is not None)
+            ranking = [metrics.get(name) for name in names]
+        ranking.sort(key=lambda m: getattr(m, by), reverse=True)
+        return ranking if n is None else ranking[:n]
+
+    def get_extends_chain(self, name: str) -> List[Template]:
+        """Get a template and its ancestors.
+
+        :param name: The name of a template.
+
+        :returns: The template, its parent, the parent of its parent and so on.
+                  The chain stops at the first dynamic or unknown parent.
+        """
+        self.__materialize()
+        chain: List[Template] = []
+        template = self.__templates.get(name)
+        while template is not None and template not in chain:
+            chain.append(template)
+            parent = template.get_parent()
+            if parent is None or parent.target is None or parent.target.is_dynamic:
+                break
+            template = self.__templates.get(parent.target.name)
+        return chain
+
+    def get_block_sources(self, name: str) -> Dict[str, List[str]]:
+        """Find which templates of an extends chain supply each block.
+
+        :param name: The name of the template at the bottom of the chain.
+
+        :returns: For each block name, the templates whose definition of the
+                  block is rendered: the closest one defining it, followed by
+                  the ones reached through ``super()`` calls.
+        """
+        sources: Dict[str, List[str]] = {}
+        done: Set[str] = set()
+        for template in self.get_extends_chain(name):
+            for block in template.blocks:
+                if block.name in done:
+                    continue
+                sources.setdefault(block.name, []).append(template.name)
+                if not block.calls_super:
+                    done.add(block.name)
+        return sources
+
+    def find_block_dependents(self, name: str, block: str) -> List[Template]:
+        """Find the templates affected by a change to one block.
+
+        :param name: The name of the template defining the block.
+        :param block: The name of the block.
+
+        :returns: The template and its descendants (through ``extends``) that
+                  render this definition of the block. Descendants overriding
+                  the block without calling ``super()`` are not affected.
+        """
+        self.__materialize()
+        affected: List[Template] = []
+        template = self.__templates.get(name)
+        queue = [] if template is None else [template]
+        while queue:
+            t = queue.pop(0)
+            if t in affected:
+                continue
+            if name in self.get_block_sources(t.name).get(block, []):
+                affected.append(t)
+                queue.extend(t.find_children())
+        return affected
+
+    def invalidate(self, name: str):
+        """Signal that a template has changed, or was created.
+
+        This is only needed when ``dependencies_memoize`` or
+        ``dependencies_cache_missing`` is enabled (see
+        `Introspection <#jinja2td.Introspection>`_), to make the templates using
+        this one load it again from the environment.
+
+        :param name: The name of the template that changed.
+        """
+        self.__drop_sites(self.__sites_by_target.pop(name, None))
+        self.__drop_missing(name)
+
+    def forget_missing(self, environment: Optional[jinja2.Environment] = None):
+        """Forget the templates known to be missing, see ``dependencies_cache_missing``
+        in `Introspection <#jinja2td.Introspection>`_.
+
+        :param environment: Only forget the templates missing from this
+                            environment.
+        """
+        with self.__missing_lock:
+            if environment is None:
+                self.__missing.clear()
+            else:
+                self.__missing.pop(environment, None)
+
+    def find_hot_spots(
+        self, n: Optional[int] = None, loop_iterations: float = 10.0
+    ) -> List[Tuple[Template, float]]:
+        """Rank the templates by the number of templates they include (or import
+        with context, or load through a kind of dependency declared as rendered,
+        see `register_kind <#jinja2td.DependencyGraph.register_kind>`_) each
+        time they are rendered.
+
+        For templates that were rendered, the number is measured using
+        `Dependency.resolve_count <#jinja2td.Dependency.resolve_count>`_ and
+        `Template.render_count <#jinja2td.Template.render_count>`_. For the
+        other ones, it is estimated from the nesting of the dependencies in
+        loops.
+
+        :param n: The maximum number of templates to return, or ``None`` to
+                  return all the templates with dependencies.
+        :param loop_iterations: The number of iterations assumed for each loop
+                                when estimating.
+
+        :returns: The templates with their number of includes per render, the
+                  highest first.
+        """
+        self.__materialize()
+        ranking = []
+        for t in self.__templates.values():
+            executed = [
+                d
+                for d in t.dependencies
+                if d.type == "include"
+                or (d.type == "import" and d.with_context)
+                or self.__kinds.get(d.type, False)
+            ]
+            if not executed:
+                continue
+            if t.render_count > 0:
+                score = sum(d.resolve_count for d in executed) / t.render_count
+            else:
+                score = sum(loop_iterations**d.loop_depth for d in executed)
+            ranking.append((t, score))
+        ranking.sort(key=lambda r: r[1], reverse=True)
+        return ranking if n is None else ranking[:n]
+
+    def find_templates_by_file(self, path: str) -> List[str]:
+        """Get the templates loaded from a file.
+
+        A file may be loaded as several templates, for example with a
+        ``PrefixLoader`` or a ``ChoiceLoader`` reaching it in different ways.
+
+        :param path: The path of the file. Relative paths are relative to the
+                     current directory.
+
+        :returns: The names of the templates, sorted.
+        """
+        self.__materialize()
+        return sorted(self.__files.get(_normalize_path(path), ()))
+
+    def find_affected_by_files(self, paths: Iterable[str]) -> List[str]:
+        """Get the templates whose output may change when some files change,
+        to only test or re-render those.
+
+        Dynamic dependencies are taken into account using their pattern (see
+        `Target.matches <#jinja2td.Target.matches>`_).
+
+        :param paths: The paths of the files changed. Files that weren't loaded
+                      as templates yet are new templates for the loaders
+                      reading their directory (``FileSystemLoader``, also
+                      through a ``ChoiceLoader`` or a ``PrefixLoader``), and
+                      affect the templates whose dynamic dependencies match
+                      them. Other files are ignored.
+
+        :returns: The names of the templates loaded from these files and of all
+                  the templates depending on them, directly or not, sorted.
+        """
+        self.__materialize()
+        names: Set[str] = set()
+        added: Set[str] = set()
+        for path in paths:
+            path = _normalize_path(path)
+            if path in self.__files:
+                names.update(self.__files[path])
+                continue
+            for environment in list(self.__environments):
+                if environment.loader is not None:
+                    added.update(_loader_names(environment.loader, path))
+        return _affected(names, self.__templates.values(), added)
+
+    def __batch_index(self) -> "_BatchIndex":
+        # rebuilt after the dependencies changed, shared by the queries until then
+        self.__materialize()
+        with self.__lock:
+            if self.__batch is None or self.__batch[0] != self.__structure:
+                from .batch import _BatchIndex
+
+                self.__batch = (
+                    self.__structure,
+                    _BatchIndex(self.__templates.values()),
+                )
+            return self.__batch[1]
+
+    def find_dependents_of(
+        self,
+        names: Iterable[str],
+        types: Optional[Iterable[str]] = None,
+        direct: bool = False,
+    ) -> List[str]:
+        """Get all the templates depending on any of several templates, in a
+        single traversal of the graph.
+
+        The static dependencies are kept in compact arrays, built the first
+        time and after the graph changes, and the dependents of all the
+        templates are found together (with NumPy when it is installed). This is
+        much faster than calling `find_dependents <#jinja2td.DependencyGraph.find_dependents>`_
+        or `Template.find_included <#jinja2td.Template.find_included>`_ for
+        each template.
+
+        :param names: The names of the templates.
+        :param types: Only follow the dependencies of these types (e.g.
+                      ``["include"]``), or ``None`` to follow all of them.
+        :param direct: Only get the templates depending directly on them.
+
+        :returns: The names of the dependent templates, sorted. They include
+                  templates of ``names`` depending on others.
+        """
+        index = self.__batch_index()
+        return index.reach(names, True, index.mask(types), direct)
+
+    def get_closure_of(
+        self,
+        names: Iterable[str],
+        types: Optional[Iterable[str]] = None,
+        direct: bool = False,
+    ) -> List[str]:
+        """Get all the templates that any of several templates depend on, in a
+        single traversal of the graph, see
+        `find_dependents_of <#jinja2td.DependencyGraph.find_dependents_of>`_.
+
+        :param names: The names of the templates.
+        :param types: Only follow the dependencies of these types, or ``None``
+                      to follow all of them.
+        :param direct: Only get the direct dependencies of the templates.
+
+        :returns: The names of the templates reachable from them, sorted.
+        """
+        index = self.__batch_index()
+        return index.reach(names, False, index.mask(types), direct)
+
+    def get_closure(self, name: str) -> List[str]:
+        """Get all the templates a template depends on, directly or not.
+
+        Only static targets are followed.
+
+        :param name: The name of a template.
+
+        :returns: The names of the templates reachable from this one, in
+                  breadth-first order. Templates that were never loaded are
+                  listed, but their own dependencies are unknown.
+        """
+        self.__materialize()
+        found: Dict[str, None] = {}
+        queue = [name]
+        while queue:
+            template = self.__templates.get(queue.pop(0))
+            if template is None:
+                continue
+            for d in template.dependencies:
+                for target in d.targets:
+                    if not target.is_dynamic and target.name not in found:
+                        found[target.name] = None
+                        queue.append(target.name)
+        found.pop(name, None)
+        return list(found)
+
+    def find_dependents(self, name: str) -> List[str]:
+        """Get all the templates depending on a template, directly or not.
+
+        Only static targets are followed.
+
+        :param name: The name of a template.
+
+        :returns: The names of the templates that would be affected by a change
+                  to this one, in breadth-first order.
+        """
+        self.__materialize()
+        dependents: Dict[str, List[str]] = {}
+        for t in self.__templates.values():
+            for d in t.dependencies:
+                for target in d.targets:
+                    if not target.is_dynamic:
+                        dependents.setdefault(target.name, []).append(t.name)
+
+        found: Dict[str, None] = {}
+        queue = [name]
+        while queue:
+            for dependent in dependents.get(queue.pop(0), []):
+                if dependent not in found:
+                    found[dependent] = None
+                    queue.append(dependent)
+        found.pop(name, None)
+        return list(found)
+
+    def export(self, path: str):
+        """Write the static part of the graph to a binary file, which can be
+        opened with `MappedGraph <#jinja2td.MappedGraph>`_.
+
+        :param path: The file to write.
+        """
+        from .mapped import write_graph
+
+        write_graph(self, path)
+
+    def scan(
+        self, environment: jinja2.Environment, names: Optional[Iterable[str]] = None
+    ) -> List[str]:
+        """Add templates to the graph without compiling them.
+
+        Only the lexer is run to find the ``extends``, ``include``, ``import``
+        and ``from`` statements, which is much faster than parsing. Templates
+        with statements the lexer alone can't make sense of (dynamic targets,
+        or the tags of other extensions unless their kind can read them, see
+        `register_kind <#jinja2td.DependencyGraph.register_kind>`_) are
+        compiled instead, without generating the Python bytecode.
+
+        Syntax errors found by the lexer are raised, the other ones are only
+        found when the templates are compiled.
+
+        :param environment: The environment to load the templates from. It must
+                            be using this graph.
+        :param names: The names of the templates to scan, or ``None`` to scan
+                      all the templates listed by the loader of the environment.
+
+        :returns: The names of the templates that had to be compiled.
+        """
+        from .scan import scan
+
+        return scan(self, environment, names)
+
+    def bundle(
+        self,
+        environment: jinja2.Environment,
+        entries: Iterable[str],
+        path: str,
+        compiled: bool = False,
+    ) -> List[str]:
+        """Write the templates needed to render some templates to a zip file,
+        and only those.
+
+        The templates included are the entry templates and their static
+        dependencies, directly or not, plus the targets dynamic dependencies
+        resolved to so far (see `Dependency.resolved <#jinja2td.Dependency.resolved>`_
+        and `Dependency.predict <#jinja2td.Dependency.predict>`_). Templates
+        missing from the graph are scanned (see `scan <#jinja2td.DependencyGraph.scan>`_).
+
+        :param environment: The environment to load the templates from. It must
+                            be using this graph.
+        :param entries: The names of the templates that will be rendered.
+        :param path: The zip file to write.
+        :param compiled: Whether to write the compiled templates, to be loaded
+                         with a ``jinja2.ModuleLoader``, instead of their source
+                         to be loaded with a `BundleLoader <#jinja2td.BundleLoader>`_.
+                         The loader of the environment must be able to list
+                         its templates to compile them.
+
+        :returns: The names of the templates written.
+        """
+        from .bundle import write_bundle
+
+        return write_bundle(self, environment, entries, path, compiled)
+
+    def snapshot(self) -> "GraphSnapshot":
+        """Get a read-only copy of the graph in its current state.
+
+        The snapshot doesn't change when templates are compiled or rendered
+        afterwards, and querying it doesn't lock the graph, so it can be used by
+        other threads without slowing down the ones rendering templates.
+
+        Taking a snapshot is cheap: the templates that didn't change since the
+        previous snapshot are shared with it, the others share their
+        dependencies and resolutions with the graph rather than copying them,
+        and the same snapshot is returned if nothing changed at all.
+
+        :returns: A `GraphSnapshot <#jinja2td.GraphSnapshot>`_.
+        """
+        from .snapshot import GraphSnapshot
+
+        self.__materialize()
+        with self.__lock:
+            if self.__snapshot is not None and self.__snapshot[0] == self.__version:
+                return self.__snapshot[1]
+
+            frozen = {}
+            for name, template in self.__templates.items():
+                previous = self.__frozen.get(name)
+                version = (template._version, template._activity)
+                if previous is None or previous[0] != version:
+                    previous = (version, template._freeze())
+                frozen[name] = previous
+            self.__frozen = frozen
+
+            snapshot = GraphSnapshot(
+                {name: t for name, (_, t) in frozen.items()},
+                {path: frozenset(names) for path, names in self.__files.items()},
+            )
+            self.__snapshot = (self.__version, snapshot)
+            return snapshot
+
+    def register_kind(
+        self,
+        kind: str,
+        rendered: bool = True,
+        scan: Optional[Dict[str, Callable[[List["Token"]], Optional[str]]]] = None,
+    ):
+        """Declare a kind of dependency, for extensions with tags loading other
+        templates (e.g. ``{% component "card" %}``).
+
+        The dependencies of this kind are then registered with
+        `add_dependency <#jinja2td.DependencyGraph.add_dependency>`_ and
+        `resolve <#jinja2td.DependencyGraph.resolve>`_, and are treated like the
+        built-in ones by the queries, the watch system, the predictions, etc.
+
+        It can be called several times with the same kind, for example by each
+        environment sharing the graph.
+
+        :param kind: The name of the kind, used as
+                     `Dependency.type <#jinja2td.Dependency.type>`_.
+        :param rendered: Whether the target is rendered each time the tag is,
+                         like an include (see
+                         `find_hot_spots <#jinja2td.DependencyGraph.find_hot_spots>`_).
+        :param scan: The tags of this kind `scan <#jinja2td.DependencyGraph.scan>`_
+                     can read without compiling the template, with a function
+                     getting the name of the target from the lexer tokens of
+                     the tag (without the tag name and the end of the block),
+                     or returning ``None`` if only the parser can tell.
+
+        :raises ValueError: If the kind is one of the built-in types.
+        """
+        if kind in _BUILTIN_KINDS:
+            raise ValueError(f"{kind!r} is a built-in dependency type")
+        self.__kinds[kind] = rendered
+        for tag, function in (scan or {}).items():
+            self.__scanned_tags[tag] = (kind, function)
+
+    def _scanned_tags(
+        self,
+    ) -> Dict[str, Tuple[str, Callable[[List["Token"]], Optional[str]]]]:
+        return self.__scanned_tags.copy()
+
+    def add_dependency(
+        self,
+        dependent: Optional[str],
+        kind: str,
+        target: "Union[str, Sequence[str], nodes.Expr]",
+        with_context: Optional[bool] = None,
+        ignore_missing: Optional[bool] = None,
+        lineno: Optional[int] = None,
+        parser: "Optional[Parser]" = None,
+    ) -> int:
+        """Register a dependency of a template, when the tag loading the target
+        is parsed.
+
+        .. code-block:: python
+
+           def parse(self, parser):
+               lineno = next(parser.stream).lineno
+               target = parser.parse_expression()
+               dependency_id = parser.environment.dependencies.add_dependency(
+                   parser.name, "component", target, lineno=lineno, parser=parser
+               )
+               args = [target, nodes.Const(parser.name), nodes.Const(dependency_id)]
+               return nodes.Output([self.call_method("_render", args)], lineno=lineno)
+
+        :param dependent: The name of the template being parsed
+                          (``parser.name``).
+        :param kind: A kind registered with
+                     `register_kind <#jinja2td.DependencyGraph.register_kind>`_.
+        :param target: The name of the target, a list of names to choose from,
+                       or the expression of the target parsed from the template
+                       (dynamic targets are handled like the ones of includes).
+        :param with_context: See `Dependency.with_context <#jinja2td.Dependency.with_context>`_.
+        :param ignore_missing: See `Dependency.ignore_missing <#jinja2td.Dependency.ignore_missing>`_.
+        :param lineno: The line of the tag (by default, the line the parser
+                       is at). The id of the dependency is derived from its
+                       position, so that it is the same in every process
+                       compiling the template.
+        :param parser: The parser of the template, to know the statements the
+                       tag is nested in (see `Dependency.loop_depth <#jinja2td.Dependency.loop_depth>`_,
+                       `Dependency.in_macro <#jinja2td.Dependency.in_macro>`_
+                       and `Dependency.in_call_block <#jinja2td.Dependency.in_call_block>`_).
+
+        :returns: The id to pass to `resolve <#jinja2td.DependencyGraph.resolve>`_
+                  when the tag is rendered.
+
+        :raises ValueError: If the kind is not registered, or if the template
+                            is not being compiled by an environment using this
+                            graph.
+        """
+        if kind not in self.__kinds:
+            raise ValueError(f"Unknown dependency kind: {kind}")
+
+        if isinstance(target, str):
+            targets = [(False, target, None)]
+        elif isinstance(target, (list, tuple)):
+            targets = [(False, name, None) for name in target]
+        else:
+            from .overrides import _make_targets
+
+            targets = _make_targets(target)
+
+        nesting = {}
+        if parser is not None:
+            from .overrides import _parser_context
+
+            nesting = _parser_context(parser)
+            if lineno is None:
+                lineno = parser.stream.current.lineno
+        return self._register_dependency(
+            dependent=dependent,
+            dependency_type=kind,
+            targets=targets,
+            with_context=with_context,
+            ignore_missing=ignore_missing,
+            lineno=lineno or 0,
+            **nesting,
+        )
+
+    def resolve(
+        self, dependent: Optional[str], dependency_id: int, template: jinja2.Template
+    ) -> jinja2.Template:
+        """Record the template a dependency loaded, when the tag is rendered.
+
+        :param dependent: The name of the template being rendered.
+        :param dependency_id: The id returned by
+                              `add_dependency <#jinja2td.DependencyGraph.add_dependency>`_.
+        :param template: The template loaded.
+
+        :returns: The same template.
+        """
+        return self._resolve_dependency(dependent, dependency_id, template)
+
+    @contextlib.contextmanager
+    def early_hints(self, callback: Callable[[str, str, str], Any]) -> Iterator[None]:
+        """Get notified of each template loaded by a dependency while rendering,
+        as soon as it is loaded and before its output is produced.
+
+        The callback is called synchronously, in the thread rendering the
+        template, with the name of the dependent template, the type of the
+        dependency and the name of the template loaded. It only applies to the
+        templates rendered inside the ``with`` block, in the current thread (or
+        asyncio task), so it can be used to send ``103 Early Hints`` for the
+        assets of the partials of a page while it is streamed:
+
+        .. code-block:: python
+
+           with env.dependencies.early_hints(send_preload_headers):
+               for chunk in template.generate(page=page):
+                   write(chunk)
+
+        Like the watch system, it is disabled in async environments unless
+        `watch_async <#jinja2td.DependencyGraph.watch_async>`_ is enabled. When
+        the output is consumed outside of the ``with`` block (by a WSGI server
+        for example), use
+        `generate_with_hints <#jinja2td.DependencyGraph.generate_with_hints>`_
+        instead.
+
+        :param callback: The function to call for each resolution.
+        """
+        with self.__lock:
+            self.__hinting += 1
+        token = _hints.set(callback)
+        try:
+            yield
+        finally:
+            _hints.reset(token)
+            with self.__lock:
+                self.__hinting -= 1
+
+    def generate_with_hints(
+        self,
+        template: jinja2.Template,
+        callback: Callable[[str, str, str], Any],
+        *args,
+        **kwargs,
+    ) -> Iterator[str]:
+        """Render a template piece by piece (like ``Template.generate``),
+        calling a function each time a dependency loads a template, see
+        `early_hints <#jinja2td.DependencyGraph.early_hints>`_.
+
+        :param template: The template to render.
+        :param callback: The function to call for each resolution.
+        :param args: The arguments passed to ``Template.generate``.
+        :param kwargs: The keyword arguments passed to ``Template.generate``.
+
+        :returns: An iterator over the rendered output.
+        """
+        generator = template.generate(*args, **kwargs)
+        while True:
+            # the callback only applies while the template code is running
+            with self.early_hints(callback):
+                try:
+                    chunk = next(generator)
+                except StopIteration:
+                    return
+            yield chunk
+
+    def record_usage(
+        self, path: str, interval: float = 60.0, max_size: int = 1 << 20
+    ) -> "UsageWriter":
+        """Start writing the templates loaded by the dependencies to a file,
+        to aggregate them across processes.
+
+        The resolutions are counted in memory, and appended to the file
+        periodically by a background thread. When the file would get bigger
+        than ``max_size``, it is compacted: the counts are merged, and the least
+        used targets are dropped if needed.
+
+        Use a different file for each process (a ``{pid}`` in the path is
+        replaced by the id of the process each time it is written, so it can
+        be called before forking workers: they get their own file, and their
+        own background thread), then combine them with
+        `merge_usage <#jinja2td.merge_usage>`_ (or ``python -m jinja2td
+        merge-usage``) and load the result with
+        `load_usage <#jinja2td.DependencyGraph.load_usage>`_.
+
+        :param path: The file to write.
+        :param interval: The number of seconds between writes.
+        :param max_size: The maximum size of the file, in bytes.
+
+        :returns: A `UsageWriter <#jinja2td.UsageWriter>`_, to close when the
+                  process stops.
+
+        :raises ValueError: If the usage is already being recorded.
+        """
+        from .usage import UsageWriter
+
+        with self.__lock:
+            if self.__usage is not None:
+                raise ValueError(f"Already recording usage to {self.__usage.path}")
+            self.__usage = UsageWriter(self, path, interval, max_size)
+            return self.__usage
+
+    def load_usage(self, path: str) -> int:
+        """Load the usage recorded by other processes (see
+        `record_usage <#jinja2td.DependencyGraph.record_usage>`_) into the
+        predictions of the dynamic dependencies (see
+        `Dependency.predict <#jinja2td.Dependency.predict>`_).
+
+        The dependencies are matched by the name of their template, their type
+        and their targets, so the templates must be loaded (or scanned) first.
+
+        :param path: A usage file, usually the output of
+                     `merge_usage <#jinja2td.merge_usage>`_.
+
+        :returns: The number of dependencies updated.
+        """
+        from .usage import load_usage
+
+        return load_usage(self, path)
+
+    def watch(self, environment: Optional[jinja2.Environment] = None):
         """Start watching for templates used.
 
         Call it before rendering a template, and then use
         `used_last_watch <#jinja2td.DependencyGraph.used_last_watch>`_
         to get all the templates used to build it.
-        """
-        for t in self.__templates.values():
-            t._watch_reset()
 
-    def used_last_watch(self) -> List[Template]:
+        :param environment: When the graph is shared between environments, only
+                            reset the templates used by this environment.
+        """
+        self.__materialize()
+        key = None if environment is None else id(environment)
+        with self.__lock:
+            for t in self.__templates.values():
+                t._watch_reset(key)
+            self.__version += 1
+
+    def used_last_watch(
+        self, environment: Optional[jinja2.Environment] = None
+    ) -> List[Template]:
         """Returns all the templates used for rendering templates since the last
         call to `watch`.
 
@@ -389,10 +2257,47 @@ class DependencyGraph:
         *or* `used_last_watch <#jinja2td.DependencyGraph.used_last_watch>`_
         *while a template is rendering*.
 
+        :param environment: When the graph is shared between environments, only
+                            return the templates used by this environment.
+
         :returns: The names of the templates used during the last watch.
         """
+        self.__materialize()
+        key = None if environment is None else id(environment)
         since_last_watch = []
         for t in self.__templates.values():
             for d in t.dependencies:
-                since_last_watch += d.resolved_last_watch
-        return [self.__templates[name] for name in set(since_last_watch)]
+                since_last_watch += d._resolved_last_watch(key)
+        # in bounded mode, the templates used may have been evicted since
+        return [
+            self.__templates[name]
+            for name in set(since_last_watch)
+            if name in self.__templates
+        ]
+
+    def prefetch(
+        self, environment: jinja2.Environment, name: str, k: int = 1
+    ) -> List[str]:
+        """Load the templates most likely to be used by the dynamic dependencies
+        of a template, so that they are already compiled when it is rendered.
+
+        :param environment: The environment used to load the templates.
+        :param name: The name of the dependent template.
+        :param k: The number of targets to load for each dynamic dependency.
+
+        :returns: The names of the templates that were loaded.
+        """
+        self.__materialize()
+        template = self.__templates.get(name)
+        if template is None:
+            return []
+
+        loaded = []
+        for d in template.dependencies:
+            for target, _ in d.predict(k):
+                try:
+                    environment.get_template(target)
+                except jinja2.TemplateError:
+                    continue  # the error will be raised again when rendering
+                loaded.append(target)
+        return loaded
@@ -0,0 +1,133 @@
+"""Differences between two versions of a dependency graph.
+"""
+import itertools
+from collections import Counter
+from typing import Iterable, List, Set, Tuple, Union, TYPE_CHECKING
+
+from .dependencies import Dependency, Template, _affected, _describe
+
+if TYPE_CHECKING:
+    from .dependencies import DependencyGraph
+    from .mapped import MappedGraph
+
+    AnyGraph = Union[DependencyGraph, MappedGraph]
+
+Edge = Tuple[str, str, str]
+
+
+def _same_dependencies(old: List[Dependency], new: List[Dependency]) -> bool:
+    # the order depends on the code generator, compare them as multisets
+    return Counter(map(_describe, old)) == Counter(map(_describe, new))
+
+
+def _changed(old: Template, new: Template) -> bool:
+    if old.checksum is not None and new.checksum is not None:
+        if old.checksum != new.checksum:
+            return True
+    return not _same_dependencies(old.dependencies, new.dependencies)
+
+
+def _edges(templates: Iterable[Template]) -> Set[Edge]:
+    return {
+        (t.name, target.name, d.type)
+        for t in templates
+        for d in t.dependencies
+        for target in d.targets
+        if not target.is_dynamic
+    }
+
+
+class GraphDiff:
+    """The changes between two versions of a dependency graph, and the templates
+    affected by them.
+
+    Both versions can be live graphs (`DependencyGraph <#jinja2td.DependencyGraph>`_)
+    or graphs saved with `DependencyGraph.export <#jinja2td.DependencyGraph.export>`_
+    (`MappedGraph <#jinja2td.MappedGraph>`_).
+
+    A template is changed if its source is different (when the checksums of
+    both versions are known, see `Template.checksum <#jinja2td.Template.checksum>`_)
+    or if its dependencies are different.
+    """
+
+    def __init__(self, old: "AnyGraph", new: "AnyGraph"):
+        """Compare two graphs.
+
+        :param old: The previous version of the graph.
+        :param new: The current version of the graph.
+        """
+        # the templates compiled from strings are all named None
+        old_templates = {t.name: t for t in old.templates if t.name is not None}
+        new_templates = {t.name: t for t in new.templates if t.name is not None}
+
+        self.__added = sorted(new_templates.keys() - old_templates.keys())
+        self.__removed = sorted(old_templates.keys() - new_templates.keys())
+        self.__changed = sorted(
+            name
+            for name in old_templates.keys() & new_templates.keys()
+            if _changed(old_templates[name], new_templates[name])
+        )
+
+        old_edges = _edges(old_templates.values())
+        new_edges = _edges(new_templates.values())
+        self.__added_edges = sorted(new_edges - old_edges)
+        self.__removed_edges = sorted(old_edges - new_edges)
+
+        # the dependents in either version are affected
+        self.__invalidated = _affected(
+            self.__added + self.__removed + self.__changed,
+            itertools.chain(old_templates.values(), new_templates.values()),
+        )
+        self.__rewarm = [name for name in self.__invalidated if name in new_templates]
+
+    def __repr__(self):
+        return (
+            f"GraphDiff(added={len(self.__added)}, removed={len(self.__removed)}, "
+            f"changed={len(self.__changed)}, invalidated={len(self.__invalidated)})"
+        )
+
+    @property
+    def added(self) -> List[str]:
+        """The names of the templates only in the current version."""
+        return self.__added.copy()
+
+    @property
+    def removed(self) -> List[str]:
+        """The names of the templates only in the previous version."""
+        return self.__removed.copy()
+
+    @property
+    def changed(self) -> List[str]:
+        """The names of the templates that changed."""
+        return self.__changed.copy()
+
+    @property
+    def added_edges(self) -> List[Edge]:
+        """The static dependencies only in the current version, as
+        ``(dependent, target, type)`` tuples.
+        """
+        return self.__added_edges.copy()
+
+    @property
+    def removed_edges(self) -> List[Edge]:
+        """The static dependencies only in the previous version, as
+        ``(dependent, target, type)`` tuples.
+        """
+        return self.__removed_edges.copy()
+
+    @property
+    def invalidated(self) -> List[str]:
+        """The names of the templates whose compiled code and rendered output
+        may be outdated: the templates added, removed or changed, and all the
+        templates depending on them, directly or not.
+
+        Dynamic dependencies are taken into account using their pattern (see
+        `Target.matches <#jinja2td.Target.matches>`_), so a template with a
+        dynamic dependency of unknown shape is invalidated by any change.
+        """
+        return self.__invalidated.copy()
+
+    @property
+    def rewarm(self) -> List[str]:
+        """The invalidated templates that still exist in the current version."""
+        return self.__rewarm.copy()
@@ -0,0 +1,174 @@
+"""Notifications about changes to the dependency graph.
+"""
+import threading
+import time
+from collections import deque
+from typing import Optional, List, Callable, Deque, FrozenSet, Iterable, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .dependencies import Dependency, DependencyGraph
+
+TEMPLATE_REGISTERED = "template-registered"
+TEMPLATE_RECOMPILED = "template-recompiled"
+DEPENDENCY_REGISTERED = "dependency-registered"
+DEPENDENCY_RESOLVED = "dependency-resolved"
+
+
+class Event:
+    """Something that happened to the dependency graph."""
+
+    def __init__(
+        self,
+        event_type: str,
+        template: str,
+        dependency: Optional["Dependency"] = None,
+        target: Optional[str] = None,
+    ):
+        """Initialises a new `Event` class.
+
+        This class should not be instantiated manually.
+        """
+        self.__type = event_type
+        self.__template = template
+        self.__dependency = dependency
+        self.__target = target
+        self.__timestamp = time.time()
+
+    def __repr__(self):
+        return f"Event(type={self.__type!r}, template={self.__template!r}, target={self.__target!r})"
+
+    @property
+    def type(self) -> str:
+        """The type of event. May be one of ``"template-registered"``,
+        ``"template-recompiled"``, ``"dependency-registered"`` or
+        ``"dependency-resolved"``.
+        """
+        return self.__type
+
+    @property
+    def template(self) -> str:
+        """The name of the template concerned (the dependent template for
+        dependency events).
+        """
+        return self.__template
+
+    @property
+    def dependency(self) -> Optional["Dependency"]:
+        """The dependency concerned.
+
+        .. note::
+           Only available with ``"dependency-registered"`` and
+           ``"dependency-resolved"`` events.
+        """
+        return self.__dependency
+
+    @property
+    def target(self) -> Optional[str]:
+        """The name of the template loaded.
+
+        .. note::
+           Only available with ``"dependency-resolved"`` events.
+        """
+        return self.__target
+
+    @property
+    def timestamp(self) -> float:
+        """When the event was built, as returned by ``time.time()``: for
+        batched subscriptions, up to an interval after it happened.
+        """
+        return self.__timestamp
+
+
+class Subscription:
+    """A callback registered with `DependencyGraph.subscribe <#jinja2td.DependencyGraph.subscribe>`_."""
+
+    def __init__(
+        self,
+        graph: "DependencyGraph",
+        callback: Callable,
+        types: Optional[Iterable[str]],
+        batched: bool,
+        buffer_size: int,
+        interval: float,
+    ):
+        """Initialises a new `Subscription` class.
+
+        This class should not be instantiated manually.
+        """
+        self.__graph = graph
+        self.__callback = callback
+        self.__types: Optional[FrozenSet[str]] = (
+            None if types is None else frozenset(types)
+        )
+        self.__buffer: Optional[Deque[Event]] = None
+        self.__dropped = 0
+        self.__lock = threading.Lock()
+        self.__stopped = threading.Event()
+        self.__woken = threading.Event()
+        self.__thread: Optional[threading.Thread] = None
+
+        if batched:
+            self.__buffer = deque(maxlen=buffer_size)
+            self.__thread = threading.Thread(
+                target=self.__run, args=(interval,), daemon=True
+            )
+            self.__thread.start()
+
+    @property
+    def _batched(self) -> bool:
+        return self.__buffer is not None
+
+    def _wants(self, event_type: str) -> bool:
+        return self.__types is None or event_type in self.__types
+
+    def _push(self, event: Event):
+        if self.__buffer is None:
+            self.__callback(event)
+        else:
+            if len(self.__buffer) == self.__buffer.maxlen:
+                self.__dropped += 1  # the oldest event is overwritten
+            self.__buffer.append(event)
+
+    def _wake(self):
+        self.__woken.set()
+
+    def __run(self, interval: float):
+        while True:
+            self.__woken.wait(interval)
+            self.__woken.clear()
+            if self.__stopped.is_set():
+                break
+            self.flush()
+        self.flush()
+
+    @property
+    def dropped(self) -> int:
+        """The number of events lost because the buffer was full."""
+        return self.__dropped
+
+    def flush(self):
+        """Deliver the buffered events now, in the calling thread."""
+        if self.__buffer is None:
+            return
+        self.__graph._materialize()
+        with self.__lock:
+            batch: List[Event] = []
+            while self.__buffer:
+                batch.append(self.__buffer.popleft())
+            if batch:
+                self.__callback(batch)
+
+    def unsubscribe(self):
+        """Stop receiving events. Buffered events are delivered first."""
+        if self.__buffer is not None:
+            # the events of what happened so far
+            self.__graph._materialize()
+        self.__graph._unsubscribe(self)
+        if self.__thread is not None:
+            self.__stopped.set()
+            self.__woken.set()
+            if threading.current_thread() is not self.__thread:
+                self.__thread.join()
+                self.flush()
+            # otherwise, called by the callback: the thread delivers the last
+            # events and stops once it returns
@@ -1,6 +1,8 @@
 """The Jinja2 extension for jinja2-td.
 """
 
+from typing import Optional, Type
+
 import jinja2
 from jinja2.ext import Extension
 
@@ -9,15 +11,88 @@ from .dependencies import DependencyGraph
 
 
 class Introspection(Extension):
-    """An extension that provides access to the features of jinja2td."""
+    """An extension that provides access to the features of jinja2td.
+
+    It adds the following attributes to the environment:
+
+    ``dependencies``
+        The `DependencyGraph <#jinja2td.DependencyGraph>`_ of the environment.
+
+    ``dependencies_prefetch``
+        The number of likely targets of each dynamic dependency to load when a
+        template is compiled (see `Dependency.predict <#jinja2td.Dependency.predict>`_).
+        Defaults to 0.
+
+    ``dependencies_inline``
+        If ``True``, static includes (``{% include 'name' %}`` without
+        ``ignore missing`` nor ``without context``) are replaced by the content
+        of the included template at compile time, which saves loading it each
+        time the include is rendered. Templates using blocks or ``self``
+        are never inlined. Defaults to ``False``.
+
+    ``dependencies_memoize``
+        If ``True``, each static ``extends``, ``include`` and ``import`` keeps
+        the template it loaded instead of asking the environment every time it
+        is rendered. The template is loaded again when it is recompiled, or
+        when `DependencyGraph.invalidate <#jinja2td.DependencyGraph.invalidate>`_
+        is called: with ``auto_reload``, changes to the template sources are
+        *not* detected anymore until then. Defaults to ``False``.
+
+    ``dependencies_cache_missing``
+        If ``True``, the names of the templates the loader couldn't find are
+        remembered, so that ``include ... ignore missing`` and the fallbacks of
+        ``select_template`` (``{% include ['custom.j2', 'default.j2'] %}``)
+        don't ask the loader again each time they are rendered. They are looked
+        up again when `DependencyGraph.invalidate <#jinja2td.DependencyGraph.invalidate>`_
+        or `DependencyGraph.forget_missing <#jinja2td.DependencyGraph.forget_missing>`_
+        is called, or when the loader of the environment is replaced. It can
+        also be a number of seconds after which they are looked up again, to
+        notice new templates with ``auto_reload``. Defaults to ``False``.
+    """
+
+    _shared_graph: Optional[DependencyGraph] = None
 
     def __init__(self, environment):
         super().__init__(environment)
 
-        self.__deps = DependencyGraph()
+        if self._shared_graph is not None:
+            self.__deps = self._shared_graph
+        else:
+            self.__deps = DependencyGraph()
+        self.__deps._attach(environment)
 
-        environment.extend(dependencies=self.__deps)
+        environment.extend(
+            dependencies=self.__deps,
+            dependencies_prefetch=0,
+            dependencies_inline=False,
+            dependencies_memoize=False,
+            dependencies_cache_missing=False,
+        )
 
     def preprocess(self, source, name, filename=None):
         self.__deps._add_template(name, filename)
         return source
+
+    @classmethod
+    def sharing(cls, graph: DependencyGraph) -> Type["Introspection"]:
+        """Create a version of the extension that uses an existing dependency
+        graph, instead of creating a new one for each environment.
+
+        .. code-block:: python
+
+           graph = jinja2td.DependencyGraph()
+           extension = jinja2td.Introspection.sharing(graph)
+
+           env_en = jinja2.Environment(extensions=[extension], ...)
+           env_fr = jinja2.Environment(extensions=[extension], ...)
+
+        Templates and dependencies are shared, but the watch system can still be
+        used separately by passing the environment to
+        `DependencyGraph.watch <#jinja2td.DependencyGraph.watch>`_ and
+        `DependencyGraph.used_last_watch <#jinja2td.DependencyGraph.used_last_watch>`_.
+
+        :param graph: The graph to use.
+
+        :returns: An extension class to pass to the environments.
+        """
+        return type(cls.__name__, (cls,), {"_shared_graph": graph})
@@ -0,0 +1,152 @@
+"""Dependency manifests of precompiled templates.
+"""
+import json
+import os
+import zipfile
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, TYPE_CHECKING
+
+from .dependencies import Block
+
+if TYPE_CHECKING:
+    from .dependencies import DependencyGraph, Template
+
+MANIFEST_NAME = "jinja2td-manifest.json"
+MANIFEST_VERSION = 1
+
+
+def _dump_template(
+    template: "Template", registered: List[Tuple[int, List[int]]]
+) -> dict:
+    # registered: the index of each dependency compiled, with its ids
+    dependencies = []
+    for index, dependency_ids in sorted(registered):
+        d = template.dependencies[index]
+        dependencies.append(
+            {
+                "ids": dependency_ids,
+                "type": d.type,
+                "targets": [
+                    [target.is_dynamic, target.name, target._fragments]
+                    for target in d.targets
+                ],
+                "with_context": d.with_context,
+                "ignore_missing": d.ignore_missing,
+                "imported_as": d.imported_as,
+                "imported_names": d.imported_names,
+                "inlined": d.inlined,
+                "loop_depth": d.loop_depth,
+                "in_macro": d.in_macro,
+                "in_call_block": d.in_call_block,
+            }
+        )
+
+    return {
+        "name": template.name,
+        "file": template.file,
+        "checksum": template.checksum,
+        "dependencies": dependencies,
+        "blocks": [
+            {
+                "name": b.name,
+                "calls_super": b.calls_super,
+                "scoped": b.scoped,
+                "required": b.required,
+                "parent": b.parent,
+            }
+            for b in template.blocks
+        ],
+    }
+
+
+def dump_templates(graph: "DependencyGraph", names: Iterable[str]) -> Iterator[dict]:
+    """Serialise templates of the graph, with the dependencies registered by
+    their last compilation.
+    """
+    registered: Dict[str, List[Tuple[int, List[int]]]] = {}
+    for template, index, ids in graph._registered():
+        registered.setdefault(template.name, []).append((index, ids))
+
+    for name in names:
+        template = graph.get_template(name)
+        if template is not None:  # otherwise, it could not be compiled
+            yield _dump_template(template, registered.get(name, []))
+
+
+def write_manifest(
+    graph: "DependencyGraph",
+    names: List[str],
+    target: str,
+    zip: Optional[str],
+):
+    """Write the manifest of compiled templates, next to the compiled templates."""
+    templates = list(dump_templates(graph, names))
+    data = json.dumps({"version": MANIFEST_VERSION, "templates": templates})
+    if zip is not None:
+        with zipfile.ZipFile(target, "a") as f:
+            f.writestr(MANIFEST_NAME, data)
+    else:
+        with open(os.path.join(target, MANIFEST_NAME), "w", encoding="utf-8") as f:
+            f.write(data)
+
+
+def _tuples(value):
+    # JSON turns tuples into lists
+    if isinstance(value, list):
+        return tuple(_tuples(v) for v in value)
+    return value
+
+
+def read_manifest(graph: "DependencyGraph", path: str):
+    """Load the manifest found in a directory or zip file of precompiled
+    templates, if any, into the graph.
+    """
+    try:
+        if zipfile.is_zipfile(path):
+            with zipfile.ZipFile(path) as f:
+                data = f.read(MANIFEST_NAME).decode("utf-8")
+        else:
+            with open(os.path.join(path, MANIFEST_NAME), encoding="utf-8") as f:
+                data = f.read()
+    except (OSError, KeyError):
+        return  # compiled without jinja2td
+
+    manifest = json.loads(data)
+    if manifest.get("version") != MANIFEST_VERSION:
+        raise ValueError(f"Incompatible dependency manifest: {path}")
+
+    load_templates(graph, manifest["templates"])
+
+
+def load_templates(graph: "DependencyGraph", templates: Iterable[dict]):
+    """Add templates serialised by `dump_templates` to a graph."""
+    for t in templates:
+        graph._add_template(t["name"], t["file"])
+        if t.get("checksum") is not None:
+            graph._set_checksum(t["name"], t["checksum"])
+        for d in t["dependencies"]:
+            targets = [tuple(_tuples(v) for v in target) for target in d["targets"]]
+            kwargs = {
+                key: d[key]
+                for key in (
+                    "with_context",
+                    "ignore_missing",
+                    "imported_as",
+                    "inlined",
+                    "loop_depth",
+                    "in_macro",
+                    "in_call_block",
+                )
+            }
+            if d["imported_names"] is not None:
+                kwargs["imported_names"] = [_tuples(n) for n in d["imported_names"]]
+            for dependency_id in d["ids"]:
+                graph._load_dependency(
+                    t["name"], dependency_id, d["type"], targets, kwargs
+                )
+        for b in t["blocks"]:
+            graph._register_block(
+                t["name"],
+                Block(
+                    b["name"], b["calls_super"], b["scoped"], b["required"], b["parent"]
+                ),
+            )
@@ -0,0 +1,414 @@
+"""A read-only dependency graph stored in a binary file.
+
+The file is made of a string table and of CSR (compressed sparse row) arrays,
+so that it can be memory-mapped and queried without being parsed. Processes
+opening the same file share its pages.
+"""
+
+import mmap
+import struct
+import sys
+from array import array
+from typing import Optional, List, Dict, Tuple, Union
+
+from .dependencies import DependencyGraph, Template, Dependency, Target
+
+_MAGIC = b"J2TD"
+_VERSION = 2
+_HEADER = struct.Struct("<4sHBBI")
+_SECTION = struct.Struct("<QQ")
+_NONE = 0xFFFFFFFF
+_BYTEORDER = 0 if sys.byteorder == "little" else 1
+
+# the sections of the file, in order
+(
+    _STR_PTR,
+    _STR_BLOB,
+    _NODE_NAME,
+    _NODE_FILE,
+    _NODE_LOADED,
+    _NODE_DEP_PTR,
+    _DEP_TYPE,
+    _DEP_FLAGS,
+    _DEP_AS,
+    _DEP_NAMES_PTR,
+    _NAMES,
+    _DEP_TARGET_PTR,
+    _TARGET_NAME,
+    _TARGET_FRAG_PTR,
+    _FRAGS,
+    _FWD_PTR,
+    _FWD_IDX,
+    _REV_PTR,
+    _REV_IDX,
+    _INCLUDED_PTR,
+    _INCLUDED_IDX,
+    _IMPORTED_PTR,
+    _IMPORTED_IDX,
+    _CHILDREN_PTR,
+    _CHILDREN_IDX,
+    _NODE_CHECKSUM,
+) = range(26)
+_SECTION_COUNT = 26
+
+# bits of the _NODE_LOADED section
+_LOADED = 1
+_HAS_CHECKSUM = 2
+
+
+def _encode_flag(value: Optional[bool]) -> int:
+    return 0 if value is None else (2 if value else 1)
+
+
+def _decode_flag(value: int) -> Optional[bool]:
+    return None if value == 0 else value == 2
+
+
+class _Strings:
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self.ptr = array("I", [0])
+        self.blob = bytearray()
+
+    def add(self, value: Optional[str]) -> int:
+        if value is None:
+            return _NONE
+        if value not in self.ids:
+            self.blob += value.encode("utf-8")
+            self.ptr.append(len(self.blob))
+            self.ids[value] = len(self.ids)
+        return self.ids[value]
+
+
+def _csr(rows: List[List[int]]) -> Tuple[array, array]:
+    ptr = array("I", [0])
+    idx = array("I")
+    for row in rows:
+        idx.extend(row)
+        ptr.append(len(idx))
+    return ptr, idx
+
+
+def write_graph(graph: DependencyGraph, path: str):
+    """Write the static part of a graph to a binary file.
+
+    :param graph: The graph to export.
+    :param path: The file to write.
+    """
+    templates = {t.name: t for t in graph.templates if t.name is not None}
+
+    # every template and every static target is a node
+    names = set(templates)
+    for t in templates.values():
+        for d in t.dependencies:
+            names.update(tg.name for tg in d.targets if not tg.is_dynamic)
+    nodes = sorted(names)
+    node_ids = {name: i for i, name in enumerate(nodes)}
+
+    strings = _Strings()
+    s = [array("I") for _ in range(_SECTION_COUNT)]
+    s[_NODE_DEP_PTR].append(0)
+    s[_DEP_NAMES_PTR].append(0)
+    s[_DEP_TARGET_PTR].append(0)
+    s[_TARGET_FRAG_PTR].append(0)
+    forward: List[List[int]] = [[] for _ in nodes]
+    reverse: List[List[int]] = [[] for _ in nodes]
+    included: List[List[int]] = [[] for _ in nodes]
+    imported: List[List[int]] = [[] for _ in nodes]
+    children: List[List[int]] = [[] for _ in nodes]
+
+    for i, name in enumerate(nodes):
+        s[_NODE_NAME].append(strings.add(name))
+        template = templates.get(name)
+        if template is None:
+            s[_NODE_FILE].append(_NONE)
+            s[_NODE_LOADED].append(0)
+            s[_NODE_CHECKSUM].extend((0, 0))
+            s[_NODE_DEP_PTR].append(len(s[_DEP_TYPE]))
+            continue
+        s[_NODE_FILE].append(strings.add(template.file))
+        if template.checksum is None:
+            s[_NODE_LOADED].append(_LOADED)
+            s[_NODE_CHECKSUM].extend((0, 0))
+        else:
+            s[_NODE_LOADED].append(_LOADED | _HAS_CHECKSUM)
+            s[_NODE_CHECKSUM].extend(
+                (template.checksum & 0xFFFFFFFF, template.checksum >> 32)
+            )
+
+        for d in template.dependencies:
+            s[_DEP_TYPE].append(strings.add(d.type))
+            s[_DEP_FLAGS].append(
+                _encode_flag(d.with_context)
+                | _encode_flag(d.ignore_missing) << 2
+                | _encode_flag(d.inlined) << 5
+                | d.in_macro << 7
+                | d.in_call_block << 8
+                | d.loop_depth << 9
+            )
+            s[_DEP_AS].append(strings.add(d.imported_as))
+            for n in d.imported_names or []:
+                alias = None
+                if isinstance(n, tuple):
+                    n, alias = n
+                s[_NAMES].extend((strings.add(n), strings.add(alias)))
+            s[_DEP_NAMES_PTR].append(len(s[_NAMES]) // 2)
+            if d.imported_names is None:
+                # distinguishes None from an empty list
+                s[_DEP_FLAGS][-1] |= 1 << 4
+
+            for tg in d.targets:
+                s[_TARGET_NAME].append(strings.add(tg.name))
+                if tg.pattern is not None:
+                    s[_FRAGS].extend(strings.add(f) for f in tg._fragments)
+                s[_TARGET_FRAG_PTR].append(len(s[_FRAGS]))
+                if not tg.is_dynamic:
+                    j = node_ids[tg.name]
+                    forward[i].append(j)
+                    reverse[j].append(i)
+                    if d.type == "include":
+                        included[j].append(i)
+            s[_DEP_TARGET_PTR].append(len(s[_TARGET_NAME]))
+
+            if d.type == "import" and d.target is not None:
+                if not d.target.is_dynamic:
+                    imported[node_ids[d.target.name]].append(i)
+        s[_NODE_DEP_PTR].append(len(s[_DEP_TYPE]))
+
+        parent = template.get_parent()
+        if parent is not None and parent.target is not None:
+            if not parent.target.is_dynamic:
+                children[node_ids[parent.target.name]].append(i)
+
+    def unique(rows):
+        return [sorted(set(row)) for row in rows]
+
+    s[_FWD_PTR], s[_FWD_IDX] = _csr(unique(forward))
+    s[_REV_PTR], s[_REV_IDX] = _csr(unique(reverse))
+    s[_INCLUDED_PTR], s[_INCLUDED_IDX] = _csr(unique(included))
+    s[_IMPORTED_PTR], s[_IMPORTED_IDX] = _csr(unique(imported))
+    s[_CHILDREN_PTR], s[_CHILDREN_IDX] = _csr(unique(children))
+    s[_STR_PTR] = strings.ptr
+
+    sections: List[bytes] = [a.tobytes() for a in s]
+    sections[_STR_BLOB] = bytes(strings.blob)
+
+    offset = _HEADER.size + _SECTION.size * _SECTION_COUNT
+    table = []
+    for data in sections:
+        offset += -offset % 8
+        table.append((offset, len(data)))
+        offset += len(data)
+
+    with open(path, "wb") as f:
+        f.write(_HEADER.pack(_MAGIC, _VERSION, _BYTEORDER, 0, _SECTION_COUNT))
+        for entry in table:
+            f.write(_SECTION.pack(*entry))
+        for (start, _), data in zip(table, sections):
+            f.write(b"\0" * (start - f.tell()))
+            f.write(data)
+
+
+class _MappedTemplate(Template):
+    def __init__(self, graph: "MappedGraph", index: int):
+        super().__init__(
+            graph._string(graph._node_name[index]),
+            graph._string(graph._node_file[index]),
+            graph,
+        )
+        self.__graph = graph
+        self.__index = index
+        for d in graph._dependencies(index):
+            self._add_dependency(d)
+        checksum = graph._checksum(index)
+        if checksum is not None:
+            self._set_checksum(checksum)
+
+    def find_included(self) -> List[Template]:
+        return self.__graph._find(self.__index, _INCLUDED_PTR)
+
+    def find_imported(self) -> List[Template]:
+        return self.__graph._find(self.__index, _IMPORTED_PTR)
+
+    def find_children(self) -> List[Template]:
+        return self.__graph._find(self.__index, _CHILDREN_PTR)
+
+
+class MappedGraph:
+    """A read-only dependency graph, opened from a file written by
+    `DependencyGraph.export <#jinja2td.DependencyGraph.export>`_.
+
+    The file is memory-mapped and queried in place, so it is cheap to open and
+    its pages are shared by all the processes using it. Only the static part of
+    the graph is available: the templates returned have no runtime resolutions.
+
+    It can be used as a context manager to close the file.
+    """
+
+    def __init__(self, path: str):
+        """Opens a graph file.
+
+        :param path: The file to open.
+
+        :raises ValueError: If the file is not a graph file, or was written by
+                            an incompatible version or on a platform with a
+                            different byte order.
+        """
+        with open(path, "rb") as f:
+            self.__mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, byteorder, _, count = _HEADER.unpack_from(self.__mmap, 0)
+        if magic != _MAGIC:
+            self.__mmap.close()
+            raise ValueError(f"Not a dependency graph file: {path}")
+        if version != _VERSION or byteorder != _BYTEORDER:
+            self.__mmap.close()
+            raise ValueError(f"Incompatible dependency graph file: {path}")
+
+        view = memoryview(self.__mmap)
+        self.__views = [view]
+        self.__sections: List[memoryview] = []
+        for i in range(count):
+            start, length = _SECTION.unpack_from(
+                self.__mmap, _HEADER.size + i * _SECTION.size
+            )
+            section = view[start : start + length]
+            if i != _STR_BLOB:
+                section = section.cast("I")
+            self.__views.append(section)
+            self.__sections.append(section)
+
+        self._node_name = self.__sections[_NODE_NAME]
+        self._node_file = self.__sections[_NODE_FILE]
+        self.__cache: Dict[int, Template] = {}
+
+    def __enter__(self) -> "MappedGraph":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Close the file. The graph can't be used anymore after that."""
+        self.__cache.clear()
+        self._node_name = self._node_file = None
+        for v in reversed(self.__views):
+            v.release()
+        self.__views = []
+        self.__mmap.close()
+
+    def _string(self, index: int) -> Optional[str]:
+        if index == _NONE:
+            return None
+        ptr = self.__sections[_STR_PTR]
+        blob = self.__sections[_STR_BLOB]
+        return str(blob[ptr[index] : ptr[index + 1]], "utf-8")
+
+    def _lookup(self, name: str) -> Optional[int]:
+        # nodes are sorted by name
+        low, high = 0, len(self._node_name)
+        while low < high:
+            middle = (low + high) // 2
+            if self._string(self._node_name[middle]) < name:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(self._node_name) and self._string(self._node_name[low]) == name:
+            return low
+        return None
+
+    def _checksum(self, index: int) -> Optional[int]:
+        if not self.__sections[_NODE_LOADED][index] & _HAS_CHECKSUM:
+            return None
+        low, high = self.__sections[_NODE_CHECKSUM][2 * index : 2 * index + 2]
+        return low | high << 32
+
+    def _row(self, index: int, section: int) -> memoryview:
+        ptr = self.__sections[section]
+        return self.__sections[section + 1][ptr[index] : ptr[index + 1]]
+
+    def _template(self, index: int) -> Template:
+        if index not in self.__cache:
+            self.__cache[index] = _MappedTemplate(self, index)
+        return self.__cache[index]
+
+    def _find(self, index: int, section: int) -> List[Template]:
+        return [self._template(i) for i in self._row(index, section)]
+
+    def _dependencies(self, index: int) -> List[Dependency]:
+        s = self.__sections
+        found = []
+        for d in range(s[_NODE_DEP_PTR][index], s[_NODE_DEP_PTR][index + 1]):
+            targets = []
+            for tg in range(s[_DEP_TARGET_PTR][d], s[_DEP_TARGET_PTR][d + 1]):
+                name = self._string(s[_TARGET_NAME][tg])
+                frags = s[_FRAGS][s[_TARGET_FRAG_PTR][tg] : s[_TARGET_FRAG_PTR][tg + 1]]
+                pattern = tuple(self._string(f) for f in frags) if frags else None
+                targets.append(Target(name is None, name, pattern))
+
+            imported_names: Optional[List[Union[str, Tuple[str, str]]]] = None
+            if not s[_DEP_FLAGS][d] & 1 << 4:
+                imported_names = []
+                start = s[_DEP_NAMES_PTR][d]
+                for n in range(start, s[_DEP_NAMES_PTR][d + 1]):
+                    name = self._string(s[_NAMES][2 * n])
+                    alias = self._string(s[_NAMES][2 * n + 1])
+                    imported_names.append(name if alias is None else (name, alias))
+
+            dependency_type = self._string(s[_DEP_TYPE][d])
+            kwargs = {}
+            if dependency_type != "extends":
+                kwargs["with_context"] = _decode_flag(s[_DEP_FLAGS][d] & 3)
+            if dependency_type == "include":
+                kwargs["ignore_missing"] = _decode_flag(s[_DEP_FLAGS][d] >> 2 & 3)
+                kwargs["inlined"] = _decode_flag(s[_DEP_FLAGS][d] >> 5 & 3)
+            if dependency_type == "import":
+                kwargs["imported_as"] = self._string(s[_DEP_AS][d])
+                kwargs["imported_names"] = imported_names
+            kwargs["in_macro"] = bool(s[_DEP_FLAGS][d] >> 7 & 1)
+            kwargs["in_call_block"] = bool(s[_DEP_FLAGS][d] >> 8 & 1)
+            kwargs["loop_depth"] = s[_DEP_FLAGS][d] >> 9
+            found.append(Dependency(dependency_type, targets, **kwargs))
+        return found
+
+    @property
+    def templates(self) -> List[Template]:
+        """All the templates in the graph."""
+        loaded = self.__sections[_NODE_LOADED]
+        return [self._template(i) for i in range(len(loaded)) if loaded[i] & _LOADED]
+
+    def get_template(self, name: str) -> Optional[Template]:
+        """Get a template.
+
+        :param name: The name of the template.
+
+        :returns: The corresponding template, or None if the template is
+                  unknown.
+        """
+        index = self._lookup(name)
+        if index is None or not self.__sections[_NODE_LOADED][index] & _LOADED:
+            return None
+        return self._template(index)
+
+    def __closure(self, name: str, section: int) -> List[str]:
+        start = self._lookup(name)
+        if start is None:
+            return []
+        seen = {start}
+        queue = [start]
+        found = []
+        while queue:
+            for i in self._row(queue.pop(0), section):
+                if i not in seen:
+                    seen.add(i)
+                    queue.append(i)
+                    found.append(self._string(self._node_name[i]))
+        return found
+
+    def get_closure(self, name: str) -> List[str]:
+        """See `DependencyGraph.get_closure <#jinja2td.DependencyGraph.get_closure>`_."""
+        return self.__closure(name, _FWD_PTR)
+
+    def find_dependents(self, name: str) -> List[str]:
+        """See `DependencyGraph.find_dependents <#jinja2td.DependencyGraph.find_dependents>`_."""
+        return self.__closure(name, _REV_PTR)
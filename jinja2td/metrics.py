@@ -0,0 +1,245 @@
+"""Structural metrics of the templates of a dependency graph.
+"""
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from .dependencies import Template
+
+
+class TemplateMetrics:
+    """The shape of the dependencies of a template, see
+    `DependencyGraph.get_metrics <#jinja2td.DependencyGraph.get_metrics>`_.
+
+    Only static targets are taken into account. The templates of a cycle
+    (recursive includes, for example) share their dependencies, and the
+    dependencies between them are not counted in the depth.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        depth: int,
+        extends_depth: int,
+        transitive_count: int,
+        fan_in: int,
+        fan_out: int,
+        critical_path: List[str],
+        in_cycle: bool,
+    ):
+        """Initialises a new `TemplateMetrics` class.
+
+        This class should not be instantiated manually.
+        """
+        self.__name = name
+        self.__depth = depth
+        self.__extends_depth = extends_depth
+        self.__transitive_count = transitive_count
+        self.__fan_in = fan_in
+        self.__fan_out = fan_out
+        self.__critical_path = critical_path
+        self.__in_cycle = in_cycle
+
+    def __repr__(self):
+        return (
+            f"TemplateMetrics(name={self.__name!r}, depth={self.__depth}, "
+            f"transitive_count={self.__transitive_count}, fan_in={self.__fan_in}, "
+            f"fan_out={self.__fan_out})"
+        )
+
+    @property
+    def name(self) -> str:
+        """The name of the template."""
+        return self.__name
+
+    @property
+    def depth(self) -> int:
+        """The length of the longest chain of dependencies starting from this
+        template (0 for a template without dependencies).
+        """
+        return self.__depth
+
+    @property
+    def extends_depth(self) -> int:
+        """The number of templates this one extends, directly or not."""
+        return self.__extends_depth
+
+    @property
+    def transitive_count(self) -> int:
+        """The number of templates this one depends on, directly or not."""
+        return self.__transitive_count
+
+    @property
+    def fan_in(self) -> int:
+        """The number of templates depending directly on this one."""
+        return self.__fan_in
+
+    @property
+    def fan_out(self) -> int:
+        """The number of templates this one depends on directly."""
+        return self.__fan_out
+
+    @property
+    def critical_path(self) -> List[str]:
+        """The longest chain of dependencies starting from this template, as a
+        list of template names beginning with this one.
+        """
+        return self.__critical_path.copy()
+
+    @property
+    def in_cycle(self) -> bool:
+        """True if the template depends on itself, directly or not."""
+        return self.__in_cycle
+
+
+def _static_targets(template: Template) -> Tuple[Set[str], Optional[str]]:
+    targets = set()
+    parent = None
+    for d in template.dependencies:
+        for target in d.targets:
+            if not target.is_dynamic:
+                targets.add(target.name)
+                if d.type == "extends":
+                    parent = target.name
+    return targets, parent
+
+
+def _popcount(bits: int) -> int:
+    return bin(bits).count("1")
+
+
+class _MetricsIndex:
+    # the metrics of every node, recomputed only for the templates whose
+    # dependencies changed and their dependents: the metrics of a node only
+    # depend on the nodes reachable from it
+    def __init__(self):
+        self.__targets: Dict[str, Set[str]] = {}
+        self.__parents: Dict[str, Optional[str]] = {}
+        self.__dependents: Dict[str, Set[str]] = {}
+        self.__bits: Dict[str, int] = {}
+        self.__dirty: Set[str] = set()
+        # per node: depth, extends depth, reachable set (bitset), next node
+        # on the critical path, whether it is in a cycle
+        self.__memo: Dict[str, Tuple[int, int, int, Optional[str], bool]] = {}
+
+    def invalidate(self, name: str):
+        self.__dirty.add(name)
+
+    def __bit(self, name: str) -> int:
+        bit = self.__bits.get(name)
+        if bit is None:
+            bit = self.__bits[name] = 1 << len(self.__bits)
+        return bit
+
+    def update(self, templates: Dict[str, Template]):
+        if not self.__dirty:
+            return
+        for name in self.__dirty:
+            targets, parent = (
+                _static_targets(templates[name]) if name in templates else (set(), None)
+            )
+            for target in self.__targets.get(name, ()):
+                self.__dependents[target].discard(name)
+            for target in targets:
+                self.__dependents.setdefault(target, set()).add(name)
+            self.__targets[name] = targets
+            self.__parents[name] = parent
+
+        stale = set(self.__dirty)
+        queue = list(self.__dirty)
+        while queue:
+            for dependent in self.__dependents.get(queue.pop(), ()):
+                if dependent not in stale:
+                    stale.add(dependent)
+                    queue.append(dependent)
+        for name in stale:
+            self.__memo.pop(name, None)
+        self.__dirty.clear()
+        self.__compute(stale)
+
+    def __compute(self, stale: Iterable[str]):
+        # iterative Tarjan, the components are found after all the components
+        # they depend on, which are either memoized or computed just before
+        index: Dict[str, int] = {}
+        low: Dict[str, int] = {}
+        stack: List[str] = []
+        on_stack: Set[str] = set()
+
+        for root in stale:
+            if root in index or root in self.__memo:
+                continue
+            work = [(root, iter(self.__targets.get(root, ())))]
+            index[root] = low[root] = len(index)
+            stack.append(root)
+            on_stack.add(root)
+            while work:
+                node, targets = work[-1]
+                for target in targets:
+                    if target in self.__memo:
+                        continue
+                    if target not in index:
+                        index[target] = low[target] = len(index)
+                        stack.append(target)
+                        on_stack.add(target)
+                        work.append((target, iter(self.__targets.get(target, ()))))
+                        break
+                    if target in on_stack:
+                        low[node] = min(low[node], index[target])
+                else:
+                    work.pop()
+                    if work:
+                        parent = work[-1][0]
+                        low[parent] = min(low[parent], low[node])
+                    if low[node] == index[node]:
+                        component = []
+                        while True:
+                            member = stack.pop()
+                            on_stack.discard(member)
+                            component.append(member)
+                            if member == node:
+                                break
+                        self.__compute_component(component)
+
+    def __compute_component(self, component: List[str]):
+        members = set(component)
+        in_cycle = len(component) > 1 or component[0] in self.__targets.get(
+            component[0], ()
+        )
+        reachable = 0
+        depth = 0
+        following = None
+        for member in component:
+            reachable |= self.__bit(member)
+            for target in self.__targets.get(member, ()):
+                if target in members:
+                    continue
+                target_depth, _, target_reachable, _, _ = self.__memo[target]
+                reachable |= self.__bit(target) | target_reachable
+                if target_depth + 1 > depth or (
+                    target_depth + 1 == depth and target < following
+                ):
+                    depth = target_depth + 1
+                    following = target
+
+        for member in component:
+            parent = self.__parents.get(member)
+            extends_depth = 0
+            if parent is not None and parent not in members:
+                extends_depth = self.__memo[parent][1] + 1
+            own = reachable if in_cycle else reachable & ~self.__bit(member)
+            self.__memo[member] = (depth, extends_depth, own, following, in_cycle)
+
+    def get(self, name: str) -> TemplateMetrics:
+        depth, extends_depth, reachable, following, in_cycle = self.__memo[name]
+        path = [name]
+        while following is not None:
+            path.append(following)
+            following = self.__memo[following][3]
+        return TemplateMetrics(
+            name,
+            depth,
+            extends_depth,
+            _popcount(reachable & ~self.__bit(name)),
+            len(self.__dependents.get(name, ())),
+            len(self.__targets.get(name, ())),
+            path,
+            in_cycle,
+        )
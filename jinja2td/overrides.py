@@ -1,9 +1,225 @@
 """Alter the behavior of the Jinja template compiler. 
 """
+import os
+import re
+import threading
+import time
+from functools import reduce
+
 from jinja2.compiler import CodeGenerator, Frame, t, CompilerExit
+from jinja2.environment import Environment, Template
+from jinja2.exceptions import TemplateSyntaxError, TemplateNotFound
+from jinja2.loaders import ModuleLoader
+from jinja2.parser import Parser
+from jinja2.utils import LRUCache, internalcode
+from jinja2.visitor import NodeTransformer
 from jinja2 import nodes
 
-from .dependencies import Target
+from .dependencies import Block, _checksum
+from .manifest import write_manifest
+
+# a printf-style conversion, like the ones used by the % operator
+_CONVERSION = re.compile(
+    r"%(?:\([^)]*\))?[#0 +-]*(?:\*|\d+)?(?:\.(?:\*|\d+))?[hlL]?[diouxXeEfFgGcrsa%]"
+)
+
+
+def _format_fragments(fmt: str) -> t.List[t.Optional[str]]:
+    parts: t.List[t.Optional[str]] = []
+    literal = ""
+    pos = 0
+    for m in _CONVERSION.finditer(fmt):
+        literal += fmt[pos : m.start()]
+        if m.group() == "%%":
+            literal += "%"
+        else:
+            parts += [literal, None]
+            literal = ""
+        pos = m.end()
+    parts.append(literal + fmt[pos:])
+    return parts
+
+
+def _fragments(node: nodes.Expr) -> t.List[t.Optional[str]]:
+    # constant strings and runtime values (None) making up an expression
+    if isinstance(node, nodes.Const) and isinstance(node.value, str):
+        return [node.value]
+    elif isinstance(node, nodes.Concat):
+        return [f for n in node.nodes for f in _fragments(n)]
+    elif isinstance(node, nodes.Add):
+        return _fragments(node.left) + _fragments(node.right)
+    elif isinstance(node, nodes.Mod):
+        if isinstance(node.left, nodes.Const) and isinstance(node.left.value, str):
+            return _format_fragments(node.left.value)
+    elif isinstance(node, nodes.Filter) and node.name == "format":
+        if isinstance(node.node, nodes.Const) and isinstance(node.node.value, str):
+            return _format_fragments(node.node.value)
+    return [None]
+
+
+def _make_target(node: nodes.Expr) -> tuple:
+    # the arguments of the Target, built when the graph is queried
+    if isinstance(node, nodes.Const) and isinstance(node.value, str):
+        return (False, node.value, None)
+
+    fragments = [""]
+    for f in _fragments(node):
+        if f is None:
+            if fragments[-1] is not None:
+                fragments.append(None)
+        elif fragments[-1] is None:
+            fragments[-1] = f
+        else:
+            fragments[-1] += f
+    if fragments[-1] is None:
+        fragments[-1] = ""
+
+    if len(fragments) == 1:
+        # the expression is made of constants only
+        return (False, fragments[0], None)
+    if all(f == "" for f in fragments):
+        return (True, None, None)
+    return (True, None, tuple(fragments))
+
+
+def _make_targets(node: nodes.Expr) -> t.List[tuple]:
+    # a single template or a list of templates to choose from
+    if isinstance(node, nodes.Const) and isinstance(node.value, (tuple, list)):
+        return [(False, name, None) for name in node.value]
+    elif isinstance(node, (nodes.Tuple, nodes.List)):
+        return [_make_target(item) for item in node.items]
+    return [_make_target(node)]
+
+
+class _Inliner(NodeTransformer):
+    # replaces static includes with the body of the included template
+
+    def __init__(self, environment: Environment, name: str, stack: t.List[str]):
+        self.environment = environment
+        self.name = name
+        self.stack = stack
+        self.uptodate: t.List[t.Callable[[], bool]] = []
+
+    def visit_Include(self, node: nodes.Include) -> nodes.Node:
+        if (
+            node.ignore_missing
+            or not node.with_context
+            or not isinstance(node.template, nodes.Const)
+            or not isinstance(node.template.value, str)
+        ):
+            return node
+        # the name the include loads, see Environment.get_template
+        target = node.template.value
+        if self.name is not None:
+            target = self.environment.join_path(target, self.name)
+        if target in self.stack:
+            return node
+
+        try:
+            source, filename, uptodate = self.environment.loader.get_source(
+                self.environment, target
+            )
+            # its compiled code, if any, keeps its dependencies
+            with self.environment.dependencies._inlining():
+                included = self.environment._parse(source, target, filename)
+        except (TemplateNotFound, TemplateSyntaxError):
+            return node  # fail at runtime, like a regular include
+
+        # blocks and self would refer to the includer once inlined
+        if any(included.find_all((nodes.Extends, nodes.Block))) or any(
+            n.name == "self" for n in included.find_all(nodes.Name)
+        ):
+            return node
+
+        # the includes of the included template are its own dependencies
+        inliner = _Inliner(self.environment, target, self.stack + [target])
+        inliner.visit(included)
+        self.uptodate.append(uptodate or (lambda: True))
+        self.uptodate.extend(inliner.uptodate)
+
+        self.environment.dependencies._register_dependency(
+            dependent=self.name,
+            dependency_type="include",
+            targets=[(False, target, None)],
+            lineno=node.lineno,
+            with_context=True,
+            ignore_missing=False,
+            inlined=True,
+        )
+
+        # the included template keeps its own autoescaping, whatever the
+        # autoescaping around the include
+        autoescape = self.environment.autoescape
+        if callable(autoescape):
+            autoescape = autoescape(target)
+        body = [
+            nodes.ScopedEvalContextModifier(
+                [nodes.Keyword("autoescape", nodes.Const(autoescape))], included.body
+            )
+        ]
+        return nodes.Scope(body, lineno=node.lineno).set_environment(self.environment)
+
+
+def _inline_includes(
+    environment: Environment, template: nodes.Template, name: str
+) -> nodes.Template:
+    inliner = _Inliner(environment, name, [name])
+    template = inliner.visit(template)
+    environment.dependencies._set_inlined(environment, name, inliner.uptodate)
+    return template
+
+
+def _memoized(self: CodeGenerator, template: nodes.Expr) -> bool:
+    # whether the call site keeps the static template it loads
+    return (
+        getattr(self.environment, "dependencies_memoize", False)
+        and isinstance(template, nodes.Const)
+        and isinstance(template.value, str)
+    )
+
+
+def _write_site(self: CodeGenerator, target: str) -> None:
+    # the key doesn't depend on the compilation, so that code compiled by
+    # another process (bytecode cache, ModuleLoader) can't get a wrong template
+    site = f"(id(environment), {self.name!r}, {target!r})"
+    self.write(
+        f"(environment.dependencies._sites.get({site}) or "
+        f"environment.dependencies._resolve_site({site}, environment, {target!r}, {self.name!r}))"
+    )
+
+
+_NESTING = ("_jinja2td_loops", "_jinja2td_macros", "_jinja2td_call_blocks")
+
+
+def _get_nesting(self: CodeGenerator) -> t.Tuple[int, ...]:
+    return tuple(getattr(self, counter, 0) for counter in _NESTING)
+
+
+def _set_nesting(self: CodeGenerator, nesting: t.Tuple[int, ...]) -> None:
+    for counter, value in zip(_NESTING, nesting):
+        setattr(self, counter, value)
+
+
+def _site_context(self: CodeGenerator) -> t.Dict[str, t.Any]:
+    # where the dependency being registered is, see the wrappers at the bottom
+    loops, macros, call_blocks = _get_nesting(self)
+    return {
+        "loop_depth": loops,
+        "in_macro": macros > 0,
+        "in_call_block": call_blocks > 0,
+    }
+
+
+def _parser_context(parser: Parser) -> t.Dict[str, t.Any]:
+    # like _site_context, for the tags of other extensions: the statements the
+    # parser is in, from the end tokens it is looking for (the body of a loop
+    # ends with its else, the else itself isn't in the loop)
+    ends = parser._end_token_stack
+    return {
+        "loop_depth": sum(1 for e in ends if "name:endfor" in e and "name:else" in e),
+        "in_macro": ("name:endmacro",) in ends,
+        "in_call_block": ("name:endcall",) in ends,
+    }
 
 
 def _override(cls):
@@ -21,7 +237,7 @@ def _override(cls):
 
 @_override(CodeGenerator)
 def visit_Include(self, node: nodes.Include, frame: Frame) -> None:
-    # The code in this section has been copied verbatim from Jinja2 (file compiler.py, lines 1044 to 1067)
+    # The code in this section has been adapted from Jinja2 (file compiler.py, lines 1044 to 1067)
     # https://github.com/pallets/jinja/blob/15206881c006c79667fe5154fe80c01c65410679/src/jinja2/compiler.py#L1044-L1067
     # Copyright 2007 Pallets - This code is licensed under the BSD 3-Clause license.
     # See LICENSE_JINJA2 for the full license text.
@@ -39,9 +255,13 @@ def visit_Include(self, node: nodes.Include, frame: Frame) -> None:
     elif isinstance(node.template, (nodes.Tuple, nodes.List)):
         func_name = "select_template"
 
-    self.writeline(f"template = environment.{func_name}(", node)
-    self.visit(node.template, frame)
-    self.write(f", {self.name!r})")
+    if _memoized(self, node.template):  # ADDED
+        self.writeline("template = ", node)  # ADDED
+        _write_site(self, node.template.value)  # ADDED
+    else:  # ADDED
+        self.writeline(f"template = environment.{func_name}(", node)
+        self.visit(node.template, frame)
+        self.write(f", {self.name!r})")
     if node.ignore_missing:
         self.outdent()
         self.writeline("except TemplateNotFound:")
@@ -53,26 +273,14 @@ def visit_Include(self, node: nodes.Include, frame: Frame) -> None:
     # END COPIED CODE
 
     if hasattr(self.environment, "dependencies"):
-        targets = [Target(True, None)]
-        if isinstance(node.template, nodes.Const):
-            if isinstance(node.template.value, str):
-                targets = [Target(False, node.template.value)]
-            elif isinstance(node.template.value, (tuple, list)):
-                targets = [Target(False, name) for name in node.template.value]
-        elif isinstance(node.template, (nodes.Tuple, nodes.List)):
-            targets = [
-                Target(False, item.value)
-                if (isinstance(item, nodes.Const) and isinstance(item.value, str))
-                else Target(True, None)
-                for item in node.template.items
-            ]
-
         dependency_id = self.environment.dependencies._register_dependency(
             dependent=self.name,
             dependency_type="include",
-            targets=targets,
+            targets=_make_targets(node.template),
+            lineno=node.lineno,
             with_context=node.with_context,
             ignore_missing=node.ignore_missing,
+            **_site_context(self),
         )
 
         # tracking templates in async environments could break the watch system
@@ -129,18 +337,17 @@ def _import_common(
     frame: Frame,
 ) -> None:
     if hasattr(self.environment, "dependencies"):
-        targets = [Target(True, None)]
-        if isinstance(node.template, nodes.Const):
-            if isinstance(node.template.value, str):
-                targets = [Target(False, node.template.value)]
+        targets = [_make_target(node.template)]
 
         dependency_id = self.environment.dependencies._register_dependency(
             dependent=self.name,
             dependency_type="import",
             targets=targets,
+            lineno=node.lineno,
             with_context=node.with_context,
             imported_as=node.target if isinstance(node, nodes.Import) else None,
             imported_names=node.names if isinstance(node, nodes.FromImport) else None,
+            **_site_context(self),
         )
 
         # tracking templates in async environments could break the watch system
@@ -151,16 +358,20 @@ def _import_common(
             )
             self.write(" if hasattr(environment, 'dependencies') else template)(")
 
-    # The code in this section has been copied verbatim from Jinja2 (file compiler.py, lines 1103 to 1104)
-    # https://github.com/pallets/jinja/blob/15206881c006c79667fe5154fe80c01c65410679/src/jinja2/compiler.py#L1103-L1104
-    # Copyright 2007 Pallets - This code is licensed under the BSD 3-Clause license.
-    # See LICENSE_JINJA2 for the full license text.
-    # BEGIN COPIED CODE
-    self.write(f"{self.choose_async('await ')}environment.get_template(")
-    self.visit(node.template, frame)
-    # END COPIED CODE
-
-    self.write(f", {self.name!r})")
+    if _memoized(self, node.template):
+        self.write(self.choose_async("await "))
+        _write_site(self, node.template.value)
+    else:
+        # The code in this section has been copied verbatim from Jinja2 (file compiler.py, lines 1103 to 1104)
+        # https://github.com/pallets/jinja/blob/15206881c006c79667fe5154fe80c01c65410679/src/jinja2/compiler.py#L1103-L1104
+        # Copyright 2007 Pallets - This code is licensed under the BSD 3-Clause license.
+        # See LICENSE_JINJA2 for the full license text.
+        # BEGIN COPIED CODE
+        self.write(f"{self.choose_async('await ')}environment.get_template(")
+        self.visit(node.template, frame)
+        # END COPIED CODE
+
+        self.write(f", {self.name!r})")
     if hasattr(self.environment, "dependencies"):
         if not self.environment.is_async or self.environment.dependencies.watch_async:
             self.write(")")  # close the parenthesis open at the end of line 152
@@ -183,7 +394,7 @@ def _import_common(
 
 @_override(CodeGenerator)
 def visit_Extends(self, node: nodes.Extends, frame: Frame) -> None:
-    # The code in this section has been copied verbatim from Jinja2 (file compiler.py, lines 1002 to 1027)
+    # The code in this section has been adapted from Jinja2 (file compiler.py, lines 1002 to 1027)
     # https://github.com/pallets/jinja/blob/15206881c006c79667fe5154fe80c01c65410679/src/jinja2/compiler.py#L1002-L1027
     # Copyright 2007 Pallets - This code is licensed under the BSD 3-Clause license.
     # See LICENSE_JINJA2 for the full license text.
@@ -211,21 +422,24 @@ def visit_Extends(self, node: nodes.Extends, frame: Frame) -> None:
         else:
             self.outdent()
 
-    self.writeline("parent_template = environment.get_template(", node)
-    self.visit(node.template, frame)
-    self.write(f", {self.name!r})")
+    if _memoized(self, node.template):  # ADDED
+        self.writeline("parent_template = ", node)  # ADDED
+        _write_site(self, node.template.value)  # ADDED
+    else:  # ADDED
+        self.writeline("parent_template = environment.get_template(", node)
+        self.visit(node.template, frame)
+        self.write(f", {self.name!r})")
     # END COPIED CODE
 
     if hasattr(self.environment, "dependencies"):
-        targets = [Target(True, None)]
-        if isinstance(node.template, nodes.Const):
-            if isinstance(node.template.value, str):
-                targets = [Target(False, node.template.value)]
+        targets = [_make_target(node.template)]
 
         dependency_id = self.environment.dependencies._register_dependency(
             dependent=self.name,
             dependency_type="extends",
             targets=targets,
+            lineno=node.lineno,
+            **_site_context(self),
         )
 
         # tracking templates in async environments could break the watch system
@@ -256,3 +470,313 @@ def visit_Extends(self, node: nodes.Extends, frame: Frame) -> None:
     # and now we have one more
     self.extends_so_far += 1
     # END COPIED CODE
+
+
+# duration of the last call to Environment.preprocess, in the current thread
+_last_preprocess = threading.local()
+
+
+@_override(Environment)
+def preprocess(
+    self,
+    source: str,
+    name: t.Optional[str] = None,
+    filename: t.Optional[str] = None,
+) -> str:
+    start = time.perf_counter()
+
+    # The code in this section has been copied verbatim from Jinja2 (file environment.py, lines 655 to 659)
+    # https://github.com/pallets/jinja/blob/15206881c006c79667fe5154fe80c01c65410679/src/jinja2/environment.py#L655-L659
+    # Copyright 2007 Pallets - This code is licensed under the BSD 3-Clause license.
+    # See LICENSE_JINJA2 for the full license text.
+    # BEGIN COPIED CODE
+    source = reduce(
+        lambda s, e: e.preprocess(s, name, filename),
+        self.iter_extensions(),
+        str(source),
+    )
+    # END COPIED CODE
+
+    _last_preprocess.duration = time.perf_counter() - start
+    return source
+
+
+# whether the current thread is loading templates for Environment.dependencies_prefetch
+_prefetching = threading.local()
+
+
+def _prefetch(environment: Environment, name: str) -> None:
+    # templates loaded by the prefetch are compiled too, don't cascade
+    if getattr(_prefetching, "active", False):
+        return
+    _prefetching.active = True
+    try:
+        environment.dependencies.prefetch(
+            environment, name, environment.dependencies_prefetch
+        )
+    finally:
+        _prefetching.active = False
+
+
+@_override(Environment)
+@internalcode
+def compile(
+    self,
+    source: t.Union[str, nodes.Template],
+    name: t.Optional[str] = None,
+    filename: t.Optional[str] = None,
+    raw: bool = False,
+    defer_init: bool = False,
+):
+    _last_preprocess.duration = 0.0
+    timings = [time.perf_counter()]
+
+    # The code in this section has been adapted from Jinja2 (file environment.py, lines 758 to 770)
+    # https://github.com/pallets/jinja/blob/15206881c006c79667fe5154fe80c01c65410679/src/jinja2/environment.py#L758-L770
+    # Copyright 2007 Pallets - This code is licensed under the BSD 3-Clause license.
+    # See LICENSE_JINJA2 for the full license text.
+    # BEGIN COPIED CODE
+    source_hint = None
+    try:
+        if isinstance(source, str):
+            source_hint = source
+            source = self._parse(source, name, filename)
+        timings.append(time.perf_counter())  # ADDED
+        if getattr(self, "dependencies_inline", False) and name is not None:  # ADDED
+            source = _inline_includes(self, source, name)  # ADDED
+        source = self._generate(source, name, filename, defer_init=defer_init)
+        timings.append(time.perf_counter())  # ADDED
+        if raw:
+            code = source  # MODIFIED
+        else:  # ADDED
+            if filename is None:
+                filename = "<template>"
+            code = self._compile(source, filename)  # MODIFIED
+    except TemplateSyntaxError:
+        self.handle_exception(source=source_hint)
+    # END COPIED CODE
+
+    timings.append(time.perf_counter())
+    if hasattr(self, "dependencies") and name is not None:
+        self.dependencies._record_compilation(
+            name,
+            preprocess=_last_preprocess.duration,
+            parse=timings[1] - timings[0] - _last_preprocess.duration,
+            codegen=timings[2] - timings[1],
+            compile=None if raw else timings[3] - timings[2],
+            code_size=len(source),
+        )
+        if source_hint is not None:
+            self.dependencies._set_checksum(name, _checksum(source_hint))
+        if self.dependencies_prefetch > 0:
+            _prefetch(self, name)
+    return code
+
+
+_compile_templates = Environment.compile_templates
+
+
+@_override(Environment)
+def compile_templates(
+    self,
+    target,
+    extensions=None,
+    filter_func=None,
+    zip="deflated",
+    log_function=None,
+    ignore_errors=True,
+) -> None:
+    if not hasattr(self, "dependencies"):
+        return _compile_templates(
+            self, target, extensions, filter_func, zip, log_function, ignore_errors
+        )
+
+    _compile_templates(
+        self, target, extensions, filter_func, zip, log_function, ignore_errors
+    )
+    # the templates loaded with a ModuleLoader won't be compiled again
+    write_manifest(
+        self.dependencies,
+        self.list_templates(extensions, filter_func),
+        os.fspath(target),
+        zip,
+    )
+
+
+_env_load_template = Environment._load_template
+
+
+@internalcode
+def _load_following_cache(self, name, globals):
+    # in bounded mode, the templates pushed out of the cache leave the graph
+    cache = self.cache
+    if (
+        not isinstance(cache, LRUCache)
+        or not hasattr(self, "dependencies")
+        or not self.dependencies.bounded
+    ):
+        return _env_load_template(self, name, globals)
+
+    oldest = cache._queue[0] if len(cache) >= cache.capacity else None
+    template = _env_load_template(self, name, globals)
+    if oldest is not None and oldest not in cache:
+        self.dependencies._evict(oldest[1])
+    return template
+
+
+@_override(Environment)
+@internalcode
+def _load_template(self, name, globals):
+    cache_missing = getattr(self, "dependencies_cache_missing", False)
+    if not cache_missing or not isinstance(name, str):
+        return _load_following_cache(self, name, globals)
+
+    if self.dependencies._is_missing(self, name):
+        raise TemplateNotFound(name)
+    try:
+        return _load_following_cache(self, name, globals)
+    except TemplateNotFound as e:
+        if e.name == name:  # not a template needed to compile this one
+            ttl = None if cache_missing is True else cache_missing
+            self.dependencies._add_missing(self, name, ttl)
+        raise
+
+
+_module_load = ModuleLoader.load
+
+
+@_override(ModuleLoader)
+@internalcode
+def load(self, environment, name, globals=None):
+    if hasattr(environment, "dependencies"):
+        for path in self.module.__path__:
+            environment.dependencies._load_manifest(path)
+    return _module_load(self, environment, name, globals)
+
+
+_is_up_to_date = Template.is_up_to_date
+
+
+def is_up_to_date(self) -> bool:
+    if not _is_up_to_date.fget(self):
+        return False
+    if hasattr(self.environment, "dependencies") and self.name is not None:
+        # templates inlined in this one must be up to date too
+        return self.environment.dependencies._inlined_up_to_date(
+            self.environment, self.name
+        )
+    return True
+
+
+is_up_to_date.__doc__ = (
+    _is_up_to_date.__doc__ + "\n\n(Warning: this method has been altered by jinja2td)"
+)
+Template.is_up_to_date = property(is_up_to_date)
+
+
+def _calls_super(node: nodes.Node) -> bool:
+    # looks for super() in a block, without entering nested blocks
+    for child in node.iter_child_nodes():
+        if isinstance(child, nodes.Block):
+            continue
+        if (
+            isinstance(child, nodes.Call)
+            and isinstance(child.node, nodes.Name)
+            and child.node.name == "super"
+        ):
+            return True
+        if _calls_super(child):
+            return True
+    return False
+
+
+_visit_Block = CodeGenerator.visit_Block
+
+
+@_override(CodeGenerator)
+def visit_Block(self, node: nodes.Block, frame: Frame) -> None:
+    if hasattr(self.environment, "dependencies"):
+        parent = None
+        for block in self.blocks.values():
+            if any(b is node for b in block.find_all(nodes.Block)):
+                parent = block.name
+        self.environment.dependencies._register_block(
+            self.name,
+            Block(node.name, _calls_super(node), node.scoped, node.required, parent),
+        )
+    # the function of the block is generated later, outside of the loops
+    # around the block, see blockvisit
+    if not hasattr(self, "_jinja2td_blocks"):
+        self._jinja2td_blocks = {}
+    self._jinja2td_blocks[node.name] = _get_nesting(self)
+
+    _visit_Block(self, node, frame)
+
+
+_blockvisit = CodeGenerator.blockvisit
+
+
+@_override(CodeGenerator)
+def blockvisit(self, nodes: t.Iterable[nodes.Node], frame: Frame) -> None:
+    nesting = _get_nesting(self)
+    loops = getattr(self, "_jinja2td_for", None)
+    block = self.blocks.get(frame.block) if frame.block_frame else None
+    if block is not None and nodes is block.body:
+        # the body of a block, nested where the block is
+        _set_nesting(self, getattr(self, "_jinja2td_blocks", {}).get(block.name, nesting))
+    elif loops and nodes is loops[-1].else_:
+        # the else of a loop runs once, when the loop doesn't
+        self._jinja2td_loops -= 1
+    try:
+        _blockvisit(self, nodes, frame)
+    finally:
+        _set_nesting(self, nesting)
+
+
+def _nesting(node_type: str, counter: str):
+    original = getattr(CodeGenerator, f"visit_{node_type}")
+
+    def visit(self, node: nodes.Node, frame: Frame) -> None:
+        setattr(self, counter, getattr(self, counter, 0) + 1)
+        if node_type == "For":
+            # for the else of the loop, see blockvisit
+            self._jinja2td_for = getattr(self, "_jinja2td_for", []) + [node]
+        try:
+            original(self, node, frame)
+        finally:
+            setattr(self, counter, getattr(self, counter) - 1)
+            if node_type == "For":
+                self._jinja2td_for = self._jinja2td_for[:-1]
+
+    visit.__name__ = f"visit_{node_type}"
+    _override(CodeGenerator)(visit)
+
+
+_nesting("For", "_jinja2td_loops")
+_nesting("Macro", "_jinja2td_macros")
+_nesting("CallBlock", "_jinja2td_call_blocks")
+
+
+_from_namespace = Template._from_namespace.__func__
+
+
+def _counting(graph, name: str, root: t.Callable) -> t.Callable:
+    @internalcode
+    def root_render_func(context):
+        graph._count_render(name)
+        return root(context)
+
+    return root_render_func
+
+
+def _from_namespace_counting(cls, environment, namespace, globals):
+    template = _from_namespace(cls, environment, namespace, globals)
+    if hasattr(environment, "dependencies") and template.name is not None:
+        template.root_render_func = _counting(
+            environment.dependencies, template.name, template.root_render_func
+        )
+    return template
+
+
+_from_namespace_counting.__doc__ = "(Warning: this method has been altered by jinja2td)"
+Template._from_namespace = classmethod(_from_namespace_counting)
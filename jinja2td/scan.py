@@ -0,0 +1,288 @@
+"""Find the dependencies of templates using the lexer only.
+"""
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    TYPE_CHECKING,
+)
+
+import jinja2
+from jinja2.lexer import (
+    Token,
+    TOKEN_BLOCK_BEGIN,
+    TOKEN_BLOCK_END,
+    TOKEN_LINESTATEMENT_BEGIN,
+    TOKEN_LINESTATEMENT_END,
+    TOKEN_NAME,
+    TOKEN_STRING,
+    TOKEN_COMMA,
+)
+
+from .dependencies import _checksum
+from .introspection import Introspection
+
+if TYPE_CHECKING:
+    from .dependencies import DependencyGraph
+
+# statements that change the nesting of the dependencies, see Dependency.loop_depth
+_NESTING = ("for", "macro", "call")
+
+
+class _Ambiguous(Exception):
+    # the statement needs the parser
+    pass
+
+
+def _is_name(statement: List[Token], pos: int, value: str) -> bool:
+    return (
+        pos < len(statement)
+        and statement[pos].type == TOKEN_NAME
+        and statement[pos].value == value
+    )
+
+
+def _name(statement: List[Token], pos: int) -> str:
+    if pos >= len(statement) or statement[pos].type != TOKEN_NAME:
+        raise _Ambiguous()
+    return statement[pos].value
+
+
+def _target(statement: List[Token], pos: int) -> Tuple[str, int]:
+    # adjacent strings are concatenated, like in the parser
+    target = ""
+    start = pos
+    while pos < len(statement) and statement[pos].type == TOKEN_STRING:
+        target += statement[pos].value
+        pos += 1
+    if pos == start:
+        raise _Ambiguous()  # not a constant
+    return target, pos
+
+
+def _context(statement: List[Token], pos: int, default: bool) -> Tuple[bool, int]:
+    if (_is_name(statement, pos, "with") or _is_name(statement, pos, "without")) and (
+        _is_name(statement, pos + 1, "context")
+    ):
+        return statement[pos].value == "with", pos + 2
+    return default, pos
+
+
+def _end(statement: List[Token], pos: int):
+    if pos != len(statement):
+        raise _Ambiguous()
+
+
+def _extends(statement: List[Token]) -> Tuple[str, Dict[str, Any]]:
+    target, pos = _target(statement, 0)
+    _end(statement, pos)
+    return target, {}
+
+
+def _include(statement: List[Token]) -> Tuple[str, Dict[str, Any]]:
+    target, pos = _target(statement, 0)
+    ignore_missing = False
+    if _is_name(statement, pos, "ignore") and _is_name(statement, pos + 1, "missing"):
+        ignore_missing = True
+        pos += 2
+    with_context, pos = _context(statement, pos, True)
+    _end(statement, pos)
+    return target, {"with_context": with_context, "ignore_missing": ignore_missing}
+
+
+def _import(statement: List[Token]) -> Tuple[str, Dict[str, Any]]:
+    target, pos = _target(statement, 0)
+    if not _is_name(statement, pos, "as"):
+        raise _Ambiguous()
+    imported_as = _name(statement, pos + 1)
+    with_context, pos = _context(statement, pos + 2, False)
+    _end(statement, pos)
+    return target, {
+        "with_context": with_context,
+        "imported_as": imported_as,
+        "imported_names": None,
+    }
+
+
+def _from(statement: List[Token]) -> Tuple[str, Dict[str, Any]]:
+    target, pos = _target(statement, 0)
+    if not _is_name(statement, pos, "import"):
+        raise _Ambiguous()
+    pos += 1
+
+    # same grammar as jinja2.parser.Parser.parse_from
+    names: List[Any] = []
+    with_context = False
+    while True:
+        if names:
+            if pos >= len(statement) or statement[pos].type != TOKEN_COMMA:
+                raise _Ambiguous()
+            pos += 1
+        with_context, after = _context(statement, pos, False)
+        if after != pos:
+            pos = after
+            break
+        name = _name(statement, pos)
+        if name.startswith("_"):
+            raise _Ambiguous()  # the parser raises an error
+        pos += 1
+        if _is_name(statement, pos, "as"):
+            names.append((name, _name(statement, pos + 1)))
+            pos += 2
+        else:
+            names.append(name)
+        with_context, after = _context(statement, pos, False)
+        if after != pos or pos >= len(statement) or statement[pos].type != TOKEN_COMMA:
+            pos = after
+            break
+    _end(statement, pos)
+    return target, {
+        "with_context": with_context,
+        "imported_as": None,
+        "imported_names": names,
+    }
+
+
+_STATEMENTS = {
+    "extends": _extends,
+    "include": _include,
+    "import": _import,
+    "from": _from,
+}
+
+
+def _tokenize(
+    environment: jinja2.Environment, source: str, name: str, filename: Optional[str]
+) -> List[Token]:
+    # like Environment._tokenize, without registering the template
+    for extension in environment.iter_extensions():
+        if not isinstance(extension, Introspection):
+            source = extension.preprocess(source, name, filename)
+    stream = environment.lexer.tokenize(source, name, filename)
+    for extension in environment.iter_extensions():
+        stream = extension.filter_stream(stream)  # type: ignore
+    return list(stream)
+
+
+def _scan_template(
+    environment: jinja2.Environment,
+    source: str,
+    name: str,
+    filename: Optional[str],
+    tags: Set[str],
+    kinds: Dict[str, Tuple[str, Callable[[List[Token]], Optional[str]]]],
+) -> List[Tuple[str, str, Dict[str, Any]]]:
+    tokens = _tokenize(environment, source, name, filename)
+    # the dependencies of the root render function, then of each block in the
+    # order they start: the order the code generator registers them in, which
+    # numbers the dependencies of each line
+    sections: List[List[Tuple[str, str, Dict[str, Any]]]] = [[]]
+    blocks = [0]
+    nesting = dict.fromkeys(_NESTING, 0)
+    # the open for and if statements, to tell the else of a loop from the
+    # else of a condition
+    branches: List[str] = []
+
+    pos = 0
+    while pos < len(tokens):
+        token = tokens[pos]
+        pos += 1
+        if token.type == TOKEN_BLOCK_BEGIN:
+            end = TOKEN_BLOCK_END
+        elif token.type == TOKEN_LINESTATEMENT_BEGIN:
+            end = TOKEN_LINESTATEMENT_END
+        else:
+            continue
+        if pos >= len(tokens) or tokens[pos].type != TOKEN_NAME:
+            continue
+
+        keyword = tokens[pos].value
+        if keyword in tags and keyword not in kinds:
+            # extension tags may load templates too (see DependencyGraph.add_dependency)
+            raise _Ambiguous()
+        if keyword in ("for", "if"):
+            branches.append(keyword)
+        elif keyword in ("endfor", "endif") and branches:
+            if branches.pop() == "else":
+                continue  # not in the loop anymore
+        elif keyword == "else" and branches and branches[-1] == "for":
+            # the else of a loop runs once, when the loop doesn't
+            branches[-1] = "else"
+            nesting["for"] -= 1
+            continue
+        if keyword == "block":
+            blocks.append(len(sections))
+            sections.append([])
+        elif keyword == "endblock" and len(blocks) > 1:
+            blocks.pop()
+        elif keyword in nesting:
+            nesting[keyword] += 1
+        elif keyword.startswith("end") and keyword[3:] in nesting:
+            nesting[keyword[3:]] -= 1
+        elif keyword in _STATEMENTS or keyword in kinds:
+            start = pos + 1
+            while pos < len(tokens) and tokens[pos].type != end:
+                pos += 1
+            if keyword in kinds:
+                # read by the extension, see DependencyGraph.register_kind
+                dependency_type, read = kinds[keyword]
+                target = read(tokens[start:pos])
+                if target is None:
+                    raise _Ambiguous()
+                kwargs = {}
+            else:
+                target, kwargs = _STATEMENTS[keyword](tokens[start:pos])
+                dependency_type = "import" if keyword == "from" else keyword
+            kwargs["lineno"] = tokens[start - 1].lineno
+            kwargs["loop_depth"] = nesting["for"]
+            kwargs["in_macro"] = nesting["macro"] > 0
+            kwargs["in_call_block"] = nesting["call"] > 0
+            sections[blocks[-1]].append((dependency_type, target, kwargs))
+
+    return [dependency for section in sections for dependency in section]
+
+
+def scan(
+    graph: "DependencyGraph",
+    environment: jinja2.Environment,
+    names: Optional[Iterable[str]] = None,
+) -> List[str]:
+    """Add templates to the graph without compiling them, see
+    `DependencyGraph.scan <#jinja2td.DependencyGraph.scan>`_.
+    """
+    if getattr(environment, "dependencies", None) is not graph:
+        raise ValueError("The environment doesn't use this dependency graph")
+    if environment.loader is None:
+        raise TypeError("no loader for this environment specified")
+
+    tags: Set[str] = set()
+    for extension in environment.iter_extensions():
+        tags.update(extension.tags)
+    kinds = graph._scanned_tags()
+
+    compiled = []
+    for name in environment.list_templates() if names is None else names:
+        source, filename, _ = environment.loader.get_source(environment, name)
+        try:
+            found = _scan_template(environment, source, name, filename, tags, kinds)
+        except (_Ambiguous, jinja2.TemplateSyntaxError):
+            # the code generator registers the dependencies (and reports errors)
+            environment.compile(source, name, filename, raw=True)
+            compiled.append(name)
+            continue
+
+        graph._add_template(name, filename)
+        graph._set_checksum(name, _checksum(source))
+        for dependency_type, target, kwargs in found:
+            graph._register_dependency(
+                dependent=name,
+                dependency_type=dependency_type,
+                targets=[(False, target, None)],
+                **kwargs,
+            )
+    return compiled
@@ -0,0 +1,157 @@
+"""Read-only copies of a dependency graph.
+"""
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set
+
+import jinja2
+
+from .dependencies import Template, _affected, _normalize_path
+
+
+class GraphSnapshot:
+    """A read-only copy of a `DependencyGraph <#jinja2td.DependencyGraph>`_,
+    returned by `DependencyGraph.snapshot <#jinja2td.DependencyGraph.snapshot>`_.
+
+    Its templates and dependencies never change, and it can be queried from
+    any thread without locking. The indexes used by the queries are built the
+    first time they are needed.
+    """
+
+    def __init__(
+        self, templates: Dict[str, Template], files: Dict[str, FrozenSet[str]]
+    ):
+        """Initialises a new `GraphSnapshot` class.
+
+        This class should not be instantiated manually.
+        """
+        self.__frozen = templates
+        self.__files = files
+        self.__templates: Optional[Dict[str, Template]] = None
+        self.__dependents: Optional[Dict[str, List[str]]] = None
+
+    def __repr__(self):
+        return f"GraphSnapshot(templates={len(self.__frozen)})"
+
+    def __len__(self):
+        return len(self.__frozen)
+
+    def __contains__(self, name):
+        return name in self.__frozen
+
+    def __bound(self) -> Dict[str, Template]:
+        # the frozen templates are shared between snapshots, the views of them
+        # returned to the user belong to this one
+        if self.__templates is None:
+            self.__templates = {
+                name: t._bind(self) for name, t in self.__frozen.items()
+            }
+        return self.__templates
+
+    def __reverse(self) -> Dict[str, List[str]]:
+        if self.__dependents is None:
+            dependents: Dict[str, List[str]] = {}
+            for t in self.__frozen.values():
+                for d in t.dependencies:
+                    for target in d.targets:
+                        if not target.is_dynamic:
+                            dependents.setdefault(target.name, []).append(t.name)
+            self.__dependents = dependents
+        return self.__dependents
+
+    @property
+    def templates(self) -> List[Template]:
+        """All the templates in the graph when the snapshot was taken."""
+        return list(self.__bound().values())
+
+    def get_template(self, name: str) -> Optional[Template]:
+        """Get a template by name.
+
+        :param name: The name of the template.
+
+        :returns: The template, or ``None`` if it wasn't in the graph.
+        """
+        return self.__bound().get(name)
+
+    def get_closure(self, name: str) -> List[str]:
+        """Get all the templates a template depends on, directly or not, see
+        `DependencyGraph.get_closure <#jinja2td.DependencyGraph.get_closure>`_.
+
+        :param name: The name of a template.
+
+        :returns: The names of the templates reachable from this one, in
+                  breadth-first order.
+        """
+        found: Dict[str, None] = {}
+        queue = [name]
+        while queue:
+            template = self.__frozen.get(queue.pop(0))
+            if template is None:
+                continue
+            for d in template.dependencies:
+                for target in d.targets:
+                    if not target.is_dynamic and target.name not in found:
+                        found[target.name] = None
+                        queue.append(target.name)
+        found.pop(name, None)
+        return list(found)
+
+    def find_dependents(self, name: str) -> List[str]:
+        """Get all the templates depending on a template, directly or not, see
+        `DependencyGraph.find_dependents <#jinja2td.DependencyGraph.find_dependents>`_.
+
+        :param name: The name of a template.
+
+        :returns: The names of the dependent templates, in breadth-first order.
+        """
+        dependents = self.__reverse()
+        found: Dict[str, None] = {}
+        queue = [name]
+        while queue:
+            for dependent in dependents.get(queue.pop(0), []):
+                if dependent not in found:
+                    found[dependent] = None
+                    queue.append(dependent)
+        found.pop(name, None)
+        return list(found)
+
+    def find_templates_by_file(self, path: str) -> List[str]:
+        """Get the templates loaded from a file, see
+        `DependencyGraph.find_templates_by_file <#jinja2td.DependencyGraph.find_templates_by_file>`_.
+
+        :param path: The path of the file.
+
+        :returns: The names of the templates, sorted.
+        """
+        return sorted(self.__files.get(_normalize_path(path), ()))
+
+    def find_affected_by_files(self, paths: Iterable[str]) -> List[str]:
+        """Get the templates whose output may change when some files change,
+        see `DependencyGraph.find_affected_by_files <#jinja2td.DependencyGraph.find_affected_by_files>`_.
+
+        :param paths: The paths of the files changed.
+
+        :returns: The names of the templates affected, sorted.
+        """
+        names: Set[str] = set()
+        for path in paths:
+            names.update(self.__files.get(_normalize_path(path), ()))
+        return _affected(names, self.__frozen.values())
+
+    def used_last_watch(
+        self, environment: Optional[jinja2.Environment] = None
+    ) -> List[Template]:
+        """Returns the templates used since the last call to
+        `DependencyGraph.watch <#jinja2td.DependencyGraph.watch>`_ before the
+        snapshot was taken.
+
+        :param environment: When the graph is shared between environments, only
+                            return the templates used by this environment.
+
+        :returns: The templates used during the watch.
+        """
+        key = None if environment is None else id(environment)
+        used: Set[str] = set()
+        for t in self.__frozen.values():
+            for d in t.dependencies:
+                used.update(d._resolved_last_watch(key))
+        templates = self.__bound()
+        return [templates[name] for name in used if name in templates]
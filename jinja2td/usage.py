@@ -0,0 +1,220 @@
+"""Usage profiles: the templates loaded by the dependencies, aggregated across
+processes.
+"""
+import json
+import os
+import threading
+import weakref
+from typing import Dict, Iterable, List, Optional, Tuple, TYPE_CHECKING
+
+from .manifest import _tuples
+
+if TYPE_CHECKING:
+    from .dependencies import DependencyGraph
+
+USAGE_VERSION = 1
+
+# the dependent, the type and targets of the dependency, the template loaded
+UsageKey = Tuple[str, str, tuple, str]
+
+
+def _encode(usage: Dict[UsageKey, int]) -> str:
+    entries = [
+        [dependent, dependency_type, targets, name, count]
+        for (dependent, dependency_type, targets, name), count in usage.items()
+    ]
+    return json.dumps({"version": USAGE_VERSION, "usage": entries}) + "\n"
+
+
+def _add(usage: Dict[UsageKey, int], key: UsageKey, count: int):
+    usage[key] = usage.get(key, 0) + count
+
+
+def read_usage(path: str) -> Dict[UsageKey, int]:
+    """Read a usage file, written by a `UsageWriter <#jinja2td.UsageWriter>`_
+    or by `merge_usage <#jinja2td.merge_usage>`_.
+    """
+    usage: Dict[UsageKey, int] = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                data = json.loads(line)
+            except ValueError:
+                continue  # the process died while writing it
+            if data.get("version") != USAGE_VERSION:
+                raise ValueError(f"Incompatible usage file: {path}")
+            for dependent, dependency_type, targets, name, count in data["usage"]:
+                _add(usage, (dependent, dependency_type, _tuples(targets), name), count)
+    return usage
+
+
+def _fit(usage: Dict[UsageKey, int], max_size: int) -> Tuple[str, int]:
+    # the most used targets that fit in max_size bytes, and the number dropped
+    data = _encode(usage)
+    if len(data.encode("utf-8")) <= max_size:
+        return data, 0
+    ranked = sorted(usage.items(), key=lambda i: i[1], reverse=True)
+    kept = len(ranked)
+    while kept > 0:
+        kept //= 2
+        data = _encode(dict(ranked[:kept]))
+        if len(data.encode("utf-8")) <= max_size:
+            break
+    return data, len(ranked) - kept
+
+
+def merge_usage(paths: Iterable[str], output: str) -> int:
+    """Combine usage files into one, to load it with
+    `DependencyGraph.load_usage <#jinja2td.DependencyGraph.load_usage>`_.
+
+    Files that can't be read are skipped.
+
+    :param paths: The files written by the processes.
+    :param output: The file to write.
+
+    :returns: The number of files merged.
+    """
+    merged: Dict[UsageKey, int] = {}
+    count = 0
+    for path in paths:
+        try:
+            usage = read_usage(path)
+        except OSError:
+            continue
+        for key, n in usage.items():
+            _add(merged, key, n)
+        count += 1
+    with open(output, "w", encoding="utf-8") as f:
+        f.write(_encode(merged))
+    return count
+
+
+# the writers recording in this process, restarted in the children it forks
+_writers: "weakref.WeakSet[UsageWriter]" = weakref.WeakSet()
+
+
+def _after_fork():
+    for writer in list(_writers):
+        writer._restart()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)
+
+
+class UsageWriter:
+    """Records the templates loaded by the dependencies in a file, see
+    `DependencyGraph.record_usage <#jinja2td.DependencyGraph.record_usage>`_.
+    """
+
+    def __init__(
+        self, graph: "DependencyGraph", path: str, interval: float, max_size: int
+    ):
+        """Initialises a new `UsageWriter` class.
+
+        This class should not be instantiated manually.
+        """
+        self.__graph = graph
+        self.__path = path
+        self.__interval = interval
+        self.__max_size = max_size
+        self.__dropped = 0
+        self._restart()
+        _writers.add(self)
+
+    def _restart(self):
+        # in a forked process, the thread is gone, the locks may be held and the
+        # counts so far are written by the parent
+        self.__counts: Dict[Tuple[str, int, str], int] = {}
+        self.__lock = threading.Lock()
+        self.__file_lock = threading.Lock()
+        self.__stopped = threading.Event()
+        self.__thread = threading.Thread(
+            target=self.__run, args=(self.__interval,), daemon=True
+        )
+        self.__thread.start()
+
+    def _count(self, dependent: str, dependency_id: int, name: str):
+        key = (dependent, dependency_id, name)
+        with self.__lock:
+            self.__counts[key] = self.__counts.get(key, 0) + 1
+
+    def __run(self, interval: float):
+        while not self.__stopped.wait(interval):
+            self.flush()
+
+    @property
+    def path(self) -> str:
+        """The file written by this process (a ``{pid}`` in the path given is
+        replaced by the id of the process when writing it, so that each forked
+        worker has its own file).
+        """
+        return self.__path.replace("{pid}", str(os.getpid()))
+
+    @property
+    def dropped(self) -> int:
+        """The number of entries dropped to keep the file under its maximum
+        size (the least used ones).
+        """
+        return self.__dropped
+
+    def flush(self):
+        """Append the usage recorded since the last flush to the file now, in
+        the calling thread.
+        """
+        with self.__lock:
+            counts, self.__counts = self.__counts, {}
+        if not counts:
+            return
+
+        usage: Dict[UsageKey, int] = {}
+        for (dependent, dependency_id, name), n in counts.items():
+            description = self.__graph._describe_dependency(dependent, dependency_id)
+            if description is not None:
+                _add(usage, (dependent, *description, name), n)
+
+        path = self.path
+        with self.__file_lock:
+            data = _encode(usage)
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                size = 0
+            if size + len(data.encode("utf-8")) > self.__max_size:
+                # compact the file, merging the previous flushes with this one
+                if size > 0:
+                    for key, n in read_usage(path).items():
+                        _add(usage, key, n)
+                data, dropped = _fit(usage, self.__max_size)
+                self.__dropped += dropped
+                with open(path + ".tmp", "w", encoding="utf-8") as f:
+                    f.write(data)
+                os.replace(path + ".tmp", path)
+            else:
+                with open(path, "a", encoding="utf-8") as f:
+                    f.write(data)
+
+    def close(self):
+        """Stop recording. The usage recorded so far is written first."""
+        _writers.discard(self)
+        self.__graph._stop_usage(self)
+        self.__stopped.set()
+        self.__thread.join()
+        self.flush()
+
+
+def load_usage(graph: "DependencyGraph", path: str) -> int:
+    """Load a usage file into the graph, see
+    `DependencyGraph.load_usage <#jinja2td.DependencyGraph.load_usage>`_.
+    """
+    by_dependency: Dict[Tuple[str, str, tuple], List[Tuple[str, int]]] = {}
+    for (dependent, dependency_type, targets, name), n in read_usage(path).items():
+        by_dependency.setdefault((dependent, dependency_type, targets), []).append(
+            (name, n)
+        )
+
+    loaded = 0
+    for (dependent, dependency_type, targets), counts in by_dependency.items():
+        if graph._load_usage(dependent, dependency_type, targets, counts):
+            loaded += 1
+    return loaded
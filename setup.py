@@ -27,4 +27,7 @@ setup(
     install_requires=[
         "Jinja2 >=3.1.5, <=3.1.6",
     ],
+    extras_require={
+        "numpy": ["numpy"],
+    },
 )
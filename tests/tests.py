@@ -6,6 +6,31 @@ from tests_include import TestsInclude
 from tests_import import TestsImport
 from tests_extends import TestsExtends
 from tests_real_world import TestsRealWorld
+from tests_patterns import TestsPatterns
+from tests_prediction import TestsPrediction
+from tests_shared import TestsShared
+from tests_mapped import TestsMapped
+from tests_bounded import TestsBounded
+from tests_compile_stats import TestsCompileStats
+from tests_events import TestsEvents
+from tests_inline import TestsInline
+from tests_memoize import TestsMemoize
+from tests_blocks import TestsBlocks
+from tests_hot_spots import TestsHotSpots
+from tests_lazy import TestsLazy
+from tests_manifest import TestsManifest
+from tests_scan import TestsScan
+from tests_cli import TestsCli
+from tests_diff import TestsDiff
+from tests_files import TestsFiles
+from tests_bundle import TestsBundle
+from tests_snapshot import TestsSnapshot
+from tests_metrics import TestsMetrics
+from tests_kinds import TestsKinds
+from tests_hints import TestsHints
+from tests_usage import TestsUsage
+from tests_batch import TestsBatch
+from tests_missing import TestsMissing
 
 
 if __name__ == "__main__":
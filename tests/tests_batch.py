@@ -0,0 +1,96 @@
+import unittest
+
+import jinja2
+import jinja2td
+from jinja2td import batch
+
+
+class TestsBatch(unittest.TestCase):
+    def setUp(self):
+        files = {
+            "page": r"{% extends 'layout' %}{% block main %}{% include 'card' %}{% endblock %}",
+            "about": r"{% extends 'layout' %}",
+            "layout": r"{% import 'macros' as m %}{% block main %}{% endblock %}",
+            "card": r"{% include ['icon', 'fallback'] %}",
+            "icon": r"ICON",
+            "fallback": r"FALLBACK",
+            "macros": r"{% macro title() %}TITLE{% endmacro %}",
+            "widget": r"{% include 'widgets/' ~ kind %}",
+        }
+        self.env = jinja2.Environment(
+            loader=jinja2.DictLoader(files),
+            extensions=[jinja2td.Introspection],
+        )
+        self.env.dependencies.scan(self.env)
+
+    def test_dependents(self):
+        graph = self.env.dependencies
+
+        self.assertEqual(
+            ["about", "card", "layout", "page"],
+            graph.find_dependents_of(["icon", "macros"]),
+        )
+        expected = set(graph.find_dependents("icon")) | set(
+            graph.find_dependents("macros")
+        )
+        self.assertEqual(sorted(expected), graph.find_dependents_of(["icon", "macros"]))
+        self.assertEqual(["card"], graph.find_dependents_of(["icon"], direct=True))
+        self.assertEqual([], graph.find_dependents_of(["unknown"]))
+
+    def test_types(self):
+        graph = self.env.dependencies
+
+        self.assertEqual(
+            ["about", "page"], graph.find_dependents_of(["layout"], types=["extends"])
+        )
+        self.assertEqual(
+            [t.name for t in graph.get_template("layout").find_children()],
+            graph.find_dependents_of(["layout"], types=["extends"], direct=True),
+        )
+        self.assertEqual([], graph.find_dependents_of(["macros"], types=["include"]))
+        self.assertEqual([], graph.find_dependents_of(["macros"], types=["svg"]))
+
+    def test_many_types(self):
+        graph = self.env.dependencies
+        for i in range(70):
+            graph.register_kind(f"kind{i}")
+            graph.add_dependency("icon", f"kind{i}", f"target{i}")
+
+        self.assertEqual(["icon"], graph.find_dependents_of(["target40"], ["kind40"]))
+        self.assertEqual([], graph.find_dependents_of(["target40"], ["kind20"]))
+        # past the bits of the masks, the types can't be told apart
+        self.assertEqual(["icon"], graph.find_dependents_of(["target69"], ["kind68"]))
+
+    def test_closure(self):
+        graph = self.env.dependencies
+
+        self.assertEqual(
+            ["card", "fallback", "icon", "layout", "macros"],
+            graph.get_closure_of(["page", "about"]),
+        )
+        self.assertEqual(
+            sorted(graph.get_closure("page")), graph.get_closure_of(["page"])
+        )
+        self.assertEqual([], graph.get_closure_of(["widget"]))
+
+    def test_updated(self):
+        graph = self.env.dependencies
+        self.assertEqual(["card"], graph.find_dependents_of(["icon"], direct=True))
+
+        self.env.from_string(r"{% include 'icon' %}")
+        self.env.loader.mapping["banner"] = r"{% include 'icon' %}"
+        graph.scan(self.env, ["banner"])
+        self.assertEqual(
+            ["banner", "card"], graph.find_dependents_of(["icon"], direct=True)
+        )
+
+    @unittest.skipIf(batch.numpy is None, "NumPy is not installed")
+    def test_numpy(self):
+        graph = self.env.dependencies
+        expected = graph.find_dependents_of(["icon", "macros"])
+        numpy = batch.numpy
+        try:
+            batch.numpy = None
+            self.assertEqual(expected, graph.find_dependents_of(["icon", "macros"]))
+        finally:
+            batch.numpy = numpy
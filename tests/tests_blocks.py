@@ -0,0 +1,112 @@
+import unittest
+
+import jinja2
+import jinja2td
+
+
+class TestsBlocks(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        files = {
+            "root": (
+                r"{% block title %}FIVE_Over{% endblock %} "
+                r"{% block content %}{% block ability %}{% endblock %}{% endblock %}"
+                r"{% block footer scoped %}{% endblock %}"
+            ),
+            "middle": (
+                r"{% extends 'root' %}"
+                r"{% block ability %}Modelcase_{% endblock %}"
+                r"{% block footer %}MENTALOUT{% endblock %}"
+            ),
+            "leaf": (
+                r"{% extends 'middle' %}"
+                r"{% block ability %}{{ super() }}RAILGUN{% endblock %}"
+            ),
+            "other_leaf": (
+                r"{% extends 'middle' %}"
+                r"{% block ability %}Modelcase_MELTDOWNER{% endblock %}"
+            ),
+        }
+
+        cls.env = jinja2.Environment(
+            loader=jinja2.DictLoader(files),
+            extensions=[jinja2td.Introspection],
+        )
+        for name in files:
+            cls.env.get_template(name).render()
+
+        cls.graph = cls.env.dependencies
+
+    def test_blocks(self):
+        root = TestsBlocks.graph.get_template("root")
+
+        self.assertEqual(
+            ["ability", "content", "footer", "title"],
+            sorted(b.name for b in root.blocks),
+        )
+        self.assertEqual("content", root.get_block("ability").parent)
+        self.assertIs(None, root.get_block("content").parent)
+        self.assertTrue(root.get_block("footer").scoped)
+        self.assertFalse(root.get_block("title").calls_super)
+
+        leaf = TestsBlocks.graph.get_template("leaf")
+
+        self.assertEqual(["ability"], [b.name for b in leaf.blocks])
+        self.assertTrue(leaf.get_block("ability").calls_super)
+        self.assertIs(None, leaf.get_block("title"))
+
+    def test_extends_chain(self):
+        chain = TestsBlocks.graph.get_extends_chain("leaf")
+
+        self.assertEqual(["leaf", "middle", "root"], [t.name for t in chain])
+
+    def test_block_sources(self):
+        sources = TestsBlocks.graph.get_block_sources("leaf")
+
+        self.assertEqual(
+            {
+                "ability": ["leaf", "middle"],
+                "footer": ["middle"],
+                "title": ["root"],
+                "content": ["root"],
+            },
+            sources,
+        )
+
+    def test_find_block_dependents(self):
+        graph = TestsBlocks.graph
+
+        self.assertEqual(
+            ["middle", "leaf"],
+            [t.name for t in graph.find_block_dependents("middle", "ability")],
+        )
+        self.assertEqual(
+            ["leaf", "middle", "other_leaf", "root"],
+            sorted(t.name for t in graph.find_block_dependents("root", "title")),
+        )
+        # every descendant overrides it
+        self.assertEqual(
+            ["root"], [t.name for t in graph.find_block_dependents("root", "ability")]
+        )
+
+    def test_recompiled(self):
+        files = {
+            "base": r"{% block a %}BASE{% endblock %}",
+            "child": r"{% extends 'base' %}{% block a %}CHILD{% endblock %}",
+        }
+        env = jinja2.Environment(
+            loader=jinja2.DictLoader(files),
+            extensions=[jinja2td.Introspection],
+        )
+        env.get_template("child")
+        self.assertEqual({"a": ["child"]}, env.dependencies.get_block_sources("child"))
+
+        # the block was removed
+        files["child"] = r"{% extends 'base' %}"
+        self.assertEqual("BASE", env.get_template("child").render())
+
+        self.assertEqual({"a": ["base"]}, env.dependencies.get_block_sources("child"))
+        self.assertEqual(
+            ["base", "child"],
+            sorted(t.name for t in env.dependencies.find_block_dependents("base", "a")),
+        )
@@ -0,0 +1,103 @@
+import unittest
+
+import jinja2
+import jinja2td
+
+
+class TestsBounded(unittest.TestCase):
+    def setUp(self):
+        files = {
+            "railgun": r"RAILGUN",
+            "page1": r"Modelcase_{% include ability %}",
+            "page2": r"Modelcase_{% include ability %}",
+            "page3": r"Modelcase_{% include ability %}",
+        }
+
+        self.env = jinja2.Environment(
+            loader=jinja2.DictLoader(files),
+            extensions=[jinja2td.Introspection],
+            cache_size=2,
+        )
+        self.env.dependencies.bounded = True
+
+    def get_dependency(self, name):
+        return self.env.dependencies.get_template(name).dependencies[0]
+
+    def test_no_duplicates(self):
+        template = self.env.get_template("page1")
+        for _ in range(3):
+            template.render(ability="railgun")
+
+        self.assertEqual(["railgun"], self.get_dependency("page1").resolved)
+        self.assertEqual([("railgun", 3)], self.get_dependency("page1").predict())
+
+    def test_watch(self):
+        template = self.env.get_template("page1")
+        template.render(ability="railgun")
+        self.env.dependencies.watch()
+
+        self.assertEqual([], self.env.dependencies.used_last_watch())
+
+        template.render(ability="railgun")
+
+        self.assertEqual(
+            ["railgun"], [t.name for t in self.env.dependencies.used_last_watch()]
+        )
+
+    def test_watch_evicted(self):
+        self.env.dependencies.watch()
+        self.env.get_template("page1").render(ability="railgun")
+        # pushes "railgun" out of the cache, "page1" still lists it
+        self.env.get_template("page1")
+        self.env.get_template("page2")
+
+        self.assertIsNone(self.env.dependencies.get_template("railgun"))
+        self.assertEqual([], self.env.dependencies.used_last_watch())
+
+    def test_evicted(self):
+        self.env.get_template("page1").render(ability="railgun")
+
+        # "railgun" is used again, "page2" pushes "page1" out of the cache
+        self.env.get_template("page2").render(ability="railgun")
+
+        self.assertIsNone(self.env.dependencies.get_template("page1"))
+        self.assertEqual(
+            {"page2", "railgun"}, {t.name for t in self.env.dependencies.templates}
+        )
+        self.assertEqual(["railgun"], self.get_dependency("page2").resolved)
+
+        # it is back when compiled again, without its runtime data
+        self.env.get_template("page1")
+        self.assertTrue(self.get_dependency("page1").target.is_dynamic)
+        self.assertEqual([], self.get_dependency("page1").resolved)
+
+    def test_cached_elsewhere(self):
+        other = jinja2.Environment(
+            loader=self.env.loader,
+            extensions=[jinja2td.Introspection.sharing(self.env.dependencies)],
+        )
+        other.get_template("page1")
+        self.env.get_template("page1").render(ability="railgun")
+        self.env.get_template("page2")
+
+        self.assertEqual(["railgun"], self.get_dependency("page1").resolved)
+
+    def test_recompiled(self):
+        files = {"page1": r"Modelcase_{% include ability %}", "railgun": r"RAILGUN"}
+        self.env.loader = jinja2.DictLoader(files)
+        self.env.get_template("page1").render(ability="railgun")
+
+        files["page1"] = r"Level5_{% include ability %}"
+        self.env.get_template("page1")
+
+        self.assertEqual([], self.get_dependency("page1").resolved)
+
+    def test_unbounded(self):
+        self.env.dependencies.bounded = False
+        template = self.env.get_template("page1")
+        for _ in range(3):
+            template.render(ability="railgun")
+        self.env.get_template("page2")
+        self.env.get_template("page3")
+
+        self.assertEqual(3, len(self.get_dependency("page1").resolved))
@@ -0,0 +1,67 @@
+import os
+import tempfile
+import unittest
+
+import jinja2
+import jinja2td
+
+
+class TestsBundle(unittest.TestCase):
+    def setUp(self):
+        files = {
+            "page": r"{% extends 'layout' %}{% block main %}{% include 'widgets/' ~ kind %}{% endblock %}",
+            "layout": r"{% from 'macros' import title %}{{ title() }}{% block main %}{% endblock %}",
+            "macros": r"{% macro title() %}TITLE {% endmacro %}",
+            "widgets/a": r"A",
+            "widgets/b": r"B",
+            "unrelated": r"{% include 'macros' %}",
+            "optional": r"{% include 'missing' ignore missing %}",
+        }
+        self.env = jinja2.Environment(
+            loader=jinja2.DictLoader(files),
+            extensions=[jinja2td.Introspection],
+        )
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, "bundle.zip")
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_sources(self):
+        self.env.get_template("page").render(kind="a")
+
+        names = self.env.dependencies.bundle(self.env, ["page"], self.path)
+
+        self.assertEqual(["layout", "macros", "page", "widgets/a"], names)
+        env = jinja2.Environment(loader=jinja2td.BundleLoader(self.path))
+        self.assertEqual(
+            ["layout", "macros", "page", "widgets/a"], env.list_templates()
+        )
+        self.assertEqual("TITLE A", env.get_template("page").render(kind="a"))
+
+    def test_compiled(self):
+        self.env.get_template("page").render(kind="b")
+
+        self.env.dependencies.bundle(self.env, ["page"], self.path, compiled=True)
+
+        env = jinja2.Environment(
+            loader=jinja2.ModuleLoader(self.path),
+            extensions=[jinja2td.Introspection],
+        )
+        self.assertEqual("TITLE B", env.get_template("page").render(kind="b"))
+        with self.assertRaises(jinja2.TemplateNotFound):
+            env.get_template("unrelated")
+        self.assertEqual(
+            ["layout", "macros", "page", "widgets/b"],
+            sorted(t.name for t in env.dependencies.templates),
+        )
+
+    def test_not_compiled_yet(self):
+        # the dependencies are found by scanning the templates
+        names = self.env.dependencies.bundle(self.env, ["page", "optional"], self.path)
+
+        self.assertEqual(["layout", "macros", "optional", "page"], names)
+
+    def test_missing_entry(self):
+        with self.assertRaises(jinja2.TemplateNotFound):
+            self.env.dependencies.bundle(self.env, ["missing"], self.path)
@@ -0,0 +1,134 @@
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+
+import jinja2
+import jinja2td
+from jinja2td.__main__ import _write_dot, main
+
+
+class TestsCli(unittest.TestCase):
+    def setUp(self):
+        files = {
+            "page.html": r"{% extends 'layout.html' %}{% block main %}{% include 'item.html' %}{% endblock %}",
+            "layout.html": r"{% import 'macros.html' as m %}{% block main %}{% endblock %}",
+            "item.html": r"{% include 'widgets/' ~ kind ~ '.html' %}",
+            "macros.html": r"{% macro title() %}TITLE{% endmacro %}",
+            "notes.txt": r"{% include 'page.html' %}",
+        }
+        self.dir = tempfile.TemporaryDirectory()
+        for name, source in files.items():
+            with open(os.path.join(self.dir.name, name), "w") as f:
+                f.write(source)
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def run_main(self, *args):
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            status = main(["-s", self.dir.name, *args])
+        return status, out.getvalue()
+
+    def test_stats(self):
+        status, out = self.run_main("-e", "html", "stats")
+
+        self.assertEqual(0, status)
+        self.assertIn("templates: 4\n", out)
+        self.assertIn("dependencies: 4\n", out)
+        self.assertIn("  include: 2\n", out)
+        self.assertIn("dynamic dependencies: 1\n", out)
+        self.assertIn("compiled (not scanned): 1\n", out)
+
+    def test_workers(self):
+        sequential = self.run_main("stats")
+        parallel = self.run_main("-w", "2", "stats")
+
+        self.assertEqual(sequential, parallel)
+
+    def test_queries(self):
+        status, out = self.run_main("dependents", "layout.html")
+        self.assertEqual(0, status)
+        self.assertEqual(["notes.txt", "page.html"], sorted(out.split()))
+
+        status, out = self.run_main("dependencies", "page.html")
+        self.assertEqual(0, status)
+        self.assertEqual(
+            ["item.html", "layout.html", "macros.html"], sorted(out.split())
+        )
+
+        with contextlib.redirect_stderr(io.StringIO()):
+            status, out = self.run_main("dependencies", "missing.html")
+        self.assertEqual(1, status)
+
+    def test_export_json(self):
+        status, out = self.run_main("-w", "2", "export")
+
+        self.assertEqual(0, status)
+        templates = json.loads(out)["templates"]
+        self.assertEqual(
+            ["item.html", "layout.html", "macros.html", "notes.txt", "page.html"],
+            [t["name"] for t in templates],
+        )
+        target = templates[0]["dependencies"][0]["targets"][0]
+        self.assertEqual("widgets/*.html", target["pattern"])
+
+    def test_export_dot(self):
+        status, out = self.run_main("export", "-f", "dot")
+
+        self.assertEqual(0, status)
+        self.assertTrue(out.startswith("digraph dependencies {\n"))
+        self.assertIn('"page.html" -> "layout.html" [label="extends"];\n', out)
+        self.assertIn('"dynamic:0" [label="widgets/*.html", style=dashed];\n', out)
+        self.assertIn('"item.html" -> "dynamic:0" [label="include", style=dashed];\n', out)
+
+    def test_export_dot_kind(self):
+        env = jinja2.Environment(
+            loader=jinja2.DictLoader({"page": r"PAGE"}),
+            extensions=[jinja2td.Introspection],
+        )
+        env.dependencies.register_kind("my-kind")
+        env.get_template("page")
+        env.dependencies.add_dependency("page", "my-kind", "card")
+
+        out = io.StringIO()
+        _write_dot(env.dependencies.templates, out)
+        self.assertIn('"page" -> "card" [label="my-kind"];\n', out.getvalue())
+
+    def test_export_mapped(self):
+        path = os.path.join(self.dir.name, "graph.bin")
+        status, _ = self.run_main("export", "-f", "mapped", "-o", path)
+
+        self.assertEqual(0, status)
+        with jinja2td.MappedGraph(path) as graph:
+            self.assertEqual(
+                ["notes.txt", "page.html"], sorted(graph.find_dependents("item.html"))
+            )
+
+    def test_syntax_error(self):
+        with open(os.path.join(self.dir.name, "broken.html"), "w") as f:
+            f.write(r"{% include ('a' %}")
+
+        with contextlib.redirect_stderr(io.StringIO()) as err:
+            status, _ = self.run_main("stats")
+        self.assertEqual(1, status)
+        self.assertIn("broken.html", err.getvalue())
+
+    def test_affected(self):
+        status, out = self.run_main(
+            "affected", os.path.join(self.dir.name, "macros.html")
+        )
+
+        self.assertEqual(0, status)
+        self.assertEqual(
+            ["layout.html", "macros.html", "notes.txt", "page.html"], out.split()
+        )
+
+    def test_metrics(self):
+        status, out = self.run_main("metrics", "-n", "1")
+        self.assertEqual(0, status)
+        header, line = out.splitlines()
+        self.assertEqual(["3", "0", "4", "0", "1", "notes.txt"], line.split("\t"))
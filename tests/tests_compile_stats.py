@@ -0,0 +1,64 @@
+import unittest
+
+import jinja2
+import jinja2td
+
+
+class TestsCompileStats(unittest.TestCase):
+    def setUp(self):
+        files = {
+            "small": r"RAILGUN",
+            "large": r"{% for i in range(10) %}{{ i }}{% endfor %}" * 50,
+        }
+
+        self.env = jinja2.Environment(
+            loader=jinja2.DictLoader(files),
+            extensions=[jinja2td.Introspection],
+        )
+
+    def test_stats(self):
+        self.env.get_template("small")
+
+        stats = self.env.dependencies.get_template("small").compile_stats
+
+        self.assertIsNot(None, stats)
+        self.assertGreaterEqual(stats.preprocess, 0)
+        self.assertGreaterEqual(stats.parse, 0)
+        self.assertGreater(stats.codegen, 0)
+        self.assertGreater(stats.compile, 0)
+        self.assertGreater(stats.code_size, 0)
+        self.assertAlmostEqual(
+            stats.preprocess + stats.parse + stats.codegen + stats.compile,
+            stats.total,
+        )
+
+    def test_raw(self):
+        source = self.env.loader.get_source(self.env, "small")[0]
+        self.env.dependencies._add_template("small", None)
+
+        code = self.env.compile(source, "small", raw=True)
+
+        stats = self.env.dependencies.get_template("small").compile_stats
+
+        self.assertIs(None, stats.compile)
+        self.assertEqual(len(code), stats.code_size)
+
+    def test_slowest_to_compile(self):
+        self.env.get_template("small")
+        self.env.get_template("large")
+
+        slowest = self.env.dependencies.slowest_to_compile()
+
+        self.assertEqual(["large", "small"], [t.name for t in slowest])
+        self.assertGreater(
+            slowest[0].compile_stats.code_size, slowest[1].compile_stats.code_size
+        )
+
+    def test_syntax_error(self):
+        with self.assertRaises(jinja2.TemplateSyntaxError):
+            self.env.from_string(r"{% include %}")
+
+    def test_without_jinja2td(self):
+        env = jinja2.Environment()
+
+        self.assertEqual("RAILGUN", env.from_string(r"{{ 'RAILGUN' }}").render())
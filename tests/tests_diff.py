@@ -0,0 +1,107 @@
+import os
+import tempfile
+import unittest
+
+import jinja2
+import jinja2td
+
+
+class TestsDiff(unittest.TestCase):
+    def setUp(self):
+        self.files = {
+            "page": r"{% extends 'layout' %}{% block main %}{% include 'item' %}{% endblock %}",
+            "layout": r"{% block main %}{% endblock %}",
+            "item": r"ITEM",
+            "about": r"{% extends 'layout' %}",
+            "widget": r"{% include 'widgets/' ~ kind %}",
+            "widgets/a": r"A",
+            "standalone": r"STANDALONE",
+        }
+
+    def graph(self, files):
+        env = jinja2.Environment(
+            loader=jinja2.DictLoader(files),
+            extensions=[jinja2td.Introspection],
+        )
+        env.dependencies.scan(env)
+        return env.dependencies
+
+    def test_identical(self):
+        diff = jinja2td.GraphDiff(self.graph(self.files), self.graph(self.files))
+
+        self.assertEqual([], diff.added + diff.removed + diff.changed)
+        self.assertEqual([], diff.invalidated)
+
+    def test_source_changed(self):
+        old = self.graph(self.files)
+        self.files["item"] = r"NEW ITEM"
+        diff = jinja2td.GraphDiff(old, self.graph(self.files))
+
+        self.assertEqual(["item"], diff.changed)
+        self.assertEqual([], diff.added_edges)
+        self.assertEqual(["item", "page"], diff.invalidated)
+        self.assertEqual(["item", "page"], diff.rewarm)
+
+    def test_edges(self):
+        old = self.graph(self.files)
+        self.files["about"] = r"{% extends 'layout' %}{% include 'item' %}"
+        diff = jinja2td.GraphDiff(old, self.graph(self.files))
+
+        self.assertEqual(["about"], diff.changed)
+        self.assertEqual([("about", "item", "include")], diff.added_edges)
+        self.assertEqual([], diff.removed_edges)
+        self.assertEqual(["about"], diff.invalidated)
+
+    def test_added_removed(self):
+        old = self.graph(self.files)
+        del self.files["layout"]
+        self.files["widgets/b"] = r"B"
+        diff = jinja2td.GraphDiff(old, self.graph(self.files))
+
+        self.assertEqual(["widgets/b"], diff.added)
+        self.assertEqual(["layout"], diff.removed)
+        self.assertEqual(
+            ["about", "layout", "page", "widget", "widgets/b"], diff.invalidated
+        )
+        self.assertEqual(["about", "page", "widget", "widgets/b"], diff.rewarm)
+
+    def test_from_string(self):
+        old = self.graph(self.files)
+        self.files["item"] = r"NEW ITEM"
+        new = self.graph(self.files)
+        env = jinja2.Environment(
+            loader=jinja2.DictLoader(self.files),
+            extensions=[jinja2td.Introspection.sharing(new)],
+        )
+        env.from_string(r"{% include 'item' %}")
+        diff = jinja2td.GraphDiff(old, new)
+
+        self.assertEqual(["item"], diff.changed)
+        self.assertEqual(["item", "page"], diff.invalidated)
+
+    def test_mapped(self):
+        old = self.graph(self.files)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "graph.bin")
+            old.export(path)
+            self.files["standalone"] = r"CHANGED"
+            with jinja2td.MappedGraph(path) as snapshot:
+                self.assertEqual(
+                    old.get_template("item").checksum,
+                    snapshot.get_template("item").checksum,
+                )
+                diff = jinja2td.GraphDiff(snapshot, self.graph(self.files))
+
+        self.assertEqual(["standalone"], diff.invalidated)
+
+    def test_checksum(self):
+        env = jinja2.Environment(
+            loader=jinja2.DictLoader(self.files),
+            extensions=[jinja2td.Introspection],
+        )
+        env.get_template("page")
+
+        self.assertEqual(
+            self.graph(self.files).get_template("page").checksum,
+            env.dependencies.get_template("page").checksum,
+        )
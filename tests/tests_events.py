@@ -0,0 +1,113 @@
+import threading
+import unittest
+
+import jinja2
+import jinja2td
+
+
+class TestsEvents(unittest.TestCase):
+    def setUp(self):
+        files = {
+            "railgun": r"RAILGUN",
+            "page": r"Modelcase_{% include 'railgun' %}",
+        }
+
+        self.env = jinja2.Environment(
+            loader=jinja2.DictLoader(files),
+            extensions=[jinja2td.Introspection],
+        )
+
+    def test_events(self):
+        received = []
+        self.env.dependencies.subscribe(received.append)
+
+        self.env.get_template("page").render()
+
+        self.assertEqual(
+            [
+                ("template-registered", "page", None),
+                ("dependency-registered", "page", None),
+                ("template-registered", "railgun", None),
+                ("dependency-resolved", "page", "railgun"),
+            ],
+            [(e.type, e.template, e.target) for e in received],
+        )
+        self.assertEqual("include", received[1].dependency.type)
+        self.assertIs(received[1].dependency, received[3].dependency)
+
+    def test_recompiled(self):
+        self.env.get_template("page")
+        received = []
+        self.env.dependencies.subscribe(received.append)
+
+        self.env.cache.clear()
+        self.env.get_template("page")
+
+        self.assertEqual(["template-recompiled"], [e.type for e in received])
+        self.assertTrue(self.env.dependencies.get_template("page").was_modified)
+
+    def test_types(self):
+        received = []
+        self.env.dependencies.subscribe(received.append, types=["dependency-resolved"])
+
+        self.env.get_template("page").render()
+
+        self.assertEqual(["dependency-resolved"], [e.type for e in received])
+
+    def test_unsubscribe(self):
+        received = []
+        subscription = self.env.dependencies.subscribe(received.append)
+        subscription.unsubscribe()
+
+        self.env.get_template("page").render()
+
+        self.assertEqual([], received)
+
+    def test_batched(self):
+        batches = []
+        subscription = self.env.dependencies.subscribe(
+            batches.append, batched=True, interval=60
+        )
+
+        self.env.get_template("page").render()
+
+        self.assertEqual([], batches)
+
+        subscription.unsubscribe()
+
+        self.assertEqual(1, len(batches))
+        self.assertEqual(4, len(batches[0]))
+
+    def test_unsubscribe_from_callback(self):
+        batches = []
+        done = threading.Event()
+
+        def callback(batch):
+            batches.append(batch)
+            subscription.unsubscribe()
+            done.set()
+
+        subscription = self.env.dependencies.subscribe(
+            callback, batched=True, interval=0.01
+        )
+        self.env.get_template("page").render()
+
+        self.assertTrue(done.wait(5))
+        self.env.get_template("railgun").render()
+        self.assertEqual(1, len(batches))
+
+    def test_ring_buffer(self):
+        batches = []
+        subscription = self.env.dependencies.subscribe(
+            batches.append, batched=True, buffer_size=2, interval=60
+        )
+
+        self.env.get_template("page").render()
+        subscription.flush()
+
+        self.assertEqual(2, subscription.dropped)
+        self.assertEqual(
+            ["template-registered", "dependency-resolved"],
+            [e.type for e in batches[0]],
+        )
+        subscription.unsubscribe()
@@ -0,0 +1,103 @@
+import os
+import tempfile
+import unittest
+
+import jinja2
+import jinja2td
+
+
+class TestsFiles(unittest.TestCase):
+    def setUp(self):
+        files = {
+            "base.html": r"{% block main %}{% endblock %}",
+            "page.html": r"{% extends 'base.html' %}{% block main %}{% include 'item.html' %}{% endblock %}",
+            "item.html": r"ITEM",
+            "other.html": r"{% include 'widgets/' ~ kind %}",
+            "widgets/a": r"A",
+        }
+        self.dir = tempfile.TemporaryDirectory()
+        for name, source in files.items():
+            path = os.path.join(self.dir.name, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w") as f:
+                f.write(source)
+
+        files_loader = jinja2.FileSystemLoader(self.dir.name)
+        self.env = jinja2.Environment(
+            loader=jinja2.ChoiceLoader(
+                [
+                    jinja2.PrefixLoader({"site": files_loader}),
+                    files_loader,
+                ]
+            ),
+            extensions=[jinja2td.Introspection],
+        )
+        self.env.dependencies.scan(self.env)
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.dir.name, name)
+
+    def test_by_file(self):
+        self.assertEqual(
+            ["item.html", "site/item.html"],
+            self.env.dependencies.find_templates_by_file(self.path("item.html")),
+        )
+        self.assertEqual(
+            [], self.env.dependencies.find_templates_by_file(self.path("missing.html"))
+        )
+
+    def test_relative(self):
+        cwd = os.getcwd()
+        os.chdir(self.dir.name)
+        try:
+            self.assertEqual(
+                ["base.html", "site/base.html"],
+                self.env.dependencies.find_templates_by_file("base.html"),
+            )
+        finally:
+            os.chdir(cwd)
+
+    def test_affected(self):
+        self.assertEqual(
+            ["base.html", "page.html", "site/base.html", "site/page.html"],
+            self.env.dependencies.find_affected_by_files([self.path("base.html")]),
+        )
+        self.assertEqual(
+            ["other.html", "site/other.html", "site/widgets/a", "widgets/a"],
+            self.env.dependencies.find_affected_by_files(
+                [self.path("widgets/a"), self.path("unknown.txt")]
+            ),
+        )
+
+    def test_affected_from_string(self):
+        self.env.from_string(r"{% include 'item.html' %}")
+
+        self.assertEqual(
+            ["item.html", "page.html", "site/item.html", "site/page.html"],
+            self.env.dependencies.find_affected_by_files([self.path("item.html")]),
+        )
+
+    def test_affected_new_file(self):
+        self.assertEqual(
+            ["other.html", "site/other.html"],
+            self.env.dependencies.find_affected_by_files([self.path("widgets/b")]),
+        )
+        self.assertEqual(
+            [], self.env.dependencies.find_affected_by_files([self.path("new.html")])
+        )
+
+    def test_moved(self):
+        source, _, _ = self.env.loader.get_source(self.env, "item.html")
+        self.env.compile(source, "item.html", self.path("moved.html"))
+
+        self.assertEqual(
+            ["item.html"],
+            self.env.dependencies.find_templates_by_file(self.path("moved.html")),
+        )
+        self.assertEqual(
+            ["site/item.html"],
+            self.env.dependencies.find_templates_by_file(self.path("item.html")),
+        )
@@ -0,0 +1,63 @@
+import threading
+import unittest
+
+import jinja2
+import jinja2td
+
+
+class TestsHints(unittest.TestCase):
+    def setUp(self):
+        files = {
+            "page": r"{% extends 'layout' %}{% block main %}{% include 'card' %}{% endblock %}",
+            "layout": r"<{% block main %}{% endblock %}>",
+            "card": r"{% import 'macros' as m %}CARD",
+            "macros": r"{% macro title() %}TITLE{% endmacro %}",
+        }
+        self.env = jinja2.Environment(
+            loader=jinja2.DictLoader(files),
+            extensions=[jinja2td.Introspection],
+        )
+        self.hints = []
+
+    def hint(self, dependent, dependency_type, target):
+        self.hints.append((dependent, dependency_type, target))
+
+    def test_hints(self):
+        with self.env.dependencies.early_hints(self.hint):
+            self.env.get_template("page").render()
+
+        self.assertEqual(
+            [
+                ("page", "extends", "layout"),
+                ("page", "include", "card"),
+                ("card", "import", "macros"),
+            ],
+            self.hints,
+        )
+
+    def test_before_output(self):
+        template = self.env.get_template("page")
+        stream = self.env.dependencies.generate_with_hints(template, self.hint)
+
+        first = next(stream)
+        self.assertEqual("<", first)
+        self.assertEqual([("page", "extends", "layout")], self.hints)
+        self.assertEqual("CARD>", "".join(stream))
+        self.assertEqual(3, len(self.hints))
+
+    def test_scoped(self):
+        template = self.env.get_template("page")
+        template.render()
+        self.assertEqual([], self.hints)
+
+        # other threads rendering at the same time are not concerned
+        with self.env.dependencies.early_hints(self.hint):
+            thread = threading.Thread(target=template.render)
+            thread.start()
+            thread.join()
+        self.assertEqual([], self.hints)
+
+        stream = self.env.dependencies.generate_with_hints(template, self.hint)
+        next(stream)
+        template.render()
+        self.assertEqual(1, len(self.hints))
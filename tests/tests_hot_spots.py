@@ -0,0 +1,91 @@
+import unittest
+
+import jinja2
+import jinja2td
+
+
+class TestsHotSpots(unittest.TestCase):
+    def setUp(self):
+        files = {
+            "variable": r"{{ modelcase }}",
+            "macros": r"{% macro modelcase() %}Modelcase_{% endmacro %}",
+            "flat": r"{% include 'variable' %}",
+            "loop": r"{% for i in range(3) %}{% include 'variable' %}{% endfor %}",
+            "nested": (
+                r"{% for i in range(2) %}{% for j in range(5) %}"
+                r"{% import 'macros' as m with context %}{% include 'variable' %}"
+                r"{% endfor %}{% endfor %}"
+            ),
+            "macro": (
+                r"{% macro card() %}{% include 'variable' %}{% endmacro %}"
+                r"{% call card() %}{% include 'variable' without context %}{% endcall %}"
+            ),
+        }
+
+        self.env = jinja2.Environment(
+            loader=jinja2.DictLoader(files),
+            extensions=[jinja2td.Introspection],
+        )
+        for name in files:
+            self.env.get_template(name)
+
+        self.data = {"modelcase": "RAILGUN"}
+
+    def get_dependencies(self, name):
+        return self.env.dependencies.get_template(name).dependencies
+
+    def test_loop_depth(self):
+        self.assertEqual(0, self.get_dependencies("flat")[0].loop_depth)
+        self.assertEqual(1, self.get_dependencies("loop")[0].loop_depth)
+        self.assertEqual(
+            [2, 2], [d.loop_depth for d in self.get_dependencies("nested")]
+        )
+
+    def test_loop_depth_block(self):
+        self.env.compile(
+            r"{% for i in range(2) %}{% block row %}{% include 'variable' %}"
+            r"{% endblock %}{% else %}{% include 'variable' %}{% endfor %}",
+            "block",
+        )
+        # the block is rendered in the loop, the else only once
+        self.assertEqual(
+            [0, 1], [d.loop_depth for d in self.get_dependencies("block")]
+        )
+
+    def test_macro(self):
+        dependencies = self.get_dependencies("macro")
+
+        self.assertTrue(dependencies[0].in_macro)
+        self.assertFalse(dependencies[0].in_call_block)
+        self.assertFalse(dependencies[1].in_macro)
+        self.assertTrue(dependencies[1].in_call_block)
+
+    def test_render_count(self):
+        self.env.get_template("loop").render(self.data)
+        self.env.get_template("loop").render(self.data)
+
+        loop = self.env.dependencies.get_template("loop")
+        variable = self.env.dependencies.get_template("variable")
+
+        self.assertEqual(2, loop.render_count)
+        self.assertEqual(6, variable.render_count)
+        self.assertEqual(6, loop.dependencies[0].resolve_count)
+
+    def test_static_estimate(self):
+        hot_spots = self.env.dependencies.find_hot_spots(loop_iterations=10)
+
+        self.assertEqual(
+            [("nested", 200), ("loop", 10), ("macro", 2), ("flat", 1)],
+            [(t.name, score) for t, score in hot_spots],
+        )
+
+    def test_observed(self):
+        self.env.get_template("nested").render(self.data)
+        self.env.get_template("loop").render(self.data)
+
+        hot_spots = self.env.dependencies.find_hot_spots(2, loop_iterations=10)
+
+        self.assertEqual(
+            [("nested", 20), ("loop", 3)],
+            [(t.name, score) for t, score in hot_spots],
+        )
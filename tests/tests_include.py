@@ -383,3 +383,17 @@ class TestsInclude(unittest.TestCase):
         self.assertIs(static_nested, nested_includes[0])
 
         # dynamic_nested isn't found because it is dynamic
+
+    def test_was_modified(self):
+        env = jinja2.Environment(
+            loader=TestsInclude.env.loader,
+            extensions=[jinja2td.Introspection],
+        )
+        env.get_template("static")
+
+        self.assertFalse(env.dependencies.get_template("static").was_modified)
+
+        env.cache.clear()
+        env.get_template("static")
+
+        self.assertTrue(env.dependencies.get_template("static").was_modified)
@@ -0,0 +1,201 @@
+import unittest
+
+import jinja2
+import jinja2td
+
+
+class TestsInline(unittest.TestCase):
+    def setUp(self):
+        self.files = {
+            "variable": r"{{ modelcase }}",
+            "set": r"{% set modelcase = 'MENTALOUT' %}{{ modelcase }}",
+            "nested": r"Modelcase_{% include 'variable' %}",
+            "block": r"{% block railgun %}{{ modelcase }}{% endblock %}",
+            "loop": r"{% for i in range(2) %}{% include 'variable' %}{% endfor %}",
+            "static": r"FIVE_Over Modelcase_{% include 'variable' %}",
+            "static_set": r"{% include 'set' %} {{ modelcase }}",
+            "static_nested": r"FIVE_Over {% include 'nested' %}",
+            "static_block": r"FIVE_Over Modelcase_{% include 'block' %}",
+            "static_ignore": r"Modelcase_{% include 'variable' ignore missing %}",
+            "static_without": r"Modelcase_{% include 'variable' without context %}",
+            "recursive": r"{% if not stop %}{% include 'recursive' %}{% endif %}",
+            "missing": r"{% include 'variabl' %}",
+            "invalid": r"{% if %}",
+            "static_invalid": r"{% include 'invalid' %}",
+            "mixed": r"{% include 'variable' %}{% include name %}",
+            "static_mixed": r"{% include 'mixed' %}",
+        }
+
+        self.env = jinja2.Environment(
+            loader=jinja2.DictLoader(self.files),
+            extensions=[jinja2td.Introspection],
+        )
+        self.env.dependencies_inline = True
+
+        self.reference = jinja2.Environment(loader=jinja2.DictLoader(self.files))
+
+        self.data = {"modelcase": "RAILGUN", "stop": True}
+
+    def assertSameOutput(self, name):
+        self.assertEqual(
+            self.reference.get_template(name).render(self.data),
+            self.env.get_template(name).render(self.data),
+        )
+
+    def get_includes(self, name):
+        self.env.get_template(name)
+        return self.env.dependencies.get_template(name).get_includes()
+
+    def test_static(self):
+        self.assertSameOutput("static")
+
+        includes = self.get_includes("static")
+
+        self.assertEqual(1, len(includes))
+        self.assertEqual("variable", includes[0].target.name)
+        self.assertTrue(includes[0].inlined)
+
+        code = self.env.compile(self.files["static"], "static", raw=True)
+
+        self.assertNotIn("get_template", code)
+
+    def test_scope(self):
+        self.assertSameOutput("static_set")
+
+    def test_loop(self):
+        self.assertSameOutput("loop")
+
+    def test_nested(self):
+        self.assertSameOutput("static_nested")
+
+        includes = self.get_includes("static_nested")
+        nested = self.env.dependencies.get_template("nested").get_includes()
+
+        # each template keeps its own includes
+        self.assertEqual(["nested"], [d.target.name for d in includes])
+        self.assertEqual(["variable"], [d.target.name for d in nested])
+        self.assertTrue(includes[0].inlined)
+        self.assertTrue(nested[0].inlined)
+
+        self.assertIn(
+            "static_nested", self.env.dependencies.find_dependents("variable")
+        )
+
+    def test_not_inlined(self):
+        for name in ["static_block", "static_ignore", "static_without"]:
+            self.assertSameOutput(name)
+
+            includes = self.get_includes(name)
+
+            self.assertEqual(1, len(includes))
+            self.assertIs(None, includes[0].inlined)
+
+    def test_recursive(self):
+        self.assertSameOutput("recursive")
+
+    def test_missing(self):
+        with self.assertRaises(jinja2.TemplateNotFound):
+            self.env.get_template("missing").render()
+
+    def test_syntax_error(self):
+        template = self.env.get_template("static_invalid")
+
+        self.assertIs(None, self.get_includes("static_invalid")[0].inlined)
+        with self.assertRaises(jinja2.TemplateSyntaxError):
+            template.render()
+
+    def test_invalidation(self):
+        template = self.env.get_template("static_nested")
+
+        self.assertTrue(template.is_up_to_date)
+
+        self.files["variable"] = r"{{ modelcase | lower }}"
+
+        self.assertFalse(template.is_up_to_date)
+        self.assertEqual(
+            "FIVE_Over Modelcase_railgun",
+            self.env.get_template("static_nested").render(self.data),
+        )
+
+    def test_disabled(self):
+        self.env.dependencies_inline = False
+
+        self.assertSameOutput("static")
+        self.assertIs(None, self.get_includes("static")[0].inlined)
+
+    def test_autoescape(self):
+        files = {
+            "page.html": r"{{ '<' }}{% include 'raw.txt' %}",
+            "raw.txt": r"{{ '<' }}",
+        }
+        env = jinja2.Environment(
+            loader=jinja2.DictLoader(files),
+            extensions=[jinja2td.Introspection],
+            autoescape=jinja2.select_autoescape(["html"]),
+        )
+        env.dependencies_inline = True
+
+        self.assertEqual("&lt;<", env.get_template("page.html").render())
+
+    def test_autoescape_block(self):
+        files = {
+            "page": r"{% autoescape false %}{% include 'item' %}{% endautoescape %}",
+            "item": r"{{ '<' }}",
+        }
+        env = jinja2.Environment(
+            loader=jinja2.DictLoader(files),
+            extensions=[jinja2td.Introspection],
+            autoescape=True,
+        )
+        env.dependencies_inline = True
+
+        self.assertEqual("&lt;", env.get_template("page").render())
+
+    def test_shared(self):
+        graph = jinja2td.DependencyGraph()
+        extension = jinja2td.Introspection.sharing(graph)
+        files = dict(self.files)
+        other = jinja2.Environment(
+            loader=jinja2.DictLoader(files), extensions=[extension]
+        )
+        other.dependencies_inline = True
+        self.env = jinja2.Environment(
+            loader=jinja2.DictLoader(self.files), extensions=[extension]
+        )
+        self.env.dependencies_inline = True
+
+        template = self.env.get_template("static")
+        other.get_template("static")
+        files["variable"] = r"{{ modelcase | lower }}"
+
+        # only the sources of the other environment changed
+        self.assertTrue(template.is_up_to_date)
+
+    def test_join_path(self):
+        class RelativeEnvironment(jinja2.Environment):
+            def join_path(self, template, parent):
+                return parent.rsplit("/", 1)[0] + "/" + template
+
+        files = {
+            "a/page": r"A-{% include 'part' %}",
+            "a/part": r"PART",
+            "part": r"ROOT-PART",
+        }
+        env = RelativeEnvironment(
+            loader=jinja2.DictLoader(files), extensions=[jinja2td.Introspection]
+        )
+        env.dependencies_inline = True
+
+        self.assertEqual("A-PART", env.get_template("a/page").render())
+        includes = env.dependencies.get_template("a/page").get_includes()
+        self.assertEqual(["a/part"], [d.target.name for d in includes])
+        self.assertTrue(includes[0].inlined)
+
+    def test_compiled_before(self):
+        template = self.env.get_template("mixed")
+        self.env.get_template("static_mixed")
+
+        # the code of the template compiled first refers to the same dependencies
+        template.render(self.data, name="variable")
+        dynamic = self.env.dependencies.get_template("mixed").dependencies[1]
+        self.assertEqual(1, dynamic.resolve_count)
@@ -0,0 +1,99 @@
+import unittest
+
+import jinja2
+from jinja2 import nodes
+from jinja2.ext import Extension
+import jinja2td
+
+
+def scan_component(tokens):
+    if len(tokens) == 1 and tokens[0].type == "string":
+        return tokens[0].value
+    return None
+
+
+class Components(Extension):
+    tags = {"component"}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.dependencies.register_kind(
+            "component", scan={"component": scan_component}
+        )
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        target = parser.parse_expression()
+        dependency_id = parser.environment.dependencies.add_dependency(
+            parser.name, "component", target, lineno=lineno, parser=parser
+        )
+        args = [target, nodes.Const(parser.name), nodes.Const(dependency_id)]
+        return nodes.Output([self.call_method("_render", args)], lineno=lineno)
+
+    def _render(self, name, dependent, dependency_id):
+        template = self.environment.get_template(name)
+        self.environment.dependencies.resolve(dependent, dependency_id, template)
+        return template.render()
+
+
+class TestsKinds(unittest.TestCase):
+    def setUp(self):
+        files = {
+            "page": r"{% component 'card' %}{% for k in kinds %}{% component 'icons/' ~ k %}{% endfor %}",
+            "card": r"CARD",
+            "list": r"{% for i in range(2) %}{% component 'card' %}{% else %}{% component 'card' %}{% endfor %}",
+            "icons/a": r"A",
+            "icons/b": r"B",
+        }
+        self.env = jinja2.Environment(
+            loader=jinja2.DictLoader(files),
+            extensions=[jinja2td.Introspection, Components],
+        )
+
+    def test_static(self):
+        self.env.get_template("page")
+
+        dependencies = self.env.dependencies.get_template("page").dependencies
+        self.assertEqual(["component", "component"], [d.type for d in dependencies])
+        self.assertEqual(jinja2td.Target(False, "card"), dependencies[0].target)
+        self.assertEqual("icons/*", dependencies[1].target.pattern)
+        self.assertEqual([0, 1], [d.loop_depth for d in dependencies])
+        self.assertEqual(["card"], self.env.dependencies.get_closure("page"))
+        self.assertEqual(["page"], self.env.dependencies.find_dependents("card"))
+
+    def test_resolved(self):
+        self.env.dependencies.watch()
+        self.assertEqual("CARDAB", self.env.get_template("page").render(kinds="ab"))
+
+        dependencies = self.env.dependencies.get_template("page").dependencies
+        self.assertEqual(["icons/a", "icons/b"], sorted(dependencies[1].resolved))
+        self.assertEqual(
+            {"card", "icons/a", "icons/b"},
+            {t.name for t in self.env.dependencies.used_last_watch()},
+        )
+        hot_spots = self.env.dependencies.find_hot_spots()
+        self.assertEqual([("page", 3.0)], [(t.name, s) for t, s in hot_spots])
+
+    def test_scan(self):
+        compiled = self.env.dependencies.scan(self.env, ["page", "card", "list"])
+
+        # the dynamic target needs the parser
+        self.assertEqual(["page"], compiled)
+        self.assertEqual(
+            2, len(self.env.dependencies.get_template("page").dependencies)
+        )
+        dependencies = self.env.dependencies.get_template("list").dependencies
+        self.assertEqual(["card", "card"], [d.target.name for d in dependencies])
+        self.assertEqual([1, 0], [d.loop_depth for d in dependencies])
+
+    def test_nesting(self):
+        self.env.get_template("list")
+
+        dependencies = self.env.dependencies.get_template("list").dependencies
+        self.assertEqual([1, 0], [d.loop_depth for d in dependencies])
+
+    def test_errors(self):
+        with self.assertRaises(ValueError):
+            self.env.dependencies.register_kind("include")
+        with self.assertRaises(ValueError):
+            self.env.dependencies.add_dependency("page", "svg", "icon")
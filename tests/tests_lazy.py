@@ -0,0 +1,121 @@
+import threading
+import unittest
+from unittest import mock
+
+import jinja2
+import jinja2td
+from jinja2td import dependencies
+
+
+class TestsLazy(unittest.TestCase):
+    def setUp(self):
+        files = {
+            "page": r"{% for i in range(3) %}{% include 'railgun' %}{% endfor %}",
+            "railgun": r"RAILGUN",
+        }
+
+        self.env = jinja2.Environment(
+            loader=jinja2.DictLoader(files),
+            extensions=[jinja2td.Introspection],
+        )
+
+    def test_built_on_query(self):
+        with mock.patch.object(
+            dependencies, "Dependency", wraps=dependencies.Dependency
+        ) as constructor:
+            self.env.get_template("page").render()
+            self.assertEqual(0, constructor.call_count)
+
+            page = self.env.dependencies.get_template("page")
+            self.assertEqual(1, constructor.call_count)
+
+        self.assertEqual(3, page.dependencies[0].resolve_count)
+        self.assertEqual(1, page.render_count)
+
+    def test_batched_subscription(self):
+        batches = []
+        subscription = self.env.dependencies.subscribe(
+            batches.append, batched=True, interval=60
+        )
+        with mock.patch.object(
+            dependencies, "Dependency", wraps=dependencies.Dependency
+        ) as constructor:
+            self.env.get_template("page").render()
+            self.assertEqual(0, constructor.call_count)
+
+            # built when the events are delivered
+            subscription.flush()
+            self.assertEqual(1, constructor.call_count)
+
+        self.assertEqual(6, len(batches[0]))
+        subscription.unsubscribe()
+
+        # a synchronous subscription needs them right away
+        received = []
+        self.env.dependencies.subscribe(received.append)
+        self.env.get_template("page").render()
+        self.assertEqual(3, len(received))
+
+    def test_batched_early(self):
+        delivered = threading.Event()
+        subscription = self.env.dependencies.subscribe(
+            lambda batch: delivered.set(), batched=True, interval=60
+        )
+        with mock.patch.object(dependencies, "_MAX_PENDING", 4):
+            self.env.get_template("page").render()
+
+            # the delivery thread builds the graph, instead of the render
+            self.assertTrue(delivered.wait(5))
+        subscription.unsubscribe()
+
+    def test_incremental(self):
+        self.env.get_template("page").render()
+        page = self.env.dependencies.get_template("page")
+
+        self.env.get_template("page").render()
+        self.assertEqual(3, page.dependencies[0].resolve_count)
+
+        self.env.dependencies.get_template("page")
+        self.assertEqual(6, page.dependencies[0].resolve_count)
+        self.assertEqual(2, page.render_count)
+
+    def test_recompiled(self):
+        self.env.get_template("page")
+        self.env.cache.clear()
+        self.env.get_template("page").render()
+
+        page = self.env.dependencies.get_template("page")
+        self.assertTrue(page.was_modified)
+        self.assertEqual(1, len(page.dependencies))
+        self.assertEqual(3, page.dependencies[0].resolve_count)
+
+    def test_same_ids(self):
+        # another process compiling the templates in another order
+        other = jinja2.Environment(
+            loader=self.env.loader, extensions=[jinja2td.Introspection]
+        )
+        other.get_template("railgun")
+        other.get_template("page")
+
+        source = self.env.loader.get_source(self.env, "page")[0]
+        self.assertEqual(
+            self.env.compile(source, "page", raw=True),
+            other.compile(source, "page", raw=True),
+        )
+
+    def test_recompiled_ids(self):
+        for _ in range(3):
+            self.env.get_template("page")
+            self.env.cache.clear()
+
+        registered = self.env.dependencies._registered()
+        self.assertEqual(1, len(registered))
+        self.assertEqual(1, len(registered[0][2]))
+
+    def test_unqueried(self):
+        template = self.env.get_template("page")
+        for _ in range(dependencies._MAX_PENDING):
+            template.render()
+
+        page = self.env.dependencies._DependencyGraph__templates["page"]
+        self.assertGreater(page.render_count, 0)
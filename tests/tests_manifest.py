@@ -0,0 +1,88 @@
+import os
+import tempfile
+import unittest
+
+import jinja2
+import jinja2td
+
+
+class TestsManifest(unittest.TestCase):
+    def setUp(self):
+        files = {
+            "page": r"{% extends 'layout' %}{% block main %}{% include 'railgun' %}{% endblock %}",
+            "layout": r"{% from 'macros' import title as t %}{% block main %}{% endblock %}",
+            "macros": r"{% macro title() %}TITLE{% endmacro %}",
+            "railgun": r"RAILGUN",
+        }
+
+        self.env = jinja2.Environment(
+            loader=jinja2.DictLoader(files),
+            extensions=[jinja2td.Introspection],
+        )
+        self.dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def load(self, path):
+        return jinja2.Environment(
+            loader=jinja2.ModuleLoader(path),
+            extensions=[jinja2td.Introspection],
+        )
+
+    def check(self, env):
+        self.assertEqual("RAILGUN", env.get_template("page").render())
+
+        graph = env.dependencies
+        self.assertEqual(
+            ["layout", "macros", "page", "railgun"],
+            sorted(t.name for t in graph.templates),
+        )
+        page = graph.get_template("page")
+        self.assertEqual("extends", page.get_parent().type)
+        self.assertEqual(["railgun"], page.get_includes()[0].resolved)
+        self.assertEqual(
+            ["page"], [t.name for t in graph.get_template("layout").find_children()]
+        )
+        self.assertEqual(
+            [("title", "t")],
+            graph.get_template("layout").get_imports()[0].imported_names,
+        )
+        self.assertEqual(["main"], [b.name for b in page.blocks])
+        self.assertEqual(
+            ["layout", "macros", "railgun"], sorted(graph.get_closure("page"))
+        )
+
+    def test_directory(self):
+        self.env.compile_templates(self.dir.name, zip=None)
+
+        self.check(self.load(self.dir.name))
+
+    def test_zip(self):
+        path = os.path.join(self.dir.name, "templates.zip")
+        self.env.compile_templates(path)
+
+        self.check(self.load(path))
+
+    def test_memoize(self):
+        self.env.dependencies_memoize = True
+        self.env.compile_templates(self.dir.name, zip=None)
+
+        # the call sites are part of the compiled code
+        env = self.load(self.dir.name)
+        self.check(env)
+        self.assertEqual("RAILGUN", env.get_template("page").render())
+
+    def test_already_compiled(self):
+        self.env.get_template("page").render()
+        self.env.compile_templates(self.dir.name, zip=None)
+
+        self.check(self.load(self.dir.name))
+
+    def test_without_manifest(self):
+        plain = jinja2.Environment(loader=self.env.loader)
+        plain.compile_templates(self.dir.name, zip=None)
+
+        env = self.load(self.dir.name)
+        self.assertEqual("RAILGUN", env.get_template("page").render())
+        self.assertEqual([], env.dependencies.templates)
@@ -0,0 +1,105 @@
+import os
+import tempfile
+import unittest
+
+import jinja2
+import jinja2td
+from jinja2td.dependencies import _describe
+
+
+class TestsMapped(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        files = {
+            "root": r"FIVE_Over {% block railgun %}{% endblock %}",
+            "macros": r"{% macro modelcase() %}Modelcase_{% endmacro %}",
+            "railgun": r"RAILGUN",
+            "page": (
+                r"{% extends 'root' %}{% from 'macros' import modelcase as m %}"
+                r"{% block railgun %}{{ m() }}{% include ['railgun', 'mental_out'] %}"
+                r"{% include 'widgets/' ~ kind ~ '.j2' ignore missing %}{% endblock %}"
+            ),
+            "other": r"{% import 'macros' as macros with context %}",
+        }
+
+        env = jinja2.Environment(
+            loader=jinja2.DictLoader(files),
+            extensions=[jinja2td.Introspection],
+        )
+        for name in files:
+            env.get_template(name)
+        cls.live = env.dependencies
+
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.path = os.path.join(cls.directory.name, "graph.bin")
+        cls.live.export(cls.path)
+        cls.graph = jinja2td.MappedGraph(cls.path)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.graph.close()
+        cls.directory.cleanup()
+
+    def test_templates(self):
+        names = sorted(t.name for t in TestsMapped.graph.templates)
+
+        self.assertEqual(["macros", "other", "page", "railgun", "root"], names)
+        self.assertIs(None, TestsMapped.graph.get_template("mental_out"))
+        self.assertIs(None, TestsMapped.graph.get_template("unknown"))
+
+    def test_dependencies(self):
+        for live in TestsMapped.live.templates:
+            mapped = TestsMapped.graph.get_template(live.name)
+
+            self.assertEqual(live.file, mapped.file)
+            self.assertEqual(
+                list(map(_describe, live.dependencies)),
+                list(map(_describe, mapped.dependencies)),
+            )
+
+    def test_pattern(self):
+        page = TestsMapped.graph.get_template("page")
+        target = page.get_includes()[1].target
+
+        self.assertEqual("widgets/*.j2", target.pattern)
+        self.assertTrue(page.get_includes()[1].ignore_missing)
+
+    def test_get_parent(self):
+        parent = TestsMapped.graph.get_template("page").get_parent()
+
+        self.assertEqual("root", parent.target.name)
+
+    def test_find(self):
+        graph = TestsMapped.graph
+        page = graph.get_template("page")
+
+        self.assertEqual([page], graph.get_template("root").find_children())
+        self.assertEqual([page], graph.get_template("railgun").find_included())
+        self.assertEqual(
+            [graph.get_template("other"), page],
+            graph.get_template("macros").find_imported(),
+        )
+
+    def test_closure(self):
+        for name in ["page", "root", "railgun", "mental_out"]:
+            self.assertEqual(
+                sorted(TestsMapped.live.get_closure(name)),
+                sorted(TestsMapped.graph.get_closure(name)),
+            )
+            self.assertEqual(
+                sorted(TestsMapped.live.find_dependents(name)),
+                sorted(TestsMapped.graph.find_dependents(name)),
+            )
+
+        self.assertEqual(
+            ["macros", "mental_out", "railgun", "root"],
+            sorted(TestsMapped.graph.get_closure("page")),
+        )
+
+    def test_not_a_graph(self):
+        path = os.path.join(TestsMapped.directory.name, "not_a_graph.bin")
+        with open(path, "wb") as f:
+            f.write(b"FIVE_Over Modelcase_RAILGUN")
+
+        with self.assertRaises(ValueError):
+            jinja2td.MappedGraph(path)
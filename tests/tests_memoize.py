@@ -0,0 +1,147 @@
+import tempfile
+import unittest
+
+import jinja2
+import jinja2td
+
+
+class TestsMemoize(unittest.TestCase):
+    def setUp(self):
+        self.files = {
+            "variable": r"{{ modelcase }}",
+            "root": r"FIVE_Over {% block railgun %}{% endblock %}",
+            "macros": r"{% macro modelcase() %}Modelcase_{% endmacro %}",
+            "include": r"FIVE_Over Modelcase_{% for i in range(3) %}{% include 'variable' %}{% endfor %}",
+            "import": r"{% import 'macros' as m %}FIVE_Over {{ m.modelcase() }}RAILGUN",
+            "from": r"{% from 'macros' import modelcase %}FIVE_Over {{ modelcase() }}RAILGUN",
+            "extends": r"{% extends 'root' %}{% block railgun %}Modelcase_RAILGUN{% endblock %}",
+            "dynamic": r"FIVE_Over Modelcase_{% include name %}",
+        }
+
+        self.env = jinja2.Environment(
+            loader=jinja2.DictLoader(self.files),
+            extensions=[jinja2td.Introspection],
+        )
+        self.env.dependencies_memoize = True
+
+        self.calls = []
+        get_template = self.env.get_template
+
+        def counting_get_template(name, *args, **kwargs):
+            self.calls.append(name)
+            return get_template(name, *args, **kwargs)
+
+        self.env.get_template = counting_get_template
+
+        self.data = {"modelcase": "RAILGUN", "name": "variable"}
+
+    def render(self, name):
+        return self.env.get_template(name).render(self.data)
+
+    def test_include(self):
+        self.assertEqual(
+            "FIVE_Over Modelcase_RAILGUNRAILGUNRAILGUN", self.render("include")
+        )
+        self.assertEqual(["include", "variable"], self.calls)
+
+        self.render("include")
+
+        self.assertEqual(["include", "variable", "include"], self.calls)
+
+    def test_import(self):
+        for name in ["import", "from"]:
+            self.assertEqual("FIVE_Over Modelcase_RAILGUN", self.render(name))
+            self.assertEqual("FIVE_Over Modelcase_RAILGUN", self.render(name))
+
+        # once for each call site
+        self.assertEqual(2, self.calls.count("macros"))
+
+    def test_extends(self):
+        self.assertEqual("FIVE_Over Modelcase_RAILGUN", self.render("extends"))
+        self.assertEqual("FIVE_Over Modelcase_RAILGUN", self.render("extends"))
+
+        self.assertEqual(1, self.calls.count("root"))
+
+    def test_dynamic(self):
+        self.render("dynamic")
+        self.render("dynamic")
+
+        self.assertEqual(2, self.calls.count("variable"))
+
+    def test_tracking(self):
+        self.env.dependencies.watch()
+        self.render("include")
+        self.render("include")
+
+        dependency = self.env.dependencies.get_template("include").dependencies[0]
+
+        self.assertEqual(6, len(dependency.resolved))
+
+    def test_invalidate(self):
+        self.render("include")
+        self.files["variable"] = r"{{ modelcase | lower }}"
+
+        self.assertEqual(
+            "FIVE_Over Modelcase_RAILGUNRAILGUNRAILGUN", self.render("include")
+        )
+
+        self.env.dependencies.invalidate("variable")
+
+        self.assertEqual(
+            "FIVE_Over Modelcase_railgunrailgunrailgun", self.render("include")
+        )
+
+    def test_recompiled(self):
+        self.render("include")
+        self.files["variable"] = r"{{ modelcase | lower }}"
+
+        # loading the template somewhere else recompiles it
+        self.env.get_template("variable")
+
+        self.assertEqual(
+            "FIVE_Over Modelcase_railgunrailgunrailgun", self.render("include")
+        )
+
+    def test_disabled(self):
+        self.env.dependencies_memoize = False
+        self.render("include")
+        self.render("include")
+
+        self.assertEqual(6, self.calls.count("variable"))
+
+    def test_bytecode_cache(self):
+        with tempfile.TemporaryDirectory() as directory:
+            files = {"page": r"{% include 'a' %}", "a": r"A", "b": r"B"}
+            env = jinja2.Environment(
+                loader=jinja2.DictLoader(files),
+                extensions=[jinja2td.Introspection],
+                bytecode_cache=jinja2.FileSystemBytecodeCache(directory),
+            )
+            env.dependencies_memoize = True
+            self.assertEqual("A", env.get_template("page").render())
+
+            # another process compiles the new version, with its own graph
+            files["page"] = r"{% include 'b' %}"
+            other = jinja2.Environment(
+                loader=jinja2.DictLoader(files),
+                extensions=[jinja2td.Introspection],
+                bytecode_cache=jinja2.FileSystemBytecodeCache(directory),
+            )
+            other.dependencies_memoize = True
+            other.get_template("page")
+
+            # the new version is loaded from the bytecode cache, not compiled
+            self.assertEqual("B", env.get_template("page").render())
+
+    def test_shared(self):
+        extension = jinja2td.Introspection.sharing(jinja2td.DependencyGraph())
+        outputs = []
+        for text in ["EN", "FR"]:
+            env = jinja2.Environment(
+                loader=jinja2.DictLoader({"page": r"{% include 'a' %}", "a": text}),
+                extensions=[extension],
+            )
+            env.dependencies_memoize = True
+            outputs.append(env.get_template("page").render())
+
+        self.assertEqual(["EN", "FR"], outputs)
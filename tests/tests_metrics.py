@@ -0,0 +1,88 @@
+import unittest
+
+import jinja2
+import jinja2td
+
+
+class TestsMetrics(unittest.TestCase):
+    def setUp(self):
+        self.files = {
+            "page": r"{% extends 'layout' %}{% block main %}{% include 'card' %}{% endblock %}",
+            "layout": r"{% extends 'base' %}{% block main %}{% endblock %}",
+            "base": r"{% from 'macros' import title %}{% block main %}{% endblock %}",
+            "card": r"{% include 'icon' %}{% include 'macros' %}",
+            "icon": r"ICON",
+            "macros": r"{% macro title() %}TITLE{% endmacro %}",
+            "tree": r"{% if node.children %}{% include 'branch' %}{% endif %}",
+            "branch": r"{% include 'tree' %}",
+            "widget": r"{% include 'widgets/' ~ kind %}",
+        }
+        self.env = jinja2.Environment(
+            loader=jinja2.DictLoader(self.files),
+            extensions=[jinja2td.Introspection],
+        )
+        self.env.dependencies.scan(self.env)
+
+    def test_metrics(self):
+        m = self.env.dependencies.get_metrics("page")
+
+        self.assertEqual(3, m.depth)
+        self.assertEqual(2, m.extends_depth)
+        self.assertEqual(5, m.transitive_count)
+        self.assertEqual(0, m.fan_in)
+        self.assertEqual(2, m.fan_out)
+        self.assertFalse(m.in_cycle)
+        self.assertEqual(["page", "layout", "base", "macros"], m.critical_path)
+
+        m = self.env.dependencies.get_metrics("macros")
+        self.assertEqual(0, m.depth)
+        self.assertEqual(2, m.fan_in)
+        self.assertEqual(["macros"], m.critical_path)
+
+    def test_dynamic(self):
+        m = self.env.dependencies.get_metrics("widget")
+
+        self.assertEqual(0, m.depth)
+        self.assertEqual(0, m.fan_out)
+        self.assertIsNone(self.env.dependencies.get_metrics("widgets/a"))
+
+    def test_cycle(self):
+        tree = self.env.dependencies.get_metrics("tree")
+        branch = self.env.dependencies.get_metrics("branch")
+
+        self.assertTrue(tree.in_cycle)
+        self.assertTrue(branch.in_cycle)
+        self.assertEqual(1, tree.transitive_count)
+        self.assertEqual(0, tree.depth)
+
+    def test_ranking(self):
+        ranking = self.env.dependencies.rank_by_metrics("transitive_count", 2)
+
+        self.assertEqual(["page", "card"], [m.name for m in ranking])
+        self.assertEqual(
+            "macros", self.env.dependencies.rank_by_metrics("fan_in")[0].name
+        )
+        with self.assertRaises(ValueError):
+            self.env.dependencies.rank_by_metrics("size")
+
+    def test_from_string(self):
+        self.env.from_string(r"{% include 'card' %}")
+        ranking = self.env.dependencies.rank_by_metrics("transitive_count", 2)
+
+        self.assertEqual(["page", "card"], [m.name for m in ranking])
+        self.assertNotIn(
+            None, [m.name for m in self.env.dependencies.rank_by_metrics()]
+        )
+
+    def test_incremental(self):
+        self.assertEqual(3, self.env.dependencies.get_metrics("page").depth)
+
+        # a new dependency deep down changes the metrics of the dependents
+        self.files["icon"] = r"{% include 'sprite' %}"
+        self.files["sprite"] = r"SPRITE"
+        self.env.dependencies.scan(self.env, ["icon", "sprite"])
+
+        page = self.env.dependencies.get_metrics("page")
+        self.assertEqual(6, page.transitive_count)
+        self.assertEqual(["page", "card", "icon", "sprite"], page.critical_path)
+        self.assertEqual(1, self.env.dependencies.get_metrics("sprite").fan_in)
@@ -0,0 +1,83 @@
+import unittest
+
+import jinja2
+import jinja2td
+
+
+class CountingLoader(jinja2.DictLoader):
+    def __init__(self, mapping):
+        super().__init__(mapping)
+        self.lookups = []
+
+    def get_source(self, environment, template):
+        self.lookups.append(template)
+        return super().get_source(environment, template)
+
+
+class TestsMissing(unittest.TestCase):
+    def setUp(self):
+        self.loader = CountingLoader(
+            {
+                "optional": r"[{% include 'extra' ignore missing %}]",
+                "themed": r"{% include ['custom/a', 'default/a'] %}",
+                "default/a": r"DEFAULT",
+            }
+        )
+        self.env = jinja2.Environment(
+            loader=self.loader, extensions=[jinja2td.Introspection]
+        )
+        self.env.dependencies_cache_missing = True
+
+    def render_twice(self, name):
+        self.env.get_template(name).render()
+        self.loader.lookups.clear()
+        return self.env.get_template(name).render()
+
+    def test_ignore_missing(self):
+        self.assertEqual("[]", self.render_twice("optional"))
+        self.assertEqual([], self.loader.lookups)
+
+    def test_select_template(self):
+        self.assertEqual("DEFAULT", self.render_twice("themed"))
+        self.assertEqual([], self.loader.lookups)
+
+    def test_disabled(self):
+        self.env.dependencies_cache_missing = False
+        self.render_twice("optional")
+        self.assertEqual(["extra"], self.loader.lookups)
+
+    def test_none(self):
+        self.env.dependencies_cache_missing = None
+        self.render_twice("optional")
+        self.assertEqual(["extra"], self.loader.lookups)
+
+    def test_invalidate(self):
+        self.render_twice("themed")
+        self.loader.mapping["custom/a"] = r"CUSTOM"
+        self.assertEqual("DEFAULT", self.env.get_template("themed").render())
+
+        self.env.dependencies.invalidate("custom/a")
+        self.assertEqual("CUSTOM", self.env.get_template("themed").render())
+
+    def test_forget(self):
+        self.render_twice("optional")
+        self.loader.mapping["extra"] = r"EXTRA"
+        self.env.dependencies.forget_missing(self.env)
+        self.assertEqual("[EXTRA]", self.env.get_template("optional").render())
+
+    def test_new_loader(self):
+        self.render_twice("optional")
+        self.env.loader = jinja2.DictLoader(
+            {"optional": self.loader.mapping["optional"], "extra": r"EXTRA"}
+        )
+        self.assertEqual("[EXTRA]", self.env.get_template("optional").render())
+
+    def test_ttl(self):
+        self.env.dependencies_cache_missing = 0.0
+        self.render_twice("optional")
+        self.assertEqual(["extra"], self.loader.lookups)
+
+    def test_not_found(self):
+        for _ in range(2):
+            with self.assertRaises(jinja2.TemplateNotFound):
+                self.env.get_template("extra")
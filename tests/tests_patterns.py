@@ -0,0 +1,89 @@
+import unittest
+
+import jinja2
+import jinja2td
+
+
+class TestsPatterns(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        files = {
+            "widgets/railgun.j2": r"RAILGUN",
+            "widgets/mental_out.j2": r"MENTALOUT",
+            "layouts/dark.j2": r"FIVE_Over {% block content %}{% endblock %}",
+            "concat": r"Modelcase_{% include 'widgets/' ~ kind ~ '.j2' %}",
+            "add": r"Modelcase_{% include 'widgets/' + kind + '.j2' %}",
+            "mod": r"{% extends 'layouts/%s.j2' % theme %}{% block content %}Modelcase_RAILGUN{% endblock %}",
+            "format": r"{% import 'widgets/%s.j2'|format(kind) as w %}Modelcase_RAILGUN",
+            "percent": r"{% include 'widgets/%d%%/%s.j2' % (1, kind) ignore missing %}",
+            "opaque": r"{% include widget %}",
+            "multiple": r"{% include ['widgets/' ~ kind ~ '.j2', 'widgets/railgun.j2'] %}",
+        }
+
+        cls.env = jinja2.Environment(
+            loader=jinja2.DictLoader(files),
+            extensions=[jinja2td.Introspection],
+        )
+
+        cls.data = {"kind": "railgun", "theme": "dark", "widget": "widgets/railgun.j2"}
+
+    def get_target(self, name):
+        TestsPatterns.env.get_template(name).render(TestsPatterns.data)
+        return TestsPatterns.env.dependencies.get_template(name).dependencies[0].target
+
+    def test_concat(self):
+        target = self.get_target("concat")
+
+        self.assertTrue(target.is_dynamic)
+        self.assertIs(None, target.name)
+        self.assertEqual("widgets/*.j2", target.pattern)
+        self.assertEqual("widgets/", target.prefix)
+        self.assertEqual(".j2", target.suffix)
+
+    def test_add(self):
+        target = self.get_target("add")
+
+        self.assertEqual("widgets/*.j2", target.pattern)
+
+    def test_mod(self):
+        target = self.get_target("mod")
+
+        self.assertEqual("layouts/*.j2", target.pattern)
+
+    def test_format(self):
+        target = self.get_target("format")
+
+        self.assertEqual("widgets/*.j2", target.pattern)
+
+    def test_percent(self):
+        target = self.get_target("percent")
+
+        self.assertEqual("widgets/*%/*.j2", target.pattern)
+
+    def test_opaque(self):
+        target = self.get_target("opaque")
+
+        self.assertTrue(target.is_dynamic)
+        self.assertIs(None, target.pattern)
+        self.assertEqual([], target.expand(TestsPatterns.env))
+
+    def test_multiple(self):
+        TestsPatterns.env.get_template("multiple")
+        targets = (
+            TestsPatterns.env.dependencies.get_template("multiple")
+            .dependencies[0]
+            .targets
+        )
+
+        self.assertEqual("widgets/*.j2", targets[0].pattern)
+        self.assertFalse(targets[1].is_dynamic)
+
+    def test_expand(self):
+        target = self.get_target("concat")
+
+        self.assertEqual(
+            ["widgets/mental_out.j2", "widgets/railgun.j2"],
+            sorted(target.expand(TestsPatterns.env)),
+        )
+        self.assertTrue(target.matches("widgets/railgun.j2"))
+        self.assertFalse(target.matches("layouts/dark.j2"))
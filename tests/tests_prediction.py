@@ -0,0 +1,99 @@
+import unittest
+
+import jinja2
+import jinja2td
+
+
+class TestsPrediction(unittest.TestCase):
+    def setUp(self):
+        files = {
+            "railgun": r"RAILGUN",
+            "mental_out": r"MENTALOUT",
+            "meltdowner": r"MELTDOWNER",
+            "page": r"Modelcase_{% include ability %}",
+            "static": r"Modelcase_{% include 'railgun' %}",
+            "twice": r"{% include 'railgun' %}{% include 'railgun' %}",
+        }
+
+        self.env = jinja2.Environment(
+            loader=jinja2.DictLoader(files),
+            extensions=[jinja2td.Introspection],
+        )
+
+    def render_page(self, *abilities):
+        template = self.env.get_template("page")
+        for ability in abilities:
+            template.render(ability=ability)
+
+    def is_cached(self, name):
+        return any(key[1] == name for key in self.env.cache.keys())
+
+    def test_predict(self):
+        self.render_page("railgun", "mental_out", "railgun", "railgun")
+
+        dependency = self.env.dependencies.get_template("page").dependencies[0]
+
+        self.assertEqual([("railgun", 3), ("mental_out", 1)], dependency.predict())
+        self.assertEqual([("railgun", 3)], dependency.predict(1))
+
+    def test_predict_static(self):
+        self.env.get_template("static").render()
+
+        dependency = self.env.dependencies.get_template("static").dependencies[0]
+
+        self.assertEqual([], dependency.predict())
+
+    def test_predict_bounded(self):
+        self.env.dependencies.prediction_capacity = 2
+        self.render_page("railgun", "railgun", "mental_out", "meltdowner")
+
+        dependency = self.env.dependencies.get_template("page").dependencies[0]
+        predicted = dependency.predict()
+
+        self.assertEqual(2, len(predicted))
+        self.assertEqual(("railgun", 2), predicted[0])
+        self.assertEqual(("meltdowner", 2), predicted[1])
+
+    def test_recompile_keeps_statistics(self):
+        self.render_page("railgun")
+        self.env.cache.clear()
+        self.render_page("railgun")
+
+        dependencies = self.env.dependencies.get_template("page").dependencies
+
+        self.assertEqual(1, len(dependencies))
+        self.assertEqual([("railgun", 2)], dependencies[0].predict())
+
+    def test_identical_sites(self):
+        self.env.get_template("twice").render()
+        self.env.cache.clear()
+        self.env.get_template("twice").render()
+
+        dependencies = self.env.dependencies.get_template("twice").dependencies
+
+        self.assertEqual(2, len(dependencies))
+        self.assertIsNot(dependencies[0], dependencies[1])
+        self.assertEqual(2, len({hash(d) for d in dependencies}))
+        for d in dependencies:
+            self.assertEqual(["railgun", "railgun"], d.resolved)
+
+    def test_prefetch(self):
+        self.render_page("railgun", "railgun", "mental_out")
+        self.env.cache.clear()
+
+        loaded = self.env.dependencies.prefetch(self.env, "page")
+
+        self.assertEqual(["railgun"], loaded)
+        self.assertTrue(self.is_cached("railgun"))
+        self.assertFalse(self.is_cached("mental_out"))
+
+    def test_prefetch_on_compile(self):
+        self.render_page("railgun", "mental_out")
+        self.env.cache.clear()
+        self.env.dependencies_prefetch = 2
+
+        self.env.get_template("page")
+
+        self.assertTrue(self.is_cached("railgun"))
+        self.assertTrue(self.is_cached("mental_out"))
+        self.assertFalse(self.is_cached("meltdowner"))
@@ -0,0 +1,123 @@
+import unittest
+
+import jinja2
+import jinja2td
+from jinja2td.dependencies import _describe
+
+
+class TestsScan(unittest.TestCase):
+    def setUp(self):
+        self.files = {
+            "page": r"{% extends 'layout' %}{% block main %}{% for i in x %}{% include 'item' %}{% endfor %}{% endblock %}",
+            "layout": r"{% import 'macros' as m with context %}{% block main %}{% endblock %}",
+            "item": r"{% from 'macros' import a, b as c %}{% include 'opt' ignore missing without context %}",
+            "macros": r"{% macro a() %}{% include 'x' 'y' %}{% endmacro %}{% macro b() %}{% endmacro %}",
+            "dynamic": r"{% include 'widgets/' ~ kind %}",
+            "list": r"{% include ['a', 'b'] %}",
+            "call": r"{% call m.a() %}{% from 'macros' import a with context %}{% endcall %}",
+            "loops": (
+                r"{% for i in x %}{% block row %}{% include 'item' %}{% endblock %}"
+                r"{% else %}{% if y %}{% else %}{% include 'opt' %}{% endif %}{% endfor %}"
+            ),
+        }
+
+    def env(self, **options):
+        return jinja2.Environment(
+            loader=jinja2.DictLoader(self.files),
+            extensions=[jinja2td.Introspection],
+            **options,
+        )
+
+    def assertSameGraph(self, scanned, compiled):
+        for name in self.files:
+            s = scanned.dependencies.get_template(name)
+            c = compiled.dependencies.get_template(name)
+            self.assertIsNot(None, s, name)
+            self.assertCountEqual(
+                map(_describe, c.dependencies), map(_describe, s.dependencies), name
+            )
+
+    def compile_all(self, env):
+        for name in self.files:
+            env.compile(env.loader.get_source(env, name)[0], name)
+
+    def test_same_as_compiled(self):
+        scanned = self.env()
+        compiled = self.env()
+        self.compile_all(compiled)
+
+        fallback = scanned.dependencies.scan(scanned)
+
+        self.assertCountEqual(["dynamic", "list"], fallback)
+        self.assertSameGraph(scanned, compiled)
+
+    def test_nesting(self):
+        env = self.env()
+        env.dependencies.scan(env, ["page", "macros", "call"])
+
+        include = env.dependencies.get_template("page").get_includes()[0]
+        self.assertEqual(1, include.loop_depth)
+        self.assertTrue(
+            env.dependencies.get_template("macros").dependencies[0].in_macro
+        )
+        self.assertTrue(
+            env.dependencies.get_template("call").dependencies[0].in_call_block
+        )
+
+    def test_loop_else(self):
+        env = self.env()
+        env.dependencies.scan(env, ["loops"])
+
+        self.assertEqual(
+            [0, 1],
+            [d.loop_depth for d in env.dependencies.get_template("loops").dependencies],
+        )
+
+    def test_same_ids(self):
+        self.files = {
+            "page": (
+                r"{% block a %}{% include 'x' %}{% block b %}{% include 'y' %}"
+                r"{% endblock %}{% endblock %}{% include 'z' %}"
+            ),
+        }
+        scanned = self.env()
+        compiled = self.env()
+        self.compile_all(compiled)
+
+        self.assertEqual([], scanned.dependencies.scan(scanned))
+        # the dependencies of the blocks are registered after the others
+        for n, target in enumerate(["z", "x", "y"]):
+            for env in (scanned, compiled):
+                self.assertEqual(
+                    ("include", ((False, target, None),)),
+                    env.dependencies._describe_dependency("page", 1 << 20 | n),
+                )
+
+    def test_custom_syntax(self):
+        self.files = {
+            "page": "<% extends 'layout' %>\n# include 'item'\n",
+            "layout": "LAYOUT",
+            "item": "ITEM",
+        }
+        options = dict(
+            block_start_string="<%", block_end_string="%>", line_statement_prefix="#"
+        )
+        scanned = self.env(**options)
+        compiled = self.env(**options)
+        self.compile_all(compiled)
+
+        self.assertEqual([], scanned.dependencies.scan(scanned))
+        self.assertSameGraph(scanned, compiled)
+
+    def test_syntax_error(self):
+        self.files = {"broken": r"{% include ('a' %}"}
+        env = self.env()
+
+        with self.assertRaises(jinja2.TemplateSyntaxError):
+            env.dependencies.scan(env)
+
+    def test_other_graph(self):
+        env = self.env()
+
+        with self.assertRaises(ValueError):
+            jinja2td.DependencyGraph().scan(env)
@@ -0,0 +1,64 @@
+import unittest
+
+import jinja2
+import jinja2td
+
+
+class TestsShared(unittest.TestCase):
+    def setUp(self):
+        files = {
+            "railgun": r"RAILGUN",
+            "mental_out": r"MENTALOUT",
+            "page": r"Modelcase_{% include ability %}",
+        }
+
+        self.graph = jinja2td.DependencyGraph()
+        extension = jinja2td.Introspection.sharing(self.graph)
+
+        self.env1 = jinja2.Environment(
+            loader=jinja2.DictLoader(files), extensions=[extension]
+        )
+        self.env2 = jinja2.Environment(
+            loader=jinja2.DictLoader(files), extensions=[extension]
+        )
+
+    def test_same_graph(self):
+        self.assertIs(self.graph, self.env1.dependencies)
+        self.assertIs(self.graph, self.env2.dependencies)
+
+        self.env1.get_template("page")
+
+        self.assertIsNot(None, self.env2.dependencies.get_template("page"))
+
+    def test_no_duplicates(self):
+        self.env1.get_template("page").render(ability="railgun")
+        self.env2.get_template("page").render(ability="railgun")
+
+        page = self.graph.get_template("page")
+
+        self.assertEqual(1, len(page.dependencies))
+        self.assertEqual(["railgun", "railgun"], page.dependencies[0].resolved)
+
+    def test_separate_watch(self):
+        self.graph.watch(self.env1)
+        self.graph.watch(self.env2)
+        self.env1.get_template("page").render(ability="railgun")
+        self.env2.get_template("page").render(ability="mental_out")
+
+        used1 = [t.name for t in self.graph.used_last_watch(self.env1)]
+        used2 = [t.name for t in self.graph.used_last_watch(self.env2)]
+        used = [t.name for t in self.graph.used_last_watch()]
+
+        self.assertEqual(["railgun"], used1)
+        self.assertEqual(["mental_out"], used2)
+        self.assertEqual(["mental_out", "railgun"], sorted(used))
+
+        self.graph.watch(self.env1)
+
+        self.assertEqual([], self.graph.used_last_watch(self.env1))
+        self.assertEqual(1, len(self.graph.used_last_watch(self.env2)))
+
+    def test_not_shared_by_default(self):
+        env = jinja2.Environment(extensions=[jinja2td.Introspection])
+
+        self.assertIsNot(self.graph, env.dependencies)
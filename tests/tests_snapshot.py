@@ -0,0 +1,119 @@
+import threading
+import unittest
+
+import jinja2
+import jinja2td
+
+
+class TestsSnapshot(unittest.TestCase):
+    def setUp(self):
+        files = {
+            "page": r"{% extends 'layout' %}{% block main %}{% include 'item' %}{% endblock %}",
+            "layout": r"{% block main %}{% endblock %}",
+            "item": r"ITEM",
+            "widget": r"{% include 'widgets/' ~ kind %}",
+            "widgets/a": r"A",
+        }
+        self.env = jinja2.Environment(
+            loader=jinja2.DictLoader(files),
+            extensions=[jinja2td.Introspection],
+        )
+
+    def test_queries(self):
+        self.env.get_template("page").render()
+        snapshot = self.env.dependencies.snapshot()
+
+        self.assertIsInstance(snapshot, jinja2td.GraphSnapshot)
+        self.assertEqual(["layout", "item"], snapshot.get_closure("page"))
+        self.assertEqual(["page"], snapshot.find_dependents("item"))
+        self.assertEqual(
+            {"page", "layout", "item"}, {t.name for t in snapshot.templates}
+        )
+        self.assertEqual(1, len(snapshot.get_template("page").get_includes()))
+        self.assertEqual(
+            ["page"], [t.name for t in snapshot.get_template("layout").find_children()]
+        )
+        self.assertIsNone(snapshot.get_template("widget"))
+
+    def test_isolated(self):
+        self.env.get_template("widget").render(kind="a")
+        snapshot = self.env.dependencies.snapshot()
+
+        self.env.get_template("widget").render(kind="a")
+        self.env.get_template("page")
+
+        self.assertIsNone(snapshot.get_template("page"))
+        widget = snapshot.get_template("widget")
+        self.assertEqual(1, widget.render_count)
+        self.assertEqual(1, widget.dependencies[0].resolve_count)
+        self.assertEqual(["widgets/a"], widget.dependencies[0].resolved)
+        self.assertEqual(2, self.env.dependencies.get_template("widget").render_count)
+
+    def test_isolated_bounded(self):
+        self.env.dependencies.bounded = True
+        self.env.get_template("widget").render(kind="a")
+        self.env.dependencies.watch()
+        snapshot = self.env.dependencies.snapshot()
+
+        self.env.get_template("widget").render(kind="a")
+
+        self.assertEqual([], snapshot.used_last_watch())
+        self.assertEqual(
+            ["widgets/a"], [t.name for t in self.env.dependencies.used_last_watch()]
+        )
+
+    def test_shared(self):
+        self.env.get_template("page")
+        self.env.get_template("widget")
+        first = self.env.dependencies.snapshot()
+        self.assertIs(first, self.env.dependencies.snapshot())
+
+        self.env.get_template("widget").render(kind="a")
+        second = self.env.dependencies.snapshot()
+        self.assertIsNot(first, second)
+
+        # the dependencies of the templates that didn't change are shared
+        self.assertIs(
+            first.get_template("page").dependencies[0],
+            second.get_template("page").dependencies[0],
+        )
+        self.assertIsNot(
+            first.get_template("widget").dependencies[0],
+            second.get_template("widget").dependencies[0],
+        )
+        # and the resolutions aren't copied
+        self.assertIs(
+            self.env.dependencies.get_template("widget")
+            .dependencies[0]
+            ._Dependency__resolved,
+            second.get_template("widget").dependencies[0]._Dependency__resolved,
+        )
+
+    def test_watch(self):
+        self.env.dependencies.watch()
+        self.env.get_template("widget").render(kind="a")
+        snapshot = self.env.dependencies.snapshot()
+        self.env.dependencies.watch()
+
+        self.assertEqual(["widgets/a"], [t.name for t in snapshot.used_last_watch()])
+        self.assertEqual([], self.env.dependencies.used_last_watch())
+
+    def test_concurrent_renders(self):
+        template = self.env.get_template("widget")
+        stop = threading.Event()
+
+        def render():
+            while not stop.is_set():
+                template.render(kind="a")
+
+        thread = threading.Thread(target=render)
+        thread.start()
+        try:
+            for _ in range(50):
+                snapshot = self.env.dependencies.snapshot()
+                widget = snapshot.get_template("widget")
+                count = widget.dependencies[0].resolve_count
+                self.assertEqual(count, widget.dependencies[0].resolve_count)
+        finally:
+            stop.set()
+            thread.join()
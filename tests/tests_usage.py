@@ -0,0 +1,128 @@
+import contextlib
+import io
+import os
+import tempfile
+import time
+import unittest
+
+import jinja2
+import jinja2td
+from jinja2td.__main__ import main
+
+
+class TestsUsage(unittest.TestCase):
+    def setUp(self):
+        self.files = {
+            "page": r"{% include 'widgets/' ~ kind %}",
+            "widgets/a": r"A",
+            "widgets/b": r"B",
+            "widgets/c": r"C",
+        }
+        self.dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def environment(self):
+        return jinja2.Environment(
+            loader=jinja2.DictLoader(self.files),
+            extensions=[jinja2td.Introspection],
+        )
+
+    def worker(self, name, kinds, **kwargs):
+        env = self.environment()
+        path = os.path.join(self.dir.name, name)
+        writer = env.dependencies.record_usage(path, interval=3600, **kwargs)
+        for kind in kinds:
+            env.get_template("page").render(kind=kind)
+        writer.close()
+        return path
+
+    def test_merge_and_load(self):
+        paths = [self.worker("1.jsonl", "aab"), self.worker("2.jsonl", "ab")]
+        merged = os.path.join(self.dir.name, "usage.jsonl")
+        self.assertEqual(2, jinja2td.merge_usage(paths, merged))
+
+        env = self.environment()
+        env.dependencies.scan(env)
+        self.assertEqual(1, env.dependencies.load_usage(merged))
+        dependency = env.dependencies.get_template("page").dependencies[0]
+        self.assertEqual([("widgets/a", 3), ("widgets/b", 2)], dependency.predict())
+
+    def test_appends(self):
+        env = self.environment()
+        path = os.path.join(self.dir.name, "usage.jsonl")
+        writer = env.dependencies.record_usage(path, interval=3600)
+        env.get_template("page").render(kind="a")
+        writer.flush()
+        env.get_template("page").render(kind="a")
+        writer.close()
+
+        with open(path) as f:
+            self.assertEqual(2, len(f.readlines()))
+        self.assertEqual(
+            {("page", "include", ((True, None, ("widgets/", "")),), "widgets/a"): 2},
+            jinja2td.usage.read_usage(path),
+        )
+
+    @unittest.skipUnless(hasattr(os, "fork"), "fork is not available")
+    def test_fork(self):
+        env = self.environment()
+        path = os.path.join(self.dir.name, "{pid}.jsonl")
+        writer = env.dependencies.record_usage(path, interval=0.01)
+        env.get_template("page").render(kind="a")
+
+        pid = os.fork()
+        if pid == 0:
+            try:
+                env.get_template("page").render(kind="b")
+                for _ in range(500):  # written by the restarted thread
+                    if os.path.exists(writer.path):
+                        break
+                    time.sleep(0.01)
+                writer.close()
+                with open(writer.path) as f:
+                    os._exit(0 if "widgets/b" in f.read() else 1)
+            finally:
+                os._exit(2)
+        self.assertEqual(0, os.waitstatus_to_exitcode(os.waitpid(pid, 0)[1]))
+        writer.close()
+
+        with open(writer.path) as f:
+            parent = f.read()
+        with open(os.path.join(self.dir.name, f"{pid}.jsonl")) as f:
+            child = f.read()
+        self.assertIn("widgets/a", parent)
+        self.assertNotIn("widgets/b", parent)
+        self.assertNotIn("widgets/a", child)
+
+    def test_bounded(self):
+        env = self.environment()
+        path = os.path.join(self.dir.name, "usage.jsonl")
+        writer = env.dependencies.record_usage(path, interval=3600, max_size=200)
+        for kind in "abcabcaa":
+            env.get_template("page").render(kind=kind)
+            writer.flush()
+        writer.close()
+
+        self.assertLessEqual(os.path.getsize(path), 200)
+        self.assertGreater(writer.dropped, 0)
+        usage = jinja2td.usage.read_usage(path)
+        self.assertEqual(["widgets/a"], [key[3] for key in usage])
+
+    def test_one_writer(self):
+        env = self.environment()
+        writer = env.dependencies.record_usage(os.path.join(self.dir.name, "u"))
+        with self.assertRaises(ValueError):
+            env.dependencies.record_usage(os.path.join(self.dir.name, "v"))
+        writer.close()
+        env.dependencies.record_usage(os.path.join(self.dir.name, "v")).close()
+
+    def test_cli(self):
+        paths = [self.worker("1.jsonl", "a"), self.worker("2.jsonl", "a")]
+        merged = os.path.join(self.dir.name, "usage.jsonl")
+        with contextlib.redirect_stderr(io.StringIO()):
+            status = main(["merge-usage", "-o", merged, *paths])
+
+        self.assertEqual(0, status)
+        self.assertEqual([2], list(jinja2td.usage.read_usage(merged).values()))